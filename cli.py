@@ -0,0 +1,91 @@
+# cli.py
+"""
+Tareas por lotes sobre los pedidos (cierres nocturnos, cargas del TPV, copias).
+
+    python cli.py importar pedidos_tpv.jsonl
+    python cli.py exportar respaldo/2025-10.jsonl.gz --desde 2025-10-01 --hasta 2025-11-01
+    python cli.py cerrar --estado Listo --dias 1
+    python cli.py compactar
+
+Usa el mismo motor que la app (BARKA_MOTOR=json|sqlite).
+"""
+import argparse
+import gzip
+import json
+import sys
+from datetime import datetime
+
+import utils.kds as kds
+import utils.pedidos as pedidos
+
+
+def _leer(ruta):
+    """Pedidos de un archivo JSON Lines (.jsonl / .jsonl.gz) o de una lista JSON (.json)."""
+    abrir = gzip.open if ruta.endswith(".gz") else open
+    with abrir(ruta, "rt", encoding="utf-8") as f:
+        if ruta.endswith(".json"):
+            yield from json.load(f)
+            return
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+
+
+def _fecha(txt):
+    return datetime.fromisoformat(txt) if txt else None
+
+
+def cmd_importar(args):
+    n = pedidos.guardar_pedidos_bulk(_leer(args.archivo))
+    print(f"Importados {n} pedidos desde {args.archivo}")
+
+
+def cmd_exportar(args):
+    n = pedidos.exportar_pedidos(args.archivo, _fecha(args.desde), _fecha(args.hasta), args.estado)
+    print(f"Exportados {n} pedidos a {args.archivo}")
+
+
+def cmd_cerrar(args):
+    kds.vaciar()
+    abiertos = {p["orden"]: args.estado for p in pedidos.pedidos_en_cocina(dias=args.dias)
+                if p.get("estado") != args.estado}
+    cerrados = pedidos.actualizar_estados_bulk(abiertos)
+    print(f"{len(cerrados)} pedidos pasados a {args.estado}")
+
+
+def cmd_compactar(args):
+    pedidos.compactar()
+    print("Journals compactados y días anteriores sellados")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Tareas por lotes de Barka Love Pizza")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("importar", help="alta en bloque desde .jsonl(.gz) o .json")
+    p.add_argument("archivo")
+    p.set_defaults(func=cmd_importar)
+
+    p = sub.add_parser("exportar", help="exporta a JSON Lines (.gz comprime)")
+    p.add_argument("archivo")
+    p.add_argument("--desde", help="fecha/hora ISO inclusive (p.ej. 2025-10-01)")
+    p.add_argument("--hasta", help="fecha/hora ISO exclusiva")
+    p.add_argument("--estado", help="sólo pedidos con este estado de cocina")
+    p.set_defaults(func=cmd_exportar)
+
+    p = sub.add_parser("cerrar", help="pasa los pedidos en cocina a un estado final")
+    p.add_argument("--estado", default="Listo")
+    p.add_argument("--dias", type=int, default=None, help="sólo los últimos N días de negocio")
+    p.set_defaults(func=cmd_cerrar)
+
+    p = sub.add_parser("compactar", help="pliega journals y sella días cerrados")
+    p.set_defaults(func=cmd_compactar)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
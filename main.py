@@ -1,9 +1,12 @@
 # main.py
+import os
+
 import flet as ft
 from flet import Dropdown, Checkbox
 from screens.registro import pantalla_registro
 from screens.modificar import pantalla_modificar
 from screens.inicio import pantalla_inicio
+from utils.pantallas import ciclo_de
 
 # Si tienes otros screens, los cargamos bajo demanda en el router
 
@@ -42,8 +45,11 @@ def main(page: ft.Page):
     )
     checkbox_ingredientes = [Checkbox(label=i["label"]) for i in ingredientes_data]
 
-    # Router simple
+    # Router simple: al cambiar de pantalla se cancelan las tareas de la anterior
+    ciclo = ciclo_de(page)
+
     def mostrar_pantalla(nombre, **kwargs):
+        ciclo.entrar(nombre)
         page.clean()
 
         if nombre == "inicio":
@@ -140,5 +146,10 @@ def main(page: ft.Page):
     mostrar_pantalla("inicio")
 
 
+# Feed HTTP de sólo lectura del KDS para otros monitores (opcional)
+if os.environ.get("BARKA_FEED_PUERTO"):
+    from utils.feed import iniciar as iniciar_feed
+    iniciar_feed()
+
 # Ejecutar app
 ft.app(target=main, assets_dir="assets")
@@ -2,14 +2,19 @@ import shutil, os, random, json
 from datetime import datetime
 from utils.pedidos import guardar_pedido, cargar_pedidos, actualizar_pedido, obtener_pedido
 
-ARCHIVO = 'data/pedidos.json'
+ARCHIVO = 'data/pedidos.json'   # legado: se migra a particiones en la primera escritura
+DIR_PARTICIONES = 'data/pedidos'
 backup = None
-if os.path.exists(ARCHIVO):
-    backup = ARCHIVO + '.bak'
-    shutil.copy(ARCHIVO, backup)
+backup_legado = None
+if os.path.isdir(DIR_PARTICIONES):
+    backup = DIR_PARTICIONES + '.bak'
+    shutil.copytree(DIR_PARTICIONES, backup)
     print('Backup creado')
 else:
-    print('No existía archivo pedidos.json, se creará uno nuevo para la prueba')
+    print('No existían particiones de pedidos, se crearán para la prueba')
+if os.path.exists(ARCHIVO):
+    backup_legado = ARCHIVO + '.bak'
+    shutil.copy(ARCHIVO, backup_legado)
 
 num = random.randint(100000, 999999)
 pedido = {
@@ -41,15 +46,15 @@ print('Número de pedidos con esa orden (debe ser 1):', count)
 print('Pedido actual:', obtener_pedido(num))
 
 # Restaurar backup
+shutil.rmtree(DIR_PARTICIONES, ignore_errors=True)
 if backup:
-    shutil.move(backup, ARCHIVO)
+    shutil.move(backup, DIR_PARTICIONES)
     print('Backup restaurado')
 else:
-    # si no había backup, borrar el archivo creado
-    try:
-        os.remove(ARCHIVO)
-        print('Archivo datos eliminado tras prueba')
-    except Exception as e:
-        print('No se pudo eliminar archivo nuevo:', e)
+    print('Particiones creadas en la prueba eliminadas')
+if backup_legado:
+    shutil.move(backup_legado, ARCHIVO)
+    if os.path.exists(ARCHIVO + '.migrado'):
+        os.remove(ARCHIVO + '.migrado')
 
 print('Prueba completada')
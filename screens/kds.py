@@ -1,11 +1,15 @@
 # screens/kds.py
 import flet as ft
 import asyncio
-import os
-import re
-from datetime import datetime, timedelta
+import threading
+import time
 
+from utils import eventos, metricas
+from utils.diario_coccion import diario
+from utils.busqueda import IndiceBusqueda
 from utils.kds import listar_pedidos, actualizar_estado
+from utils.pedidos import epoch_de
+from utils.pantallas import ciclo_de
 # La receta vigente es opcional, pero si existe la usamos para mostrar guía
 try:
     import utils.recetas as rx
@@ -22,52 +26,27 @@ AZUL = "#2196F3"
 GRIS_CLARO = "#F4F4F4"
 BLANCO = "#FFFFFF"
 
-# ======= Dónde están los logs de cocción =======
-LOG_PATH = os.path.join(os.path.dirname(__file__), "..", "utils", "logs", "coccion.log")
-LOG_PATH = os.path.abspath(LOG_PATH)
+# Se repinta al llegar eventos (utils.eventos); el sondeo queda de respaldo
+SONDEO_S = 15.0
+AGRUPAR_EVENTOS_S = 0.15  # una ráfaga de eventos = un solo repintado
+# Mínimo entre repintados: una alerta sostenida (una por tick de CoccionController)
+# no repinta más que el sondeo de 2 s de antes
+MIN_ENTRE_REPINTADOS_S = 2.0
+ESPERA_BUSQUEDA_S = 0.25  # repintar al dejar de teclear, no en cada tecla
+
+# Vista por ventanas: tarjetas completas sólo para pedidos activos (como máximo
+# MAX_TARJETAS); los "Listo" van plegados en una lista compacta paginada
+MAX_TARJETAS = 30
+LISTOS_POR_PAGINA = 20
 
 
 def _read_recent_alerts(minutes_back: int = 2):
     """
-    Lee utils/logs/coccion.log y devuelve un diccionario:
+    Alertas del diario de cocción de los últimos `minutes_back` minutos:
       { orden_id:int -> {"mensajes": [str], "last_ts": datetime} }
-    Solo incluye eventos dentro de los últimos `minutes_back` minutos.
+    Sin regex: el índice del diario salta al minuto de inicio (utils.diario_coccion).
     """
-    results = {}
-    if not os.path.exists(LOG_PATH):
-        return results
-
-    now = datetime.now()
-    limit = now - timedelta(minutes=minutes_back)
-
-    # Formato de línea:
-    # [YYYY-mm-dd HH:MM:SS] ALERTA_SOBRECOCCION | Pedido #123 | ...
-    # [YYYY-mm-dd HH:MM:SS] ALERTA_SENSOR | Pedido #123 | ...
-    pattern = re.compile(
-        r"^\[(?P<ts>[\d\-:\s]+)\]\s+(?P<tipo>ALERTA_[A-Z_]+)\s\|\s+Pedido\s+#(?P<id>\d+)\s\|\s+(?P<msg>.+)$"
-    )
-
-    try:
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            for line in f:
-                m = pattern.match(line.strip())
-                if not m:
-                    continue
-                ts = datetime.strptime(m.group("ts"), "%Y-%m-%d %H:%M:%S")
-                if ts < limit:
-                    continue
-                pid = int(m.group("id"))
-                msg = f"{m.group('tipo').replace('_', ' ')} — {m.group('msg')}"
-                d = results.get(pid, {"mensajes": [], "last_ts": ts})
-                d["mensajes"].append(msg)
-                if ts > d.get("last_ts", ts):
-                    d["last_ts"] = ts
-                results[pid] = d
-    except Exception:
-        # si el archivo está en uso, devolvemos lo que tengamos
-        pass
-
-    return results
+    return diario().alertas_recientes(minutes_back)
 
 
 def _estado_badge_color(estado: str) -> str:
@@ -83,13 +62,11 @@ def _estado_badge_color(estado: str) -> str:
     return NEGRO
 
 
-def _human_delta(iso_or_none: str) -> str:
+def _human_delta(ts_or_none: float | None) -> str:
     try:
-        if not iso_or_none:
+        if ts_or_none is None:
             return "—"
-        dt = datetime.fromisoformat(iso_or_none)
-        delta = datetime.now() - dt
-        s = int(delta.total_seconds())
+        s = int(time.time() - ts_or_none)
         if s < 60:
             return f"{s}s"
         m = s // 60
@@ -98,22 +75,42 @@ def _human_delta(iso_or_none: str) -> str:
         return "—"
 
 
+def _duracion(segundos: float) -> str:
+    s = int(segundos)
+    return f"{s}s" if s < 60 else f"{s // 60}m{s % 60:02d}"
+
+
+def _texto_metricas() -> str:
+    """Tiempos por etapa (p50/p90/p99) y pedidos listos en 15 min (utils.metricas)."""
+    res = metricas.resumen()
+    partes = [
+        f"{etapa}: p50 {_duracion(p['p50'])} · p90 {_duracion(p['p90'])} · p99 {_duracion(p['p99'])}"
+        for etapa, p in res["etapas"].items()
+    ]
+    partes.append(f"Listos en {metricas.RENDIMIENTO_MIN} min: {res['rendimiento']}")
+    return "⏱ " + "   |   ".join(partes)
+
+
 def _mini_guia(tipo: str | None):
     """Si hay receta vigente, retornamos (texto_guia, temp, tiempo)."""
     if not rx or not tipo:
         return "Receta: —", None, None
     try:
-        ver = rx.vigente(tipo)
-        if not ver or not ver.horno:
-            return "Receta: —", None, None
-        h = ver.horno or {}
-        temp = h.get("temp_c")
-        tmin = h.get("tiempo_min")
-        return f"Receta: {tipo} • Objetivo {temp}°C • {tmin} min", temp, tmin
+        return rx.guia(tipo)  # caché de utils.recetas: no relee el JSON por tarjeta
     except Exception:
         return "Receta: —", None, None
 
 
+def _version_recetas():
+    """Cambia al recargar las recetas: la guía de las tarjetas ya pintadas queda vieja."""
+    if not rx:
+        return None
+    try:
+        return rx.version_cache()
+    except Exception:
+        return None
+
+
 def pantalla_kds(page: ft.Page, mostrar_pantalla):
     """
     KDS: Panel simple de cocina con estados y alertas visuales.
@@ -172,16 +169,47 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
         vertical_alignment=ft.CrossAxisAlignment.CENTER,
     )
 
+    txt_metricas = ft.Text("", size=12, color=NEGRO)
+
     # ===== Contenedor de tarjetas =====
     grid = ft.ResponsiveRow(columns=12, spacing=12, run_spacing=12)
 
+    txt_mas = ft.Text("", size=13, color=NEGRO, italic=True, visible=False)
+
+    # Listos: plegados por defecto; sólo se construye la página visible
+    listos_estado = {"abierto": False, "pagina": 0, "firma": None}
+    btn_listos = ft.TextButton("", on_click=lambda _: _alternar_listos(), style=ft.ButtonStyle(color={"": NEGRO}))
+    filas_listos = ft.Column(spacing=2, visible=False)
+    txt_pagina = ft.Text("", size=12, color=NEGRO)
+    btn_ant = ft.TextButton("◀ Anterior", on_click=lambda _: _pagina_listos(-1))
+    btn_sig = ft.TextButton("Siguiente ▶", on_click=lambda _: _pagina_listos(1))
+    pager = ft.Row([btn_ant, txt_pagina, btn_sig], visible=False)
+
     cont = ft.Container(
-        content=grid,
+        content=ft.Column(
+            [
+                grid,
+                txt_mas,
+                ft.Container(
+                    content=ft.Column([btn_listos, filas_listos, pager], spacing=4),
+                    bgcolor=BLANCO, border_radius=12, padding=8,
+                ),
+            ],
+            spacing=12,
+        ),
         padding=12,
         bgcolor=CREMA,
         expand=True,
     )
 
+    def _alternar_listos():
+        listos_estado["abierto"] = not listos_estado["abierto"]
+        _repaint()
+
+    def _pagina_listos(delta: int):
+        listos_estado["pagina"] = max(0, listos_estado["pagina"] + delta)
+        _repaint()
+
     # ===== Render helpers =====
     def _acciones(pid: int, estado_actual: str):
         def set_estado(nuevo: str):
@@ -227,7 +255,6 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
         estado = p.get("estado") or "Preparación"
         tipo = p.get("receta_tipo") or "—"
         tam = p.get("tamano") or "—"
-        hora = p.get("hora")  # iso
 
         # Mini guía receta
         guia_txt, temp_obj, tmin = _mini_guia(tipo)
@@ -257,7 +284,7 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
             border_radius=20,
             content=ft.Text(estado, color=BLANCO, size=12, weight=ft.FontWeight.W_600),
         )
-        since = ft.Text(f"Hace: {_human_delta(hora)}", size=12, color=NEGRO)
+        since = ft.Text(_hace(p), size=12, color=NEGRO)
 
         # Cabecera
         head = ft.Row(
@@ -299,28 +326,52 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
             padding=12,
             content=ft.Column(body_controls, spacing=8),
             col={"xs": 12, "md": 6, "lg": 4},
+            data=since,  # para refrescar "Hace: ..." sin rehacer la tarjeta
         )
 
+    def _hace(p: dict) -> str:
+        return f"Hace: {_human_delta(epoch_de(p))}"  # de la 'hora' de la vista, sin consultar el almacén
+
+    # Tarjetas vivas por pedido: {pid: (firma, control)}. Sólo se rehace la
+    # tarjeta cuya firma cambió; el resto se reutiliza (Flet envía sólo el diff).
+    tarjetas = {}
+
+    def _firma_card(p: dict, alerts_map: dict):
+        pid = p.get("id") or p.get("orden")
+        msgs = alerts_map.get(int(pid), {}).get("mensajes", [])
+        return (p.get("estado"), p.get("cliente"), p.get("receta_tipo"), p.get("tamano"), tuple(msgs[-3:]),
+                version_recetas)
+
+    # Índice de búsqueda (#orden por prefijo, cliente por n-gramas), incremental
+    indice = IndiceBusqueda()
+    version_recetas = None
+    repaint_lock = threading.Lock()  # el refresco y la búsqueda pueden llegar de hilos distintos
+
     # ===== Pintado principal =====
     def _repaint():
-        grid.controls.clear()
+        with repaint_lock:
+            _repaint_sin_lock()
 
+    def _repaint_sin_lock():
+        nonlocal version_recetas
         estado_filtro = dd_estado.value or "Todos"
-        q = (txt_buscar.value or "").strip().lower()
+        q = (txt_buscar.value or "").strip()
 
-        # 1) datos base
+        txt_metricas.value = _texto_metricas()  # agregados ya calculados: O(etapas)
+        version_recetas = _version_recetas()  # una vez por repintado, no por tarjeta
+
+        # 1) datos base (el índice se mantiene sobre todos los pedidos en cocina)
+        todos = listar_pedidos()
+        indice.sincronizar(todos)
         if estado_filtro == "Todos":
-            pedidos = listar_pedidos()
+            pedidos = todos
         else:
-            pedidos = listar_pedidos(estado=estado_filtro)
+            pedidos = [p for p in todos if p.get("estado") == estado_filtro]
 
-        # 2) filtrar por query (#orden o cliente)
+        # 2) filtrar por query (#orden o cliente) con el índice
         if q:
-            def _match(p):
-                pid = str(p.get("id") or p.get("orden") or "")
-                cliente = (p.get("cliente") or "").lower()
-                return q in pid or q in cliente
-            pedidos = [p for p in pedidos if _match(p)]
+            encontrados = indice.buscar(q)
+            pedidos = [p for p in pedidos if (p.get("id") or p.get("orden")) in encontrados]
 
         # 3) alertas recientes (map)
         alerts_map = _read_recent_alerts(minutes_back=3)
@@ -334,28 +385,117 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
             return (prio, hora)
         pedidos.sort(key=_k)
 
-        # 5) render cards
-        for p in pedidos:
-            grid.controls.append(_card(p, alerts_map))
+        activos = [p for p in pedidos if "list" not in (p.get("estado") or "").lower()]
+        listos = pedidos[len(activos):]  # ya ordenados: los listos van al final
+        ocultos = max(0, len(activos) - MAX_TARJETAS)
+        activos = activos[:MAX_TARJETAS]
+        txt_mas.visible = ocultos > 0
+        txt_mas.value = f"+{ocultos} pedidos activos más (filtra o busca para verlos)"
+        _pintar_listos(listos[::-1])  # el más reciente primero
+
+        # 5) reconciliar tarjetas: nuevas/cambiadas se construyen, el resto se reutiliza
+        controles = []
+        for p in activos:
+            pid = p.get("id") or p.get("orden")
+            firma = _firma_card(p, alerts_map)
+            previa = tarjetas.get(pid)
+            if previa is None or previa[0] != firma:
+                card = _card(p, alerts_map)
+                tarjetas[pid] = (firma, card)
+            else:
+                card = previa[1]
+                card.data.value = _hace(p)
+            controles.append(card)
+        vivos = {p.get("id") or p.get("orden") for p in activos}
+        for pid in [k for k in tarjetas if k not in vivos]:
+            del tarjetas[pid]
+
+        # quitadas/añadidas/reordenadas: sólo si la secuencia cambió
+        if [id(c) for c in grid.controls] != [id(c) for c in controles]:
+            grid.controls = controles
 
         page.update()
 
+    def _pintar_listos(listos: list):
+        """Sólo la página visible de listos; las filas se rehacen si esa página cambió."""
+        paginas = max(1, -(-len(listos) // LISTOS_POR_PAGINA))
+        listos_estado["pagina"] = min(listos_estado["pagina"], paginas - 1)
+        abierto = listos_estado["abierto"] and bool(listos)
+        btn_listos.text = f"{'▾' if abierto else '▸'} Listos ({len(listos)})"
+        filas_listos.visible = pager.visible = abierto
+        if not abierto:
+            return
+        i = listos_estado["pagina"] * LISTOS_POR_PAGINA
+        pagina = listos[i:i + LISTOS_POR_PAGINA]
+        txt_pagina.value = f"Página {listos_estado['pagina'] + 1}/{paginas}"
+        btn_ant.disabled = listos_estado["pagina"] == 0
+        btn_sig.disabled = listos_estado["pagina"] >= paginas - 1
+        firma = tuple((p.get("id") or p.get("orden"), p.get("cliente"), p.get("receta_tipo")) for p in pagina)
+        if firma == listos_estado["firma"]:
+            return
+        listos_estado["firma"] = firma
+        filas_listos.controls = [
+            ft.Text(
+                f"✔ Orden #{p.get('id') or p.get('orden')} • {p.get('cliente') or '—'} • {p.get('receta_tipo') or '—'}",
+                size=13, color=NEGRO,
+            )
+            for p in pagina
+        ]
+
     # Eventos de filtros
-    dd_estado.on_change = lambda e: _repaint()
-    txt_buscar.on_change = lambda e: _repaint()
+    def _al_filtrar(e):
+        if dd_estado.value == "Listo":
+            # con ese filtro la rejilla queda vacía: los listos se despliegan solos
+            listos_estado["abierto"] = True
+        _repaint()
+
+    dd_estado.on_change = _al_filtrar
+
+    espera = {"timer": None}
 
-    # ===== Auto-refresh loop =====
-    stop_flag = {"stop": False}
+    def _al_teclear(e):
+        if espera["timer"] is not None:
+            espera["timer"].cancel()
+        espera["timer"] = threading.Timer(ESPERA_BUSQUEDA_S, _repaint)
+        espera["timer"].daemon = True
+        espera["timer"].start()
 
+    txt_buscar.on_change = _al_teclear
+    txt_buscar.on_submit = lambda e: _repaint()
+
+    # ===== Auto-refresh por eventos =====
     async def _auto_refresher():
-        # pequeño ciclo para repintar cada ~2s
-        while not stop_flag["stop"]:
-            await asyncio.sleep(2.0)
-            _repaint()
+        # repinta cuando hay pedidos nuevos, cambios de estado o alertas;
+        # si no llega nada, cada SONDEO_S (alertas que caducan, "Hace: ...")
+        loop = asyncio.get_running_loop()
+        hay_cambios = asyncio.Event()
+
+        def _aviso(tema, datos):
+            loop.call_soon_threadsafe(hay_cambios.set)
+
+        bajas = [
+            eventos.suscribir(tema, _aviso)
+            for tema in (eventos.PEDIDO_CREADO, eventos.PEDIDO_EDITADO, eventos.ESTADO_CAMBIADO, eventos.ALERTA)
+        ]
+        ultimo = loop.time()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(hay_cambios.wait(), timeout=SONDEO_S)
+                    resta = MIN_ENTRE_REPINTADOS_S - (loop.time() - ultimo)
+                    await asyncio.sleep(max(AGRUPAR_EVENTOS_S, resta))
+                except asyncio.TimeoutError:
+                    pass
+                hay_cambios.clear()
+                _repaint()
+                ultimo = loop.time()
+        finally:
+            for baja in bajas:
+                baja()
 
     # ===== Root =====
     root = ft.Column(
-        controls=[top, cont],
+        controls=[top, txt_metricas, cont],
         spacing=8,
         expand=True,
     )
@@ -364,13 +504,9 @@ def pantalla_kds(page: ft.Page, mostrar_pantalla):
     page.clean()
     page.add(root)
     _repaint()  # primera pintada
-    try:
-        # correr refresco en background
-        asyncio.create_task(_auto_refresher())
-    except RuntimeError:
-        # si no hay loop (modo blocking), ignorar auto-refresh
-        pass
-
-    # Para que al salir de KDS detengamos el refresco,
-    # puedes gestionar stop_flag en tu router si lo deseas.
+    # refresco en background ligado a la pantalla: el router lo cancela al salir
+    # (sin loop, modo blocking, no hay auto-refresh)
+    ciclo = ciclo_de(page)
+    ciclo.lanzar(_auto_refresher())
+    ciclo.al_salir(lambda: espera["timer"] and espera["timer"].cancel())
     return root
@@ -1,7 +1,6 @@
 from __future__ import annotations
-from datetime import datetime, timedelta
 import flet as ft
-from utils.pedidos import obtener_pedido, actualizar_pedido
+from utils.pedidos import obtener_pedido, actualizar_pedido, pedido_modificable
 
 # Paleta
 ROJO = "#E63946"
@@ -34,11 +33,8 @@ def _snack(page: ft.Page, msg: str, bg: str = VERDE):
     page.update()
 
 def _is_modificable(pedido: dict, minutos: int = 5) -> bool:
-    try:
-        t = datetime.fromisoformat(pedido["hora"])
-        return datetime.now() - t < timedelta(minutes=minutos)
-    except Exception:
-        return False
+    # la hora viene en el pedido: no hace falta otra consulta al almacén
+    return pedido_modificable(pedido, minutos=minutos)
 
 def pantalla_modificar(
     page: ft.Page,
@@ -3,7 +3,8 @@ import flet as ft
 import asyncio
 from utils.pedidos import obtener_pedido
 from utils.coccion import ejecutar_coccion_para_pedido, SensorState
-from utils.kds import actualizar_estado  # <-- para reflejar fases en el KDS
+from utils.kds import aactualizar_estado  # <-- para reflejar fases en el KDS (sin bloquear el loop)
+from utils.pantallas import ciclo_de
 
 # Paleta
 ROJO = "#E63946"
@@ -217,11 +218,11 @@ async def pantalla_preparar(page, pedido, mostrar_pantalla, pedido_finalizado_re
             # Reflejar estado en KDS
             try:
                 if name == "Preparación":
-                    actualizar_estado(numero_orden, "Preparación")
+                    await aactualizar_estado(numero_orden, "Preparación")
                 elif name == "Horno":
-                    actualizar_estado(numero_orden, "Horno")
+                    await aactualizar_estado(numero_orden, "Horno")
                 elif name == "Empaque":
-                    actualizar_estado(numero_orden, "Empaque")
+                    await aactualizar_estado(numero_orden, "Empaque")
             except Exception:
                 pass
 
@@ -263,7 +264,7 @@ async def pantalla_preparar(page, pedido, mostrar_pantalla, pedido_finalizado_re
 
         # Reflejar "Listo" en KDS
         try:
-            actualizar_estado(numero_orden, "Listo")
+            await aactualizar_estado(numero_orden, "Listo")
         except Exception:
             pass
 
@@ -300,4 +301,7 @@ def mostrar_carga_pizza(page, numero_orden, mostrar_pantalla, pedido_finalizado_
     except RuntimeError:
         asyncio.run(pantalla_preparar(page, pedido, mostrar_pantalla, pedido_finalizado_ref, current_order_ref))
     else:
-        asyncio.create_task(pantalla_preparar(page, pedido, mostrar_pantalla, pedido_finalizado_ref, current_order_ref))
+        # las fases (y la cocción) se cancelan si el router cambia de pantalla
+        ciclo = ciclo_de(page)
+        ciclo.lanzar(pantalla_preparar(page, pedido, mostrar_pantalla, pedido_finalizado_ref, current_order_ref))
+        ciclo.al_salir(lambda: setattr(page, "on_resize", None))
@@ -1,11 +1,9 @@
 # screens/registro.py (registro SIN guía de receta; ingredientes con icono en su lugar + imagen por tipo + KDS)
 import flet as ft
-import random
 from datetime import datetime
 import time
 
-from utils.pedidos import guardar_pedido, actualizar_pedido
-from utils.kds import registrar_pedido
+from utils.pedidos import guardar_pedido, actualizar_pedido, nuevo_numero_orden
 import utils.recetas as rx  # se usa para guardar la version vigente en el pedido (no se muestra guía)
 
 
@@ -273,26 +271,6 @@ def pantalla_registro(
             "receta_version": (receta_vig.version_id if receta_vig else None),
         }
 
-    def _enviar_a_kds(pedido_dict: dict):
-        """Registra el pedido confirmado en el KDS (HU: <5s)."""
-        first = pedido_dict["items"][0] if pedido_dict.get("items") else {}
-        pedido_kds = {
-            "id": pedido_dict.get("orden"),
-            "orden": pedido_dict.get("orden"),
-            "cliente": pedido_dict.get("cliente"),
-            "receta_tipo": pedido_dict.get("receta_tipo") or first.get("receta_tipo"),
-            "tamano": pedido_dict.get("tamano") or first.get("tamano"),
-            "masa": pedido_dict.get("masa") or first.get("masa"),
-            "salsa": pedido_dict.get("salsa") or first.get("salsa"),
-            "ingredientes": pedido_dict.get("ingredientes") or first.get("ingredientes", []),
-            "estado": "confirmado",
-            # 'fecha' la agrega utils.kds.registrar_pedido
-        }
-        try:
-            registrar_pedido(pedido_kds)
-        except Exception:
-            pass
-
     def guardar_pedido_click(e):
         if hasattr(e, "control"): e.control.disabled = True; page.update()
         try:
@@ -319,13 +297,14 @@ def pantalla_registro(
                 refresh_carrito()
 
             if editar_orden is None:
-                numero_orden = random.randint(1000, 9999)
+                numero_orden = nuevo_numero_orden()
                 pedido = _armar_pedido_base(numero_orden=numero_orden)
+                # === Registro automático en cocina (KDS, HU: <5s) ===
+                # El KDS es una vista sobre el mismo pedido: basta con guardarlo con estado
+                pedido["estado"] = "confirmado"
+                pedido["fecha"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 guardar_pedido(pedido)
 
-                # === Registro automático en cocina (KDS) ===
-                _enviar_a_kds(pedido)
-
                 pedido_enviado_ref[0] = True
                 pedido_finalizado_ref[0] = False
                 current_order_ref[0] = numero_orden
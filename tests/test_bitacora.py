@@ -0,0 +1,40 @@
+import os
+
+from utils.bitacora import Bitacora
+
+
+def test_escribe_en_lote_y_rota(tmp_path):
+    ruta = str(tmp_path / "coccion.log")
+    b = Bitacora(ruta, max_bytes=2000, respaldos=2)
+    for i in range(200):
+        b.escribir(f"[2025-10-01 12:00:00] COCCION | Pedido #{i} | tick\n")
+    assert b.vaciar()
+
+    lineas = []
+    for nombre in (ruta + ".2", ruta + ".1", ruta):
+        if os.path.exists(nombre):
+            assert os.path.getsize(nombre) <= 2000
+            with open(nombre, encoding="utf-8") as f:
+                lineas += f.read().splitlines()
+    assert not os.path.exists(ruta + ".3")
+    assert b.estadisticas()["rotaciones"] >= 2
+    # con 2 respaldos sólo se conserva lo último, en orden
+    nums = [int(l.split("#")[1].split(" ")[0]) for l in lineas]
+    assert nums == list(range(200 - len(nums), 200))
+
+
+def test_cola_llena_descarta_y_avisa(tmp_path):
+    ruta = str(tmp_path / "coccion.log")
+    b = Bitacora(ruta, max_cola=5)
+    b._hilo = object()  # hilo "ocupado": nadie consume la cola
+    enviados = [b.escribir(f"linea {i}\n") for i in range(8)]
+    assert enviados.count(False) == 3 and b.descartadas == 3
+
+    b._hilo = None
+    b._arrancar()
+    b.escribir("despues\n")
+    assert b.vaciar()
+    with open(ruta, encoding="utf-8") as f:
+        texto = f.read()
+    assert "LOG_DESCARTADAS | 3 mensajes" in texto
+    assert texto.rstrip().endswith("despues")
@@ -0,0 +1,24 @@
+from utils.busqueda import IndiceBusqueda, normalizar
+
+
+def test_indice_prefijo_y_ngramas_incremental():
+    idx = IndiceBusqueda()
+    pedidos = [{'id': 1234, 'cliente': 'José Peña'}, {'id': 1299, 'cliente': 'Ana'}, {'id': 5123, 'cliente': 'Joselyn'}]
+    idx.sincronizar(pedidos)
+
+    assert normalizar("  JOSÉ ") == "jose"
+    assert idx.buscar("#12") == {1234, 1299}
+    assert idx.buscar("jose") == {1234, 5123}
+    assert idx.buscar("pena") == {1234}
+    assert idx.buscar("ose p") == {1234}
+    assert idx.buscar("a") == {1234, 1299}
+    assert idx.buscar("xyz") == set()
+    assert idx.buscar("") == {1234, 1299, 5123}
+
+    # cambios: nombre editado, pedido nuevo y pedido que sale de la vista
+    pedidos = [{'id': 1234, 'cliente': 'Pepe'}, {'id': 5123, 'cliente': 'Joselyn'}, {'id': 7, 'cliente': 'Ángel'}]
+    idx.sincronizar(pedidos)
+    assert idx.buscar("jose") == {5123}
+    assert idx.buscar("12") == {1234}
+    assert idx.buscar("angel") == {7}
+    assert len(idx) == 3
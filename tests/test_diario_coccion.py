@@ -0,0 +1,101 @@
+import json
+import time
+
+import utils.bitacora as bitacora_mod
+from utils import eventos
+from utils.diario_coccion import DiarioCoccion
+
+
+def _reabrir(ruta):
+    # otro proceso / reinicio: sin bitácora ni índice en memoria
+    bitacora_mod._bitacoras.pop(ruta, None)
+    return DiarioCoccion(ruta)
+
+
+def test_indice_por_orden_y_por_minuto(tmp_path):
+    ruta = str(tmp_path / "coccion.jsonl")
+    d = _reabrir(ruta)
+    avisos = []
+    baja = eventos.suscribir(eventos.ALERTA, lambda tema, datos: avisos.append(datos))
+    try:
+        for orden in (1, 2, 3):
+            d.anotar("COCCION_INICIO", orden, objetivo=220.0)
+        d.anotar("ALERTA_SOBRECOCCION", 2, temp=226.4, objetivo=220.0, mensaje="Temp 226.4°C")
+        d.anotar("COCCION_FIN", 2, temp_final=221.0)
+        assert d.vaciar()
+    finally:
+        baja()
+
+    assert [e["tipo"] for e in d.eventos_de(2)] == ["COCCION_INICIO", "ALERTA_SOBRECOCCION", "COCCION_FIN"]
+    assert d.eventos_de(2)[1]["temp"] == 226.4
+    assert d.eventos_de(99) == []
+    alertas = d.alertas_recientes(3)
+    assert list(alertas) == [2] and "Temp 226.4°C" in alertas[2]["mensajes"][0]
+    assert [a["orden"] for a in avisos] == [2]  # se avisa ya escrita
+    assert list(d.desde(time.time() + 60)) == []
+
+    with open(ruta + ".idx", encoding="utf-8") as f:
+        offsets = [int(l.split()[0]) for l in f]
+    with open(ruta, "rb") as f:
+        for off in offsets:
+            f.seek(off)
+            json.loads(f.readline())
+
+
+def test_reabrir_completa_o_rehace_el_indice(tmp_path):
+    ruta = str(tmp_path / "coccion.jsonl")
+    d = _reabrir(ruta)
+    d.anotar("COCCION_INICIO", 7)
+    d.vaciar()
+    # eventos escritos sin índice (corte antes de anotarlos)
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"ts": time.time(), "tipo": "ALERTA_SENSOR", "orden": 7, "mensaje": "sin lectura"}) + "\n")
+        f.write('{"ts": 1, "tipo": "COCCION_FIN", "ord')  # línea a medio escribir
+
+    d = _reabrir(ruta)
+    assert [e["tipo"] for e in d.eventos_de(7)] == ["COCCION_INICIO", "ALERTA_SENSOR"]
+
+    with open(ruta + ".idx", "w", encoding="utf-8") as f:
+        f.write("999999 1 7\n")  # no cuadra con el diario
+    d = _reabrir(ruta)
+    assert len(d.eventos_de(7)) == 2
+    assert 7 in d.alertas_recientes(2)
+
+
+def test_anotar_no_carga_el_indice(tmp_path, monkeypatch):
+    import threading
+
+    ruta = str(tmp_path / "coccion.jsonl")
+    with open(ruta, "w", encoding="utf-8") as f:  # diario previo sin índice
+        f.write(json.dumps({"ts": time.time(), "tipo": "COCCION_INICIO", "orden": 8}) + "\n")
+    hilos = []
+    original = DiarioCoccion._cargar
+    monkeypatch.setattr(DiarioCoccion, "_cargar",
+                        lambda self: hilos.append(threading.current_thread().name) or original(self))
+
+    d = _reabrir(ruta)
+    d.anotar("COCCION_FIN", 8)
+    d.vaciar()
+    assert hilos and set(hilos) == {"bitacora"}  # la carga la hizo el hilo escritor
+    assert [e["tipo"] for e in d.eventos_de(8)] == ["COCCION_INICIO", "COCCION_FIN"]
+
+
+def test_alertas_recientes_no_releen_el_diario(tmp_path, monkeypatch):
+    import builtins
+
+    ruta = str(tmp_path / "coccion.jsonl")
+    d = _reabrir(ruta)
+    d.anotar("ALERTA_SENSOR", 4, mensaje="sin lectura")
+    d.vaciar()
+    d = _reabrir(ruta)  # índice completo: el búfer sale de la cola reciente
+    assert d.alertas_recientes(3)[4]["mensajes"] == ["ALERTA SENSOR — sin lectura"]
+
+    d.anotar("ALERTA_SOBRECOCCION", 4, mensaje="Temp 230°C")
+    d.vaciar()
+    abiertos = []
+    original = builtins.open
+    monkeypatch.setattr(builtins, "open", lambda *a, **k: abiertos.append(a[0]) or original(*a, **k))
+    for _ in range(3):  # repintados del KDS / cuerpos del feed
+        alertas = d.alertas_recientes(3)
+    assert abiertos == []
+    assert len(alertas[4]["tss"]) == 2 and "230" in alertas[4]["mensajes"][-1]
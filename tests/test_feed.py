@@ -0,0 +1,81 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import utils.feed as feed
+import utils.kds as kds_mod
+import utils.pedidos as pedidos_mod
+
+
+def _get(url, **headers):
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, r.headers.get("ETag"), json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), None
+
+
+def test_etag_304_y_long_poll(tmp_path, monkeypatch):
+    monkeypatch.setattr(pedidos_mod, "ARCHIVO", str(tmp_path / "pedidos.json"))
+    monkeypatch.setattr(kds_mod, "DATA_PATH", str(tmp_path / "pedidos_data.json"))
+    monkeypatch.setattr(kds_mod, "_pendientes", {})
+    monkeypatch.setattr(feed, "RUTA_DIARIO", str(tmp_path / "coccion.jsonl"))
+    servidor = feed.iniciar(puerto=0)
+    try:
+        url = f"http://127.0.0.1:{servidor.server_address[1]}/kds"
+        pedidos_mod.guardar_pedido({'orden': 40, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+
+        status, tag, datos = _get(url)
+        assert status == 200 and [p["orden"] for p in datos["pedidos"]] == [40]
+        v = datos["version"]
+
+        # sin cambios: 304 y no se vuelve a serializar
+        llamadas = []
+        monkeypatch.setattr(feed, "_serializar", lambda: llamadas.append(1) or {})
+        assert _get(url, **{"If-None-Match": tag})[0] == 304
+        assert llamadas == []
+
+        # long-poll: vence sin cambios -> 304; con un cambio responde al momento
+        assert _get(f"{url}?since={v}&espera=0.05")[0] == 304
+        threading.Timer(0.1, kds_mod.actualizar_estado, args=(40, "Horno")).start()
+        status, tag2, datos = _get(f"{url}?since={v}")
+        assert status == 200 and datos["version"] != v and tag2 != tag
+    finally:
+        feed.detener()
+        kds_mod.vaciar()
+
+
+def test_version_ve_otros_procesos_y_alertas_vencidas(tmp_path, monkeypatch):
+    import time
+
+    from utils.almacen import AlmacenParticionado
+    from utils.diario_coccion import diario
+
+    monkeypatch.setattr(pedidos_mod, "ARCHIVO", str(tmp_path / "pedidos.json"))
+    monkeypatch.setattr(kds_mod, "DATA_PATH", str(tmp_path / "pedidos_data.json"))
+    monkeypatch.setattr(kds_mod, "_pendientes", {})
+    monkeypatch.setattr(feed, "RUTA_DIARIO", str(tmp_path / "coccion.jsonl"))
+    pedidos_mod.guardar_pedido({'orden': 50, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+    v0, _ = feed.cuerpo()
+
+    # escritura de otro proceso (otra instancia del almacén, sin eventos en éste)
+    AlmacenParticionado(pedidos_mod.ARCHIVO).cambiar_estado(50, 'Horno')
+    assert feed.esperar_cambio(v0, timeout=0.05) != v0
+    v1, datos = feed.cuerpo()
+    assert json.loads(datos)["pedidos"][0]["estado"] == 'Horno'
+
+    # una alerta sale de la respuesta a los ALERTAS_MIN minutos aunque nadie escriba
+    d = diario(feed.RUTA_DIARIO)
+    d.anotar("ALERTA_SOBRECOCCION", 50, mensaje="Temp 230°C")
+    d.vaciar()
+    v2, datos = feed.cuerpo()
+    assert v2 != v1 and "50" in json.loads(datos)["alertas"]
+    assert feed.version() == v2
+    real = time.time
+    monkeypatch.setattr(time, "time", lambda: real() + feed.ALERTAS_MIN * 60 + 1)
+    v3, datos = feed.cuerpo()
+    assert v3 != v2 and json.loads(datos)["alertas"] == {}
+    assert feed.version() == v3
@@ -0,0 +1,230 @@
+import json
+from datetime import datetime
+
+import utils.kds as kds_mod
+import utils.metricas as metricas_mod
+import utils.pedidos as pedidos_mod
+
+
+def _aislar(tmp_path, monkeypatch):
+    monkeypatch.setattr(pedidos_mod, "ARCHIVO", str(tmp_path / "pedidos.json"))
+    monkeypatch.setattr(kds_mod, "DATA_PATH", str(tmp_path / "pedidos_data.json"))
+    monkeypatch.setattr(kds_mod, "_legado_migrado", False)
+    monkeypatch.setattr(kds_mod, "_pendientes", {})
+    monkeypatch.setattr(metricas_mod, "_metricas", metricas_mod.MetricasCocina())
+
+
+def test_kds_es_vista_del_pedido(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    pedidos_mod.guardar_pedido({
+        'orden': 10, 'cliente': 'Ana', 'hora': datetime.now().isoformat(), 'estado': 'confirmado',
+        'items': [{'masa': 'Delgada', 'salsa': 'BBQ', 'tamano': 'Familiar', 'ingredientes': ['Piña'],
+                   'receta_tipo': 'Hawaiana'}],
+    })
+    pedidos_mod.guardar_pedido({'orden': 11, 'hora': datetime.now().isoformat()})  # no pasó a cocina
+
+    vista = kds_mod.listar_pedidos()
+    assert len(vista) == 1
+    assert vista[0]['id'] == 10 and vista[0]['receta_tipo'] == 'Hawaiana' and vista[0]['tamano'] == 'Familiar'
+
+    assert kds_mod.actualizar_estado(10, 'Horno')
+    kds_mod.vaciar()
+    assert pedidos_mod.obtener_pedido(10)['estado'] == 'Horno'
+    assert [p['id'] for p in kds_mod.listar_pedidos(estado='Horno')] == [10]
+
+    # una edición del pedido no pierde el estado de cocina
+    pedidos_mod.actualizar_pedido({'orden': 10, 'cliente': 'Ana María'})
+    assert kds_mod.listar_pedidos()[0]['estado'] == 'Horno'
+
+
+def test_migra_kds_legado(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    monkeypatch.setattr(kds_mod, "DIAS_KDS", None)  # las entradas legadas son de 2025
+    pedidos_mod.guardar_pedido({'orden': 1, 'hora': datetime.now().isoformat()})
+    legado = [
+        {'id': 1, 'orden': 1, 'estado': 'Empaque', 'fecha': '2025-10-23 13:14:33'},
+        {'id': 2, 'orden': 2, 'cliente': 'Luis', 'estado': 'Listo', 'fecha': '2025-10-23 13:18:45'},
+    ]
+    with open(kds_mod.DATA_PATH, "w", encoding="utf-8") as f:
+        json.dump(legado, f)
+
+    estados = {p['id']: p['estado'] for p in kds_mod.listar_pedidos()}
+    assert estados == {1: 'Empaque', 2: 'Listo'}
+    assert pedidos_mod.obtener_pedido(2)['hora'] == '2025-10-23T13:18:45'
+    # el legado queda intacto; la copia .migrado evita repetir la migración
+    assert (tmp_path / "pedidos_data.json").exists()
+    assert (tmp_path / "pedidos_data.json.migrado").exists()
+    monkeypatch.setattr(kds_mod, "_legado_migrado", False)
+    pedidos_mod.cambiar_estado(1, 'Listo')
+    assert {p['id']: p['estado'] for p in kds_mod.listar_pedidos()}[1] == 'Listo'
+
+
+def test_api_async_no_bloquea_y_conserva_orden(tmp_path, monkeypatch):
+    import asyncio
+
+    _aislar(tmp_path, monkeypatch)
+
+    async def flujo():
+        await pedidos_mod.aguardar_pedido({'orden': 30, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+        for fase in ("Preparación", "Horno", "Empaque", "Listo"):
+            assert await kds_mod.aactualizar_estado(30, fase)
+        await pedidos_mod.aactualizar_pedido({'orden': 30, 'masa': 'Gruesa'})
+        return await kds_mod.aactualizar_estado(999, 'Horno')
+
+    assert asyncio.run(flujo()) is False
+    kds_mod.vaciar()
+    p = pedidos_mod.obtener_pedido(30)
+    assert p['estado'] == 'Listo' and p['masa'] == 'Gruesa'
+
+
+def test_aactualizar_estado_fuera_del_loop(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    _aislar(tmp_path, monkeypatch)
+    monkeypatch.setattr(kds_mod, "MAX_PENDIENTES", 1)  # cada cambio fuerza el volcado (fsync)
+    pedidos_mod.guardar_pedido({'orden': 31, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+    hilos = []
+    original = pedidos_mod.cambiar_estados
+    monkeypatch.setattr(pedidos_mod, "cambiar_estados",
+                        lambda *a, **k: hilos.append(threading.get_ident()) or original(*a, **k))
+
+    async def flujo():
+        assert await kds_mod.aactualizar_estado(31, 'Horno')
+        return threading.get_ident()
+
+    hilo_loop = asyncio.run(flujo())
+    assert hilos and hilo_loop not in hilos
+    assert pedidos_mod.obtener_pedido(31)['estado'] == 'Horno'
+
+
+def test_volcado_fallido_no_pierde_estados(tmp_path, monkeypatch):
+    import pytest
+
+    _aislar(tmp_path, monkeypatch)
+    monkeypatch.setattr(kds_mod, "VENTANA_S", 60)
+    monkeypatch.setattr(kds_mod, "REINTENTO_S", 60)
+    pedidos_mod.guardar_pedido({'orden': 32, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+    assert kds_mod.actualizar_estado(32, 'Horno')
+
+    def _falla(*a, **k):
+        raise OSError("disco lleno")
+
+    original = pedidos_mod.cambiar_estados
+    monkeypatch.setattr(pedidos_mod, "cambiar_estados", _falla)
+    with pytest.raises(OSError):
+        kds_mod.vaciar()
+    assert kds_mod.listar_pedidos()[0]['estado'] == 'Horno'  # sigue visible y pendiente
+
+    monkeypatch.setattr(pedidos_mod, "cambiar_estados", original)
+    kds_mod.vaciar()
+    assert pedidos_mod.obtener_pedido(32)['estado'] == 'Horno'
+
+
+def test_estados_se_agrupan_en_diferido(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    monkeypatch.setattr(kds_mod, "VENTANA_S", 60)
+    ahora = datetime.now().isoformat()
+    for orden in range(20):
+        pedidos_mod.guardar_pedido({'orden': orden, 'hora': ahora, 'estado': 'confirmado'})
+    journal = next((tmp_path / "pedidos").glob("*.journal"))
+    lineas_antes = len(journal.read_bytes().splitlines())
+
+    for fase in ("Preparación", "Horno", "Empaque", "Listo"):
+        for orden in range(20):
+            assert kds_mod.actualizar_estado(orden, fase)
+    assert not kds_mod.actualizar_estado(999, 'Horno')
+
+    # lectura propia antes del volcado
+    assert {p['estado'] for p in kds_mod.listar_pedidos()} == {'Listo'}
+    assert len(kds_mod.listar_pedidos(estado='Listo')) == 20
+    kds_mod.vaciar()
+
+    # 80 transiciones -> una sola línea de journal
+    assert len(journal.read_bytes().splitlines()) == lineas_antes + 1
+    assert {p['estado'] for p in pedidos_mod.cargar_pedidos()} == {'Listo'}
+
+
+def test_eventos_de_pedido_y_estado(tmp_path, monkeypatch):
+    from utils import eventos
+    _aislar(tmp_path, monkeypatch)
+    recibidos = []
+    baja = eventos.suscribir(eventos.TODOS, lambda tema, datos: recibidos.append((tema, datos.get("orden"))))
+    baja_rota = eventos.suscribir(eventos.ESTADO_CAMBIADO, lambda tema, datos: 1 / 0)  # no afecta a los demás
+    try:
+        pedidos_mod.guardar_pedido({'orden': 40, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+        kds_mod.actualizar_estado(40, 'Horno')
+        kds_mod.vaciar()  # el volcado no vuelve a avisar
+    finally:
+        baja()
+        baja_rota()
+    pedidos_mod.cambiar_estado(40, 'Listo')
+    assert recibidos == [(eventos.PEDIDO_CREADO, 40), (eventos.ESTADO_CAMBIADO, 40)]
+
+
+def test_transiciones_alimentan_metricas(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    hace = datetime.fromtimestamp(datetime.now().timestamp() - 120)
+    pedidos_mod.guardar_pedido({'orden': 30, 'hora': hace.isoformat(), 'estado': 'confirmado'})
+
+    assert kds_mod.actualizar_estado(30, 'Preparación')
+    assert kds_mod.actualizar_estado(30, 'Listo')
+    kds_mod.vaciar()
+
+    res = metricas_mod.resumen()
+    assert res['etapas']['confirmado']['n'] == 1  # espera desde la hora del pedido (~2 min)
+    assert 90 <= res['etapas']['confirmado']['p50'] <= 150
+    assert res['etapas']['Preparación']['n'] == 1
+    assert res['rendimiento'] == 1
+
+
+def test_metricas_desde_cli_y_tras_reiniciar(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    hace = datetime.now().timestamp() - 300
+    pedidos_mod.guardar_pedido({'orden': 70, 'hora': datetime.fromtimestamp(hace).isoformat(), 'estado': 'confirmado'})
+    pedidos_mod.cambiar_estado(70, 'Horno', ts=hace + 60)
+    pedidos_mod.actualizar_estados_bulk({70: 'Listo'})  # cierre desde la CLI, sin pasar por el KDS
+
+    antes = metricas_mod.resumen()
+    assert set(antes['etapas']) == {'confirmado', 'Horno'} and antes['rendimiento'] == 1
+    assert [e for e, _ in pedidos_mod.obtener_pedido(70)['transiciones']] == ['confirmado', 'Horno', 'Listo']
+
+    # otro arranque: memoria vacía, los agregados salen de las transiciones guardadas
+    monkeypatch.setattr(metricas_mod, "_metricas", metricas_mod.MetricasCocina())
+    monkeypatch.setattr(pedidos_mod, "_almacenes", {})
+    assert metricas_mod.resumen() == antes
+
+
+def test_primera_escritura_del_proceso_no_cuenta_doble(tmp_path, monkeypatch):
+    _aislar(tmp_path, monkeypatch)
+    ahora = datetime.now().timestamp()
+    pedidos_mod.guardar_pedido({'orden': 80, 'hora': datetime.fromtimestamp(ahora - 120).isoformat(),
+                                'estado': 'Horno'})
+
+    # proceso nuevo: la primera escritura rehace las métricas antes de escribir
+    monkeypatch.setattr(metricas_mod, "_metricas", metricas_mod.MetricasCocina())
+    monkeypatch.setattr(pedidos_mod, "_almacenes", {})
+    pedidos_mod.cambiar_estados({80: 'Listo'}, transiciones={80: [('Empaque', ahora - 60), ('Listo', ahora)]})
+    res = metricas_mod.resumen()
+    assert res['etapas']['Empaque']['n'] == 1 and res['rendimiento'] == 1
+
+
+def test_journal_reaplicado_no_duplica_transiciones(tmp_path, monkeypatch):
+    from utils.almacen import AlmacenJournal
+
+    _aislar(tmp_path, monkeypatch)
+    alm = AlmacenJournal(str(tmp_path / "dia.jsonl"))
+    alm.agregar({'orden': 90, 'hora': datetime.now().isoformat(), 'estado': 'confirmado'})
+    alm.cambiar_estado(90, 'Horno', ts=1000.0)
+    with open(alm.ruta_journal, encoding="utf-8") as f:
+        copia = f.read()
+    alm.compactar()
+    # journal de antes de los números de operación: se re-aplica entero
+    sin_id = "".join(
+        linea.split(" ", 1)[1].replace(',"id":1', "").replace(',"id":2', "")
+        for linea in copia.splitlines(keepends=True)
+    )
+    with open(alm.ruta_journal, "w", encoding="utf-8") as f:
+        f.write(sin_id)
+    alm.invalidar()
+    assert alm.obtener(90)['transiciones'] == [['Horno', 1000.0]]
@@ -0,0 +1,50 @@
+from utils.metricas import MetricasCocina
+
+
+class _Reloj:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def test_percentiles_por_etapa():
+    reloj = _Reloj()
+    m = MetricasCocina(reloj=reloj)
+    for i in range(100):
+        inicio = reloj.t
+        m.registrar(i, "Horno", inicio)
+        m.registrar(i, "Empaque", inicio + 60 + i * 6)  # Horno: 60 s .. 654 s
+        m.registrar(i, "Listo", inicio + 60 + i * 6 + 30)
+
+    horno = m.percentiles("Horno")
+    assert horno["n"] == 100
+    for q, real in (("p50", 360), ("p90", 600), ("p99", 654)):
+        assert abs(horno[q] - real) / real < 0.15
+    assert 25 < m.percentiles("Empaque")["p50"] < 36
+    assert m.rendimiento() == 100
+    assert m.percentiles("Preparación") is None
+
+
+def test_ventana_movil_olvida_lo_viejo():
+    reloj = _Reloj()
+    m = MetricasCocina(ventana_min=60, ranura_min=5, rendimiento_min=15, reloj=reloj)
+    m.registrar(1, "Horno", reloj.t)
+    m.registrar(1, "Listo", reloj.t + 300)
+    reloj.t += 300
+    assert m.percentiles("Horno")["n"] == 1 and m.rendimiento() == 1
+
+    reloj.t += 16 * 60
+    assert m.rendimiento() == 0
+    reloj.t += 60 * 60
+    assert m.percentiles("Horno") is None
+    assert m.resumen() == {"etapas": {}, "rendimiento": 0}
+
+
+def test_repetir_estado_no_es_transicion():
+    m = MetricasCocina(reloj=_Reloj())
+    m.registrar(1, "Horno", 1_000_000)
+    m.registrar(1, "Horno", 1_000_100)
+    m.registrar(1, "Empaque", 1_000_200)
+    assert 170 < m.percentiles("Horno")["p50"] < 230
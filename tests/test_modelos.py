@@ -0,0 +1,42 @@
+import json
+import tracemalloc
+
+from utils.modelos import KdsPedido, Pedido
+
+
+def _pedido_legado(n):
+    item = {'masa': 'Delgada', 'salsa': 'Tomate', 'tamano': 'Familiar', 'ingredientes': ['Queso extra', 'Jamón'],
+            'cantidad': 1, 'receta_tipo': 'Hawaiana'}
+    return {'orden': n, 'cliente': 'Ana', 'metodo_pago': 'Efectivo', 'items': [item],
+            'hora': '2025-10-21T11:07:51', **item, 'total_visual': 10, 'estado': 'Horno'}
+
+
+def test_ida_y_vuelta_formato_legado():
+    casos = [
+        _pedido_legado(1),
+        {'orden': 2, 'masa': 'Gruesa', 'ingredientes': ['Piña']},                    # sin items
+        {**_pedido_legado(3), 'masa': 'Gruesa'},                                      # arriba distinto al item
+        {'orden': 4, 'items': [{'masa': 'Delgada', 'nota': 'sin sal'}], 'fecha': None},
+    ]
+    for d in casos:
+        p = Pedido.from_dict(json.loads(json.dumps(d)))
+        assert p.to_dict() == d
+        assert p.get('masa') == d.get('masa') and p.get('estado') == d.get('estado')
+    assert Pedido.from_dict(casos[0]).espejo and not Pedido.from_dict(casos[2]).espejo
+
+    kds = KdsPedido.from_dict(casos[1]).to_dict()
+    assert kds['id'] == 2 and kds['ingredientes'] == ['Piña'] and kds['salsa'] is None
+
+
+def test_ocupan_menos_que_los_dicts():
+    lineas = [json.dumps(_pedido_legado(n)) for n in range(500)]
+
+    def medir(convertir):
+        tracemalloc.start()
+        datos = [convertir(json.loads(l)) for l in lineas]
+        usado = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(datos) == 500
+        return usado
+
+    assert medir(Pedido.from_dict) < medir(lambda d: d) * 0.7
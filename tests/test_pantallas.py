@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from utils.pantallas import CicloPantallas, ciclo_de
+
+
+class _Page:
+    pass
+
+
+def test_salir_cancela_tareas_y_limpia():
+    limpiezas = []
+
+    async def flujo():
+        ciclo = ciclo_de(_Page())
+        ciclo.entrar("kds")
+        tarea = ciclo.lanzar(asyncio.sleep(3600))
+        ciclo.al_salir(lambda: limpiezas.append("timer"))
+        ciclo.al_salir(lambda: 1 / 0)  # no impide el resto
+        await asyncio.sleep(0)
+        assert ciclo.tareas_vivas() == 1
+
+        ciclo.entrar("inicio")
+        await asyncio.sleep(0)
+        return tarea, ciclo
+
+    tarea, ciclo = asyncio.run(flujo())
+    assert tarea.cancelled()
+    assert limpiezas == ["timer"]
+    assert ciclo.actual == "inicio" and ciclo.tareas_vivas() == 0
+
+
+def test_cancelar_desde_otro_hilo():
+    async def flujo():
+        ciclo = CicloPantallas()
+        ciclo.entrar("preparar")
+        tarea = ciclo.lanzar(asyncio.sleep(3600))
+        # handlers síncronos de Flet: el router corre fuera del loop
+        hilo = threading.Thread(target=ciclo.entrar, args=("modificar",))
+        hilo.start()
+        hilo.join()
+        try:
+            await asyncio.wait_for(tarea, 1)
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(flujo()) is True
+
+
+def test_sin_loop_no_lanza():
+    ciclo = CicloPantallas()
+    assert ciclo.lanzar(asyncio.sleep(0)) is None
+    page = _Page()
+    assert ciclo_de(page) is ciclo_de(page)
@@ -1,7 +1,7 @@
 import json
 import os
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import utils.pedidos as pedidos_mod
 
@@ -50,3 +50,363 @@ def test_guardar_y_actualizar_pedido(tmp_path):
     assert encontrado['orden'] == 123456
 
     # cleanup: file in tmp_path will be removed by fixture
+
+
+def _particion_hoy():
+    from utils.almacen import dia_de
+    base = os.path.join(os.path.splitext(pedidos_mod.ARCHIVO)[0], dia_de(datetime.now().timestamp()))
+    return base + ".jsonl", base + ".journal"
+
+
+def test_journal_anexa_y_compacta(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    snapshot, journal = _particion_hoy()
+
+    for n in range(3):
+        pedidos_mod.guardar_pedido({'orden': n, 'masa': 'Delgada', 'hora': datetime.now().isoformat()})
+    pedidos_mod.actualizar_pedido({'orden': 1, 'masa': 'Gruesa'})
+
+    # el snapshot no se ha escrito: todo vive en el journal (una línea por operación)
+    assert not os.path.exists(snapshot)
+    with open(journal, encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
+
+    pedidos_mod.compactar()
+    assert not os.path.exists(journal)
+    with open(snapshot, encoding="utf-8") as f:
+        contenido = [json.loads(linea) for linea in f]
+    assert contenido.pop(0) == {'_snapshot': {'ultima_op': 4}}  # última operación plegada
+    assert [p['orden'] for p in contenido] == [0, 1, 2]
+    assert contenido[1]['masa'] == 'Gruesa'
+    assert 'hora' in contenido[1]
+
+
+def test_journal_reaplicado_tras_compactacion_cortada(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    _, journal = _particion_hoy()
+    pedido = {'orden': 7, 'hora': datetime.now().isoformat()}
+    pedidos_mod.guardar_pedido(pedido)
+    with open(journal, encoding="utf-8") as f:
+        copia = f.read()
+    pedidos_mod.compactar()
+    # simula un corte entre el reemplazo del snapshot y el borrado del journal
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(copia)
+    assert len(pedidos_mod.cargar_pedidos()) == 1
+
+
+def test_journal_reaplicado_tras_editar_hora(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    _, journal = _particion_hoy()
+    ahora = datetime.now()
+    pedidos_mod.guardar_pedido({'orden': 1, 'hora': ahora.replace(second=0).isoformat()})
+    nueva = ahora.replace(second=5).isoformat()  # registro re-arma la hora al editar
+    pedidos_mod.actualizar_pedido({'orden': 1, 'hora': nueva, 'masa': 'Gruesa'})
+    with open(journal, encoding="utf-8") as f:
+        copia = f.read()
+    pedidos_mod.compactar()
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(copia)
+    assert [(p['orden'], p['hora']) for p in pedidos_mod.cargar_pedidos()] == [(1, nueva)]
+
+
+def test_orden_repetida_no_se_pierde(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    _, journal = _particion_hoy()
+    pedidos_mod.guardar_pedido({'orden': 5, 'hora': datetime.now().isoformat(), 'cliente': 'Ana'})
+    # el alta repetida se rechaza en vez de escribirse y quedar ignorada
+    with pytest.raises(ValueError):
+        pedidos_mod.guardar_pedido({'orden': 5, 'hora': datetime.now().isoformat(), 'cliente': 'Luis'})
+    pedidos_mod.guardar_pedido({'orden': 6, 'hora': datetime.now().isoformat()})
+    with open(journal, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+    # a medio compactar: lo plegado se salta por su número de operación
+    with open(journal, encoding="utf-8") as f:
+        copia = f.read()
+    pedidos_mod.compactar()
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(copia)
+    pedidos_mod.guardar_pedido({'orden': 7, 'hora': datetime.now().isoformat()})
+    pedidos_mod._almacenes.clear()
+    assert [p['orden'] for p in pedidos_mod.cargar_pedidos()] == [5, 6, 7]
+
+
+def test_legado_conserva_ordenes_repetidas(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    hora = datetime.now().isoformat()
+    with open(pedidos_mod.ARCHIVO, "w", encoding="utf-8") as f:
+        json.dump([{'orden': 4321, 'hora': hora, 'cliente': 'Ana'},
+                   {'orden': 4321, 'hora': hora, 'cliente': 'Luis'}], f)
+    assert [p['cliente'] for p in pedidos_mod.cargar_pedidos()] == ['Ana', 'Luis']
+    # corte antes de dejar la marca: relanzar la migración no duplica
+    os.remove(pedidos_mod.ARCHIVO + ".migrado")
+    pedidos_mod._almacenes.clear()
+    assert len(pedidos_mod.cargar_pedidos()) == 2
+    # ya marcado: el legado sigue en disco pero no se vuelve a migrar
+    with open(pedidos_mod.ARCHIVO, "w", encoding="utf-8") as f:
+        json.dump([{'orden': 99, 'hora': '2025-10-23T13:18:45'}], f)
+    pedidos_mod._almacenes.clear()
+    assert pedidos_mod.obtener_pedido(99) is None
+
+
+def test_cache_revalida_con_stat(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    pedidos_mod.guardar_pedido({'orden': 1, 'hora': datetime.now().isoformat()})
+
+    antes = pedidos_mod.estadisticas_cache()
+    for _ in range(5):
+        assert pedidos_mod.obtener_pedido(1)['orden'] == 1
+    despues = pedidos_mod.estadisticas_cache()
+    assert despues['aciertos'] - antes['aciertos'] == 5
+    assert despues['fallos'] == antes['fallos']
+
+    # otro proceso anexa al journal: sólo se aplica la cola nueva
+    _, journal = _particion_hoy()
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps({'op': 'alta', 'pedido': {'orden': 2, 'hora': datetime.now().isoformat()}}) + "\n")
+    assert pedidos_mod.obtener_pedido(2) is not None
+    assert pedidos_mod.estadisticas_cache()['parciales'] == despues['parciales'] + 1
+
+    # modificar lo devuelto no altera la caché
+    pedidos_mod.obtener_pedido(1)['orden'] = 99
+    assert pedidos_mod.obtener_pedido(1) is not None
+
+
+def test_indice_temporal(tmp_path):
+    from datetime import timedelta
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    ahora = datetime.now()
+    for orden, minutos in [(1, 60), (2, 30), (3, 2), (4, 45)]:
+        pedidos_mod.guardar_pedido({'orden': orden, 'hora': (ahora - timedelta(minutes=minutos)).isoformat()})
+    pedidos_mod.guardar_pedido({'orden': 5})  # sin hora: no entra en el índice
+
+    assert [p['orden'] for p in pedidos_mod.pedidos_modificables(5)] == [3]
+    rango = pedidos_mod.pedidos_en_rango(ahora - timedelta(minutes=50), ahora - timedelta(minutes=10))
+    assert [p['orden'] for p in rango] == [4, 2]
+    assert pedidos_mod.es_modificable(3) and not pedidos_mod.es_modificable(1)
+    assert not pedidos_mod.es_modificable(5)
+    # con el pedido en mano (pantallas) se usa su 'hora' sin consultar el almacén
+    assert pedidos_mod.pedido_modificable(pedidos_mod.obtener_pedido(3))
+    assert not pedidos_mod.pedido_modificable(pedidos_mod.obtener_pedido(1))
+    assert not pedidos_mod.pedido_modificable({'orden': 5})
+
+    # una edición que cambia la hora reubica el pedido en el índice
+    pedidos_mod.actualizar_pedido({'orden': 1, 'hora': ahora.isoformat()})
+    assert [p['orden'] for p in pedidos_mod.pedidos_modificables(5)] == [3, 1]
+
+
+def test_numero_orden_sin_colisiones(tmp_path):
+    from utils.secuencia import Secuencia
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    pedidos_mod.guardar_pedido({'orden': 4321, 'hora': datetime.now().isoformat()})
+
+    numeros = [pedidos_mod.nuevo_numero_orden() for _ in range(50)]
+    assert numeros[0] == 4322
+    assert numeros == sorted(set(numeros))
+
+    # otro proceso (otra instancia sobre el mismo archivo) recibe un bloque disjunto
+    otro = Secuencia(str(tmp_path / "pedidos.seq"), semilla=lambda: 0)
+    ajenos = [otro.siguiente() for _ in range(30)]
+    assert not set(ajenos) & set(numeros)
+    assert min(ajenos) > max(numeros)
+
+
+def test_importar_avanza_la_secuencia(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    assert pedidos_mod.nuevo_numero_orden() == 1000  # bloque 1000-1019 en memoria
+
+    pedidos_mod.guardar_pedidos_bulk([{'orden': 1001, 'hora': datetime.now().isoformat()}])
+    assert pedidos_mod.nuevo_numero_orden() == 1002
+    pedidos_mod.guardar_pedidos_bulk([{'orden': 5000, 'hora': datetime.now().isoformat()}])
+    n = pedidos_mod.nuevo_numero_orden()
+    assert n == 5001
+    pedidos_mod.guardar_pedido({'orden': n, 'hora': datetime.now().isoformat()})
+
+    # otro proceso también parte de ahí (el archivo .seq quedó por delante)
+    from utils.secuencia import Secuencia
+    assert Secuencia(str(tmp_path / "pedidos.seq"), semilla=lambda: 0).siguiente() > n
+
+
+def test_particiones_diarias(tmp_path):
+    from datetime import timedelta
+    from utils import almacen
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    ahora = datetime.now()
+    legado = [
+        {'orden': 1, 'hora': (ahora - timedelta(days=3)).isoformat()},
+        {'orden': 2, 'hora': (ahora - timedelta(days=1)).isoformat()},
+        {'orden': 3},
+    ]
+    with open(pedidos_mod.ARCHIVO, "w", encoding="utf-8") as f:
+        json.dump(legado, f, indent=4)
+    pedidos_mod.guardar_pedido({'orden': 4, 'hora': ahora.isoformat()})
+
+    # el JSON legado se repartió por día; queda intacto y marcado como migrado
+    assert os.path.exists(pedidos_mod.ARCHIVO)
+    assert os.path.exists(pedidos_mod.ARCHIVO + ".migrado")
+    assert sorted(p['orden'] for p in pedidos_mod.cargar_pedidos()) == [1, 2, 3, 4]
+
+    # los días cerrados se sellan comprimidos y siguen admitiendo cambios
+    pedidos_mod.compactar()
+    dir_part = tmp_path / "pedidos"
+    dia_2 = almacen.dia_de((ahora - timedelta(days=1)).timestamp())
+    assert (dir_part / (dia_2 + ".jsonl.gz")).exists()
+    assert pedidos_mod.cambiar_estado(2, 'Listo')
+    assert pedidos_mod.obtener_pedido(2)['estado'] == 'Listo'
+
+    # un rango sólo abre las particiones que toca
+    alm = pedidos_mod._almacen()
+    alm._particiones.clear()
+    rango = pedidos_mod.pedidos_en_rango(ahora - timedelta(hours=30), None)
+    assert [p['orden'] for p in rango] == [2, 4]
+    assert sorted(alm._particiones) == sorted([dia_2, almacen.dia_de(ahora.timestamp())])
+
+
+def test_orden_inexistente_no_carga_dias_sellados(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    ahora = datetime.now()
+    for d in range(1, 6):
+        for i in range(3):
+            pedidos_mod.guardar_pedido({'orden': d * 10 + i, 'hora': (ahora - timedelta(days=d)).isoformat()})
+    pedidos_mod.guardar_pedido({'orden': 1, 'hora': ahora.isoformat()})
+    pedidos_mod.compactar()  # sella los 5 días anteriores
+
+    alm = pedidos_mod._almacen()
+    alm._particiones.clear()
+    cargadas = lambda: sum(1 for p in alm._particiones.values() if p._firmas is not None)
+    assert pedidos_mod.obtener_pedido(424242) is None
+    assert pedidos_mod.hora_epoch(424242) is None
+    assert not pedidos_mod.cambiar_estado(424242, 'Listo')
+    assert cargadas() <= 1  # sólo el día en curso
+    assert pedidos_mod.obtener_pedido(31)['orden'] == 31
+    assert cargadas() <= 2
+
+
+def test_iter_pedidos_filtra_y_transmite(tmp_path):
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    ayer = datetime.now() - timedelta(days=1)
+    for i in range(5):
+        pedidos_mod.guardar_pedido({'orden': i, 'hora': (ayer + timedelta(minutes=i)).isoformat(),
+                                    'estado': 'Listo' if i % 2 else 'Horno'})
+    pedidos_mod.guardar_pedido({'orden': 9, 'hora': datetime.now().isoformat(), 'estado': 'Horno'})
+    pedidos_mod.compactar()  # sella el día anterior
+
+    gen = pedidos_mod.iter_pedidos(estado='Horno')
+    assert not isinstance(gen, list)
+    assert [p['orden'] for p in gen] == [0, 2, 4, 9]
+    assert [p['orden'] for p in pedidos_mod.iter_pedidos(desde=ayer + timedelta(minutes=1),
+                                                         hasta=ayer + timedelta(minutes=3))] == [1, 2]
+    assert len(list(pedidos_mod.iter_pedidos())) == len(pedidos_mod.cargar_pedidos()) == 6
+
+    # formato compacto: un pedido por línea, sin espacios
+    hoy = next(f for f in (tmp_path / "pedidos").iterdir() if f.name.endswith(".jsonl"))
+    assert b'": ' not in hoy.read_bytes() and b', "' not in hoy.read_bytes()
+
+
+def test_journal_con_cola_cortada_y_snapshot_danado(tmp_path):
+    from utils.almacen import AlmacenCorrupto
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    snapshot, journal = _particion_hoy()
+    pedidos_mod.guardar_pedido({'orden': 1, 'hora': datetime.now().isoformat()})
+
+    # apagón a mitad de línea: la cola no se aplica y no estropea la siguiente escritura
+    with open(journal, "ab") as f:
+        f.write(b'3f2a91c0 {"op":"alta","pedido":{"orden":2')
+    pedidos_mod.guardar_pedido({'orden': 3, 'hora': datetime.now().isoformat()})
+    pedidos_mod._almacenes.clear()  # arranque en frío
+    assert [p['orden'] for p in pedidos_mod.cargar_pedidos()] == [1, 3]
+    assert pedidos_mod.estadisticas_cache()['corruptas'] == 1
+
+    # línea con checksum que no cuadra
+    with open(journal, "rb") as f:
+        lineas = f.read().splitlines(keepends=True)
+    with open(journal, "wb") as f:
+        f.writelines(lineas[:-1] + [lineas[-1].replace(b'"orden":3', b'"orden":4')])
+    pedidos_mod._almacenes.clear()
+    assert [p['orden'] for p in pedidos_mod.cargar_pedidos()] == [1]
+
+    # snapshot ilegible: error explícito, nunca una lista vacía
+    pedidos_mod.compactar()
+    with open(snapshot, "w", encoding="utf-8") as f:
+        f.write('{"orden": 1, "ho')
+    pedidos_mod._almacenes.clear()
+    with pytest.raises(AlmacenCorrupto):
+        pedidos_mod.cargar_pedidos()
+
+
+def test_bulk_importar_cerrar_exportar(tmp_path, monkeypatch):
+    import cli
+    from utils import almacen
+    monkeypatch.setattr(almacen, "COMPACTAR_CADA", 10_000)
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    _, journal = _particion_hoy()
+    ahora = datetime.now()
+    lote = [{'orden': n, 'hora': (ahora - timedelta(seconds=n)).isoformat(), 'estado': 'Horno'} for n in range(200)]
+
+    assert pedidos_mod.guardar_pedidos_bulk(iter(lote)) == 200
+    assert pedidos_mod.guardar_pedidos_bulk(lote[:10]) == 0  # re-importar no duplica
+    with open(journal, "rb") as f:
+        assert len(f.read().splitlines()) == 200
+
+    assert len(pedidos_mod.actualizar_estados_bulk({n: 'Listo' for n in range(150)} | {999: 'Listo'})) == 150
+    cli.main(["cerrar", "--estado", "Listo"])
+    assert {p['estado'] for p in pedidos_mod.cargar_pedidos()} == {'Listo'}
+    with open(journal, "rb") as f:
+        assert len(f.read().splitlines()) == 202  # una línea por cierre en bloque
+
+    destino = str(tmp_path / "export" / "listos.jsonl.gz")
+    assert pedidos_mod.exportar_pedidos(destino, desde=ahora - timedelta(seconds=49.5)) == 50
+    pedidos_mod.ARCHIVO = str(tmp_path / "otro.json")
+    cli.main(["importar", destino])
+    assert len(pedidos_mod.cargar_pedidos()) == 50
+
+
+def _escribir_en_otro_proceso(archivo, inicio):
+    pedidos_mod.ARCHIVO = archivo
+    pedidos_mod._almacenes.clear()
+    for n in range(inicio, inicio + 25):
+        pedidos_mod.guardar_pedido({'orden': n, 'hora': datetime.now().isoformat()})
+        pedidos_mod.actualizar_pedido({'orden': n, 'masa': 'Gruesa'})
+
+
+def test_varios_procesos_sin_perder_escrituras(tmp_path):
+    import multiprocessing
+    from utils import bloqueo
+    if bloqueo.fcntl is None:
+        pytest.skip("sin fcntl sólo hay bloqueo dentro del proceso")
+    archivo = str(tmp_path / "pedidos.json")
+    ctx = multiprocessing.get_context("spawn")  # procesos nuevos, como varias instancias de la app
+    procs = [ctx.Process(target=_escribir_en_otro_proceso, args=(archivo, i * 100)) for i in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+        assert p.exitcode == 0
+    pedidos_mod.ARCHIVO = archivo
+    todos = pedidos_mod.cargar_pedidos()
+    assert len(todos) == 100 and {p['masa'] for p in todos} == {'Gruesa'}
+
+
+def test_commit_en_grupo_comparte_fsync(tmp_path, monkeypatch):
+    import threading
+    from utils import almacen
+    pedidos_mod.ARCHIVO = str(tmp_path / "pedidos.json")
+    pedidos_mod.guardar_pedido({'orden': 0, 'hora': datetime.now().isoformat()})
+
+    llamadas = []
+    fsync = os.fsync
+    monkeypatch.setattr(almacen.os, "fsync", lambda fd: (llamadas.append(fd), fsync(fd)))
+    barrera = threading.Barrier(20)
+
+    def cajero(n):
+        barrera.wait()
+        pedidos_mod.guardar_pedido({'orden': n, 'hora': datetime.now().isoformat()})
+
+    hilos = [threading.Thread(target=cajero, args=(n,)) for n in range(1, 21)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len(pedidos_mod.cargar_pedidos()) == 21
+    assert len(llamadas) < 10
@@ -0,0 +1,29 @@
+import json
+
+import utils.recetas as rx
+
+
+def test_cache_de_recetas_y_guias(tmp_path, monkeypatch):
+    ruta = tmp_path / "recetas_data.json"
+    monkeypatch.setattr(rx, "DATA_PATH", str(ruta))
+    rx.nueva_version("Hawaiana", "v1", "ana", "", {}, {"temp_c": 220, "tiempo_min": 12}, activar=True)
+
+    lecturas = []
+    original = rx._load_data
+    monkeypatch.setattr(rx, "_load_data", lambda: (lecturas.append(1), original())[1])
+    for _ in range(30):
+        assert rx.guia("Hawaiana") == ("Receta: Hawaiana • Objetivo 220°C • 12 min", 220, 12)
+        assert rx.vigente("Hawaiana").version_id == "v1"
+    assert len(lecturas) <= 1 and rx.guia("Otra") == rx.GUIA_VACIA
+
+    # escribir por la API invalida
+    rx.nueva_version("Hawaiana", "v2", "ana", "", {}, {"temp_c": 250, "tiempo_min": 9}, activar=True)
+    assert rx.guia("Hawaiana")[1] == 250
+    rx.activar_version("Hawaiana", "v1")
+    assert rx.vigente("Hawaiana").version_id == "v1"
+
+    # y también un cambio del archivo por fuera (otro proceso / edición a mano)
+    data = json.loads(ruta.read_text(encoding="utf-8"))
+    data["Hawaiana"][0]["horno"]["temp_c"] = 230
+    ruta.write_text(json.dumps(data, indent=4), encoding="utf-8")
+    assert rx.guia("Hawaiana")[1] == 230
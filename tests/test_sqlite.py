@@ -0,0 +1,70 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import utils.kds as kds_mod
+import utils.pedidos as pedidos_mod
+from utils import almacen_sqlite
+
+
+def test_motor_sqlite_mismas_funciones(tmp_path, monkeypatch):
+    monkeypatch.setattr(pedidos_mod, "MOTOR", "sqlite")
+    monkeypatch.setattr(pedidos_mod, "DB_PATH", str(tmp_path / "barkalove.db"))
+    monkeypatch.setattr(kds_mod, "DATA_PATH", str(tmp_path / "pedidos_data.json"))
+    monkeypatch.setattr(kds_mod, "_pendientes", {})
+
+    pedidos_mod.guardar_pedido({'orden': 1, 'masa': 'Delgada', 'hora': datetime.now().isoformat()})
+    pedidos_mod.guardar_pedido({'orden': 2, 'masa': 'Gruesa', 'hora': datetime.now().isoformat()})
+    pedidos_mod.actualizar_pedido({'orden': 1, 'masa': 'Gruesa'})
+
+    p = pedidos_mod.obtener_pedido(1)
+    assert p['masa'] == 'Gruesa' and p['hora']
+    assert [p['orden'] for p in pedidos_mod.cargar_pedidos()] == [1, 2]
+    assert pedidos_mod.obtener_pedido(99) is None
+    assert [p['orden'] for p in pedidos_mod.pedidos_modificables(5)] == [1, 2]
+    assert pedidos_mod.es_modificable(2)
+    assert [p['orden'] for p in pedidos_mod.iter_pedidos()] == [1, 2]
+
+    # el KDS es una consulta sobre la misma tabla
+    assert kds_mod.listar_pedidos() == []
+    assert kds_mod.actualizar_estado(2, 'Horno')
+    assert not kds_mod.actualizar_estado(99, 'Horno')
+    assert [p['id'] for p in kds_mod.listar_pedidos(estado='Horno')] == [2]
+    kds_mod.vaciar()
+    assert [p['id'] for p in kds_mod.listar_pedidos(estado='Horno')] == [2]
+    assert pedidos_mod.obtener_pedido(2)['estado'] == 'Horno'
+
+
+def test_migracion_desde_json(tmp_path):
+    archivo = tmp_path / "pedidos.json"
+    archivo.write_text(json.dumps([{'orden': 5, 'hora': '2025-10-21T11:07:51'}]), encoding="utf-8")
+    archivo_kds = tmp_path / "kds.json"
+    archivo_kds.write_text(json.dumps([{'id': 5, 'orden': 5, 'estado': 'Listo'}]), encoding="utf-8")
+    db = str(tmp_path / "barkalove.db")
+
+    assert almacen_sqlite.migrar_desde_json(db, str(archivo), str(archivo_kds)) == {"pedidos": 1, "kds": 1}
+    # una sola vez: no duplica si se vuelve a lanzar
+    assert almacen_sqlite.migrar_desde_json(db, str(archivo), str(archivo_kds)) == {"pedidos": 0, "kds": 0}
+    alm = almacen_sqlite.abrir(db)
+    assert alm.obtener(5)['hora'] == '2025-10-21T11:07:51'
+    assert alm.listar('Listo')[0]['orden'] == 5
+
+
+def test_sqlite_reimportar_no_duplica(tmp_path, monkeypatch):
+    import cli
+
+    monkeypatch.setattr(pedidos_mod, "MOTOR", "sqlite")
+    monkeypatch.setattr(pedidos_mod, "DB_PATH", str(tmp_path / "barkalove.db"))
+    lote = tmp_path / "tpv.jsonl"
+    ahora = datetime.now().isoformat()
+    lote.write_text("".join(json.dumps({'orden': n, 'hora': ahora}) + "\n" for n in range(5)), encoding="utf-8")
+
+    assert pedidos_mod.guardar_pedidos_bulk([{'orden': n, 'hora': ahora} for n in range(5)]) == 5
+    assert pedidos_mod.guardar_pedidos_bulk([{'orden': n, 'hora': ahora} for n in range(7)]) == 2
+    cli.main(["importar", str(lote)])  # cierre nocturno re-lanzado
+    # misma clave que el motor JSON: la orden, aunque la hora venga editada
+    assert pedidos_mod.guardar_pedidos_bulk([{'orden': 1, 'hora': '2025-10-23T13:18:45'}]) == 0
+    with pytest.raises(ValueError):
+        pedidos_mod.guardar_pedido({'orden': 0, 'hora': ahora})
+    assert sorted(p['orden'] for p in pedidos_mod.cargar_pedidos()) == list(range(7))
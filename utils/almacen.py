@@ -0,0 +1,947 @@
+# utils/almacen.py
+"""
+Almacén de pedidos con bitácora (journal) de sólo-anexado, particionado por día.
+
+  data/pedidos/2026-10-18.jsonl     snapshot del día (un pedido por línea)
+  data/pedidos/2026-10-18.journal   operaciones desde la última compactación
+  data/pedidos/2026-10-17.jsonl.gz  día anterior ya sellado (comprimido)
+
+El día en curso es la partición "caliente". Las lecturas por rango de fechas
+sólo abren las particiones que el rango toca. El data/pedidos.json de antes
+se reparte en particiones la primera vez; queda intacto y una copia .migrado
+marca que ya se hizo.
+
+Cada alta, edición o cambio de estado de cocina (KDS) anexa una sola
+línea al journal (O(1) por operación). Los cambios de estado llevan su hora
+("ts") y quedan en el pedido como 'transiciones' [[estado, ts], ...], de
+donde utils.metricas rehace los tiempos por etapa al arrancar.
+Al leer se aplica el journal sobre el snapshot. Cuando el journal crece,
+un hilo en segundo plano lo pliega en un snapshot nuevo y lo vacía.
+
+Caché: cada partición mantiene en memoria la lista ya aplicada (como
+utils.modelos.Pedido, compactos; hacia fuera siempre dicts) y un índice por
+'orden'. Antes de cada lectura compara (mtime_ns, size) de ambos archivos
+con os.stat; si sólo creció el journal aplica únicamente las líneas nuevas.
+
+Índice temporal: la 'hora' de cada pedido se convierte una sola vez a epoch
+y se guarda en un arreglo ordenado; "pedidos entre A y B" es un bisect.
+
+Durabilidad: los snapshots se escriben en un temporal con fsync y se
+renombran (os.replace), así que nunca quedan a medias. Cada línea del journal
+lleva su CRC32 ("<crc> <json>"); una cola cortada por un apagón no se aplica
+y la siguiente escritura empieza en línea nueva. Cada operación lleva además
+un número de secuencia ("id") y el snapshot guarda en su primera línea el
+último que incluye ({"_snapshot": {"ultima_op": N}}): si una compactación se
+corta entre el reemplazo del snapshot y el borrado del journal, al re-aplicar
+el journal se saltan las operaciones que ya estaban plegadas. Al arrancar se carga el
+último snapshot y se re-aplica sólo el journal; si es largo se compacta.
+Un snapshot ilegible lanza AlmacenCorrupto en vez de devolver una lista
+vacía (que la siguiente escritura convertiría en historial borrado).
+
+Recorridos completos (informes, exportaciones): iterar() es un generador que
+filtra por estado y rango de hora. Las particiones selladas que no están
+en caché se leen línea a línea sin cargarlas enteras.
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.bloqueo import bloqueo_archivo
+from utils.modelos import Pedido
+
+# Operaciones en el journal a partir de las cuales se compacta en segundo plano
+COMPACTAR_CADA = 200
+
+# fsync del journal tras cada escritura (durable ante cortes de luz)
+SYNC_JOURNAL = True
+
+# Hora a la que cambia el día de negocio (0 = medianoche; 4 = lo vendido hasta
+# las 04:00 cuenta para el día anterior)
+HORA_CORTE = 0
+
+# Comprimir (gzip) las particiones de días ya cerrados al sellarlas
+COMPRIMIR_SELLADAS = True
+
+SIN_FECHA = "sin_fecha"
+_RE_PARTICION = re.compile(r"^(\d{4}-\d{2}-\d{2}|" + SIN_FECHA + r")\.(jsonl|jsonl\.gz|journal)$")
+
+# Campos que una edición conserva del pedido previo si no los trae
+CONSERVAR = ("hora", "estado", "fecha", "transiciones")
+
+# Primera línea de los snapshots .jsonl(.gz): metadatos, no es un pedido
+CABECERA = "_snapshot"
+
+Firma = Optional[Tuple[int, int]]
+Filtro = Callable[[Dict[str, Any]], bool]
+
+
+def pedido_desde_kds(entrada: Dict[str, Any]) -> Dict[str, Any]:
+    """Pedido mínimo a partir de una entrada del KDS legado que no tenía pedido."""
+    pedido = {k: v for k, v in entrada.items() if k != "id"}
+    pedido["orden"] = entrada.get("orden", entrada.get("id"))
+    if not pedido.get("hora") and entrada.get("fecha"):
+        pedido["hora"] = entrada["fecha"].replace(" ", "T")
+    return pedido
+
+
+def epoch(hora) -> Optional[float]:
+    """'hora' ISO -> segundos epoch (None si falta o no se entiende)."""
+    try:
+        return datetime.fromisoformat(hora).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def dia_de(t: Optional[float]) -> str:
+    """Día de negocio (YYYY-MM-DD) de un epoch."""
+    if t is None:
+        return SIN_FECHA
+    return (datetime.fromtimestamp(t) - timedelta(hours=HORA_CORTE)).date().isoformat()
+
+
+class AlmacenCorrupto(Exception):
+    """Un snapshot no se puede leer; no se continúa para no pisar el historial."""
+
+
+def _json_linea(obj: Any) -> str:
+    """Una línea JSON compacta (sin espacios) para snapshots .jsonl y el journal."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def filtro_pedidos(estado: Optional[str] = None, desde: Optional[float] = None,
+                   hasta: Optional[float] = None) -> Optional[Filtro]:
+    """Predicado estado / desde <= hora < hasta (epoch); None si no filtra nada.
+    Sólo usa .get, así que vale para dicts y para Pedido."""
+    if estado is None and desde is None and hasta is None:
+        return None
+
+    def _filtro(p: Dict[str, Any]) -> bool:
+        if estado is not None and p.get("estado") != estado:
+            return False
+        if desde is not None or hasta is not None:
+            t = epoch(p.get("hora"))
+            if t is None or (desde is not None and t < desde) or (hasta is not None and t >= hasta):
+                return False
+        return True
+
+    return _filtro
+
+
+def _registro(op: Dict[str, Any]) -> bytes:
+    """Línea del journal: CRC32 (8 hex) + espacio + JSON compacto."""
+    datos = json.dumps(op, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(datos), datos)
+
+
+def _leer_registro(linea: bytes) -> Optional[Dict[str, Any]]:
+    """Operación de una línea completa del journal; None si está corrupta."""
+    if linea.startswith(b"{"):
+        datos = linea  # journal anterior a los checksums
+    else:
+        crc, _, datos = linea.partition(b" ")
+        try:
+            if int(crc, 16) != zlib.crc32(datos):
+                return None
+        except ValueError:
+            return None
+    try:
+        return json.loads(datos.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+def _fsync_dir(ruta: str) -> None:
+    """Hace durable un rename/alta dentro del directorio (no aplica en Windows)."""
+    try:
+        fd = os.open(os.path.dirname(ruta) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def marcar_migrado(ruta: str) -> None:
+    """
+    Deja ruta + ".migrado" (copia del legado, o vacío si no existe) como marca
+    de migración hecha. El legado no se toca: data/pedidos.json y
+    utils/pedidos_data.json van en el repositorio y un rename los daría por
+    borrados en la copia de trabajo.
+    """
+    datos = b""
+    if os.path.exists(ruta):
+        with open(ruta, "rb") as f:
+            datos = f.read()
+    tmp = ruta + ".migrado.tmp"
+    with open(tmp, "wb") as f:
+        f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta + ".migrado")
+    _fsync_dir(ruta)
+
+
+_grupo = threading.local()
+
+
+@contextmanager
+def commit_en_grupo():
+    """
+    Group commit: dentro del bloque los fsync del journal se aplazan y al
+    salir se hace uno por archivo tocado. El hilo escritor (utils.escritor)
+    ejecuta así los lotes de escrituras que llegan juntas y confirma a todos
+    después del fsync común.
+    """
+    if getattr(_grupo, "rutas", None) is not None:
+        yield  # anidado: manda el grupo de fuera
+        return
+    _grupo.rutas = set()
+    try:
+        yield
+    finally:
+        rutas, _grupo.rutas = _grupo.rutas, None
+        for ruta in rutas:
+            try:
+                fd = os.open(ruta, os.O_RDWR)  # en Windows fsync pide escritura
+            except FileNotFoundError:
+                continue  # compactado entre medias: el snapshot ya hizo fsync
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+def _no_repetida(ordenes, pedido: Dict[str, Any]) -> None:
+    orden = pedido.get("orden")
+    if orden is not None and orden in ordenes:
+        raise ValueError(f"Ya existe un pedido con orden {orden}")
+
+
+def _transicion(pedido: Pedido, estado: str, ts: Optional[float]) -> None:
+    pedido.estado = estado
+    if ts is None:
+        return
+    previas = (pedido.extra or {}).get("transiciones") or []
+    if [estado, ts] in previas:
+        return  # ya aplicada (p.ej. journal re-aplicado): no se duplica
+    # lista nueva: los dicts ya entregados no cambian por debajo
+    extra = dict(pedido.extra or {})
+    extra["transiciones"] = [*previas, [estado, ts]]
+    pedido.extra = extra
+
+
+def _firma(ruta: str) -> Firma:
+    """(mtime_ns, size) del archivo, o None si no existe."""
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class AlmacenJournal:
+    """
+    Una partición: snapshot + journal. El formato del snapshot va por extensión:
+    .json (lista, formato legado), .jsonl o .jsonl.gz (un pedido por línea).
+    """
+
+    def __init__(self, ruta_snapshot: str, ruta_journal: Optional[str] = None, lock=None,
+                 ruta_bloqueo: Optional[str] = None):
+        self.ruta = ruta_snapshot
+        self.ruta_journal = ruta_journal or ruta_snapshot + ".journal"
+        self._lock = lock or threading.RLock()
+        # bloqueo entre procesos (utils.bloqueo) para leer-validar-anexar y compactar
+        self.ruta_bloqueo = ruta_bloqueo or self.ruta_journal
+        self._compactando = False
+        # Caché: lista aplicada + índices; _firmas = (snapshot, journal) vistos
+        self._pedidos: List[Pedido] = []
+        self._pos: Dict[Any, int] = {}    # orden -> posición (primera coincidencia)
+        self._altas = set()               # (orden, hora): re-aplicar altas de journals sin "id"
+        self._ultima_op = 0               # "id" de la última operación aplicada
+        self._tiempos: List[float] = []   # epoch de 'hora', ordenado
+        self._tiempos_pos: List[int] = [] # posición del pedido de cada epoch
+        self._epoch: Dict[int, float] = {}  # posición -> epoch
+        self._firmas: Optional[Tuple[Firma, Firma]] = None
+        self._offset_journal = 0          # bytes del journal ya aplicados
+        self._ops_journal = 0
+        self.estadisticas = {"aciertos": 0, "fallos": 0, "parciales": 0, "corruptas": 0}
+
+    # ===== Caché =====
+    def _reiniciar(self) -> None:
+        self._pedidos, self._pos, self._altas = [], {}, set()
+        self._ultima_op = 0
+        self._tiempos, self._tiempos_pos, self._epoch = [], [], {}
+        self._offset_journal = 0
+        self._ops_journal = 0
+
+    def _indexar_hora(self, i: int, hora) -> None:
+        t = epoch(hora)
+        if t is None:
+            return
+        # lo normal es que llegue al final (pedidos en orden de hora)
+        k = bisect_right(self._tiempos, t)
+        self._tiempos.insert(k, t)
+        self._tiempos_pos.insert(k, i)
+        self._epoch[i] = t
+
+    def _desindexar_hora(self, i: int) -> None:
+        t = self._epoch.pop(i, None)
+        if t is None:
+            return
+        k = bisect_left(self._tiempos, t)
+        while self._tiempos_pos[k] != i:
+            k += 1
+        del self._tiempos[k]
+        del self._tiempos_pos[k]
+
+    def _indexar(self, pedido: Dict[str, Any]) -> None:
+        i = len(self._pedidos)
+        self._pos.setdefault(pedido.get("orden"), i)
+        self._altas.add((pedido.get("orden"), pedido.get("hora")))
+        self._pedidos.append(Pedido.from_dict(pedido))
+        self._indexar_hora(i, pedido.get("hora"))
+
+    def _aplicar(self, op: Dict[str, Any]) -> None:
+        tipo = op.get("op")
+        if tipo == "alta":
+            pedido = op.get("pedido") or {}
+            # con "id" la repetición ya se descartó al leer el journal; las
+            # líneas anteriores a los "id" se comparan por (orden, hora)
+            if op.get("id") is not None or (pedido.get("orden"), pedido.get("hora")) not in self._altas:
+                self._indexar(pedido)
+        elif tipo == "edicion":
+            pedido = op.get("pedido") or {}
+            i = self._pos.get(pedido.get("orden"))
+            if i is not None:
+                if pedido.get("hora") != self._pedidos[i].get("hora"):
+                    self._desindexar_hora(i)
+                    self._indexar_hora(i, pedido.get("hora"))
+                self._pedidos[i] = Pedido.from_dict(pedido)
+        elif tipo == "estado":
+            i = self._pos.get(op.get("orden"))
+            if i is not None:
+                _transicion(self._pedidos[i], op.get("estado"), op.get("ts"))
+        elif tipo == "estados":
+            # varios cambios de estado agrupados en una sola línea: [orden, estado, ts]
+            # (journals anteriores: [orden, estado])
+            for cambio in op.get("cambios") or []:
+                i = self._pos.get(cambio[0])
+                if i is not None:
+                    _transicion(self._pedidos[i], cambio[1], cambio[2] if len(cambio) > 2 else None)
+
+    def _iter_snapshot(self, cabecera: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Pedidos del snapshot; en .jsonl(.gz) uno por línea, sin leer el archivo entero.
+        La cabecera (si la hay) no se devuelve: se copia en `cabecera`."""
+        if not os.path.exists(self.ruta):
+            return
+        if self.ruta.endswith(".json"):
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                txt = f.read().strip()
+            if not txt:
+                return
+            try:
+                pedidos = json.loads(txt)
+            except json.JSONDecodeError as ex:
+                raise AlmacenCorrupto(f"{self.ruta}: {ex}") from ex
+            yield from pedidos
+            return
+        abrir = gzip.open if self.ruta.endswith(".gz") else open
+        try:
+            with abrir(self.ruta, "rt", encoding="utf-8") as f:
+                for linea in f:
+                    linea = linea.strip()
+                    if not linea:
+                        continue
+                    obj = json.loads(linea)
+                    if CABECERA in obj and "orden" not in obj:
+                        if cabecera is not None:
+                            cabecera.update(obj[CABECERA])
+                        continue
+                    yield obj
+        except (json.JSONDecodeError, UnicodeDecodeError, EOFError, OSError) as ex:
+            # el snapshot se escribe atómicamente: si no se lee, está dañado de verdad
+            raise AlmacenCorrupto(f"{self.ruta}: {ex}") from ex
+
+    def _escribir_snapshot(self, destino: str) -> None:
+        """Escritura atómica (tmp + os.replace) en el formato que indica la extensión."""
+        os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+        tmp = destino + ".tmp"
+        if destino.endswith(".json"):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump([p.to_dict() for p in self._pedidos], f, indent=4, ensure_ascii=False)
+        else:
+            abrir = gzip.open if destino.endswith(".gz") else open
+            with abrir(tmp, "wt", encoding="utf-8") as f:
+                f.write(_json_linea({CABECERA: {"ultima_op": self._ultima_op}}))
+                for p in self._pedidos:
+                    f.write(_json_linea(p.to_dict()))
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, destino)
+        _fsync_dir(destino)
+
+    def _aplicar_journal_desde(self, offset: int) -> None:
+        """Aplica las líneas completas del journal a partir de `offset` (en bytes)."""
+        if not os.path.exists(self.ruta_journal):
+            return
+        with open(self.ruta_journal, "rb") as f:
+            f.seek(offset)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea a medio escribir: se aplicará cuando esté completa
+                self._offset_journal += len(linea)
+                linea = linea.strip()
+                if not linea:
+                    continue
+                op = _leer_registro(linea)
+                if op is None:
+                    # cola cortada (apagón) o línea dañada: no se aplica
+                    self.estadisticas["corruptas"] += 1
+                    continue
+                op_id = op.get("id")
+                if op_id is not None:
+                    if op_id <= self._ultima_op:
+                        continue  # ya plegada en el snapshot (compactación cortada)
+                    self._ultima_op = op_id
+                self._aplicar(op)
+                self._ops_journal += 1
+
+    def _refrescar(self) -> None:
+        """Revalida la caché con os.stat; sólo re-lee lo que cambió."""
+        firmas = (_firma(self.ruta), _firma(self.ruta_journal))
+        if firmas == self._firmas:
+            self.estadisticas["aciertos"] += 1
+            return
+        self.estadisticas["fallos"] += 1
+        previas = self._firmas
+        solo_crecio_journal = (
+            previas is not None
+            and firmas[0] == previas[0]
+            and firmas[1] is not None
+            and firmas[1][1] >= self._offset_journal
+        )
+        if solo_crecio_journal:
+            self.estadisticas["parciales"] += 1
+            self._aplicar_journal_desde(self._offset_journal)
+        else:
+            self._reiniciar()
+            cabecera: Dict[str, Any] = {}
+            for p in self._iter_snapshot(cabecera):
+                self._indexar(p)
+            self._ultima_op = cabecera.get("ultima_op", 0)
+            self._aplicar_journal_desde(0)
+        self._firmas = firmas
+        if self._ops_journal >= COMPACTAR_CADA:
+            # arranque con un journal largo: dejarlo listo para el próximo
+            self._quizas_compactar()
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._firmas = None
+
+    def en_memoria(self) -> bool:
+        """True si la partición ya está cargada (o tiene journal y hay que cargarla igual)."""
+        return self._firmas is not None or os.path.exists(self.ruta_journal)
+
+    # ===== Lectura =====
+    def cargar(self) -> List[Dict[str, Any]]:
+        """Copia de la lista aplicada (los dicts se copian para no tocar la caché)."""
+        with self._lock:
+            self._refrescar()
+            return [p.to_dict() for p in self._pedidos]
+
+    def obtener(self, orden) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refrescar()
+            i = self._pos.get(orden)
+            return self._pedidos[i].to_dict() if i is not None else None
+
+    def listar(self, estado: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Pedidos que pasaron a cocina (tienen 'estado'), opcionalmente filtrados."""
+        with self._lock:
+            self._refrescar()
+            return [p.to_dict() for p in self._pedidos if p.get("estado") and (not estado or p.estado == estado)]
+
+    def en_rango(self, desde: Optional[float] = None, hasta: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Pedidos con desde <= hora < hasta (epoch), en orden de hora. O(log n + k)."""
+        with self._lock:
+            self._refrescar()
+            i = 0 if desde is None else bisect_left(self._tiempos, desde)
+            j = len(self._tiempos) if hasta is None else bisect_left(self._tiempos, hasta)
+            return [self._pedidos[k].to_dict() for k in self._tiempos_pos[i:j]]
+
+    def iterar(self, filtro: Optional[Filtro] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Generador de pedidos que cumplen `filtro`. Si la partición ya está en
+        caché o tiene journal se recorre la lista aplicada; si no (día sellado),
+        se lee el snapshot línea a línea sin guardarlo en memoria.
+        """
+        with self._lock:
+            en_cache = self._firmas is not None and self._firmas == (_firma(self.ruta), _firma(self.ruta_journal))
+            if en_cache or os.path.exists(self.ruta_journal):
+                self._refrescar()
+                pedidos = [p.to_dict() for p in self._pedidos if filtro is None or filtro(p)]
+            else:
+                pedidos = None
+        if pedidos is not None:
+            yield from pedidos
+            return
+        for p in self._iter_snapshot():
+            if filtro is None or filtro(p):
+                yield p
+
+    def ordenes(self) -> set:
+        with self._lock:
+            self._refrescar()
+            return set(self._pos)
+
+    def hora_epoch(self, orden) -> Optional[float]:
+        """Epoch ya calculado de la 'hora' del pedido (sin volver a parsear)."""
+        with self._lock:
+            self._refrescar()
+            i = self._pos.get(orden)
+            return self._epoch.get(i) if i is not None else None
+
+    # ===== Escritura =====
+    @contextmanager
+    def _escritura(self):
+        """Lock del proceso + bloqueo de archivo entre procesos; la caché se
+        revalida dentro, así ninguna escritura se basa en datos viejos."""
+        with self._lock, bloqueo_archivo(self.ruta_bloqueo):
+            yield
+
+    def _anexar(self, op: Dict[str, Any]) -> None:
+        """Anexa la operación y la aplica a la caché (que debe estar al día)."""
+        self._anexar_varias([op])
+
+    def _anexar_varias(self, ops: List[Dict[str, Any]]) -> None:
+        """Varias operaciones en una sola escritura (y un solo fsync)."""
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        for op in ops:
+            self._ultima_op += 1  # la caché está al día (bajo el bloqueo): no se repite entre procesos
+            op["id"] = self._ultima_op
+        datos = b"".join(_registro(op) for op in ops)
+        antes = _firma(self.ruta_journal)
+        with open(self.ruta_journal, "ab+") as f:
+            if antes is not None and antes[1] > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # cola cortada por un apagón: se deja como línea propia (inválida)
+                    datos = b"\n" + datos
+            f.write(datos)
+            if SYNC_JOURNAL:
+                f.flush()
+                grupo = getattr(_grupo, "rutas", None)
+                if grupo is None:
+                    os.fsync(f.fileno())
+                else:
+                    grupo.add(self.ruta_journal)  # fsync al cerrar el grupo
+        despues = _firma(self.ruta_journal)
+        for op in ops:
+            self._aplicar(op)
+        self._ops_journal += len(ops)
+        if self._firmas is not None and self._firmas[1] == antes and despues is not None \
+                and despues[1] == (antes[1] if antes else 0) + len(datos):
+            # nadie más escribió entre medias: la caché sigue siendo válida
+            self._offset_journal = despues[1]
+            self._firmas = (self._firmas[0], despues)
+        else:
+            self._firmas = None
+
+    def agregar(self, pedido: Dict[str, Any]) -> None:
+        """Alta de un pedido nuevo; ValueError si la partición ya tiene esa 'orden'."""
+        with self._escritura():
+            self._refrescar()
+            _no_repetida(self._pos, pedido)
+            self._anexar({"op": "alta", "pedido": pedido})
+        self._quizas_compactar()
+
+    def agregar_varios(self, pedidos: List[Dict[str, Any]]) -> int:
+        """Altas en bloque: una sola escritura del journal. Las órdenes ya guardadas
+        se omiten (re-importar no duplica)."""
+        with self._escritura():
+            self._refrescar()
+            vistos = set(self._pos)
+            nuevos = []
+            for p in pedidos:
+                if p.get("orden") not in vistos:
+                    vistos.add(p.get("orden"))
+                    nuevos.append(p)
+            if nuevos:
+                self._anexar_varias([{"op": "alta", "pedido": p} for p in nuevos])
+        self._quizas_compactar()
+        return len(nuevos)
+
+    def actualizar(self, pedido: Dict[str, Any]) -> bool:
+        """Anexa la edición si existe un pedido con esa 'orden'."""
+        with self._escritura():
+            previo = self.obtener(pedido.get("orden"))
+            if previo is None:
+                return False
+            # conservar hora original y estado de cocina si no vienen en el nuevo pedido
+            for k in CONSERVAR:
+                if k not in pedido and k in previo:
+                    pedido[k] = previo[k]
+            self._anexar({"op": "edicion", "pedido": pedido})
+        self._quizas_compactar()
+        return True
+
+    def cambiar_estado(self, orden, estado: str, ts: Optional[float] = None) -> bool:
+        """Anexa el cambio de estado (KDS) si la orden existe; `ts` es la hora de la transición."""
+        with self._escritura():
+            self._refrescar()
+            if orden not in self._pos:
+                return False
+            op = {"op": "estado", "orden": orden, "estado": estado}
+            if ts is not None:
+                op["ts"] = ts
+            self._anexar(op)
+        self._quizas_compactar()
+        return True
+
+    def cambiar_estados(self, cambios: Dict[Any, str],
+                        transiciones: Optional[Dict[Any, List[Tuple[str, float]]]] = None) -> List[Any]:
+        """Varios cambios de estado en una sola escritura; devuelve las órdenes aplicadas.
+        `transiciones` = {orden: [(estado, ts), ...]} por las que pasó hasta llegar a su estado."""
+        transiciones = transiciones or {}
+        with self._escritura():
+            self._refrescar()
+            aplicados = [o for o in cambios if o in self._pos]
+            lineas = []
+            for o in aplicados:
+                if o in transiciones:
+                    lineas.extend([o, e, t] for e, t in transiciones[o])
+                else:
+                    lineas.append([o, cambios[o]])
+            if lineas:
+                self._anexar({"op": "estados", "cambios": lineas})
+        self._quizas_compactar()
+        return aplicados
+
+    def sembrar(self, pedidos: List[Dict[str, Any]]) -> bool:
+        """
+        Escribe la partición de una vez (migración del JSON legado), tal cual,
+        aunque haya órdenes repetidas. Sólo si aún no existe: relanzar la
+        migración no duplica. False si ya existía.
+        """
+        with self._escritura():
+            if os.path.exists(self.ruta) or os.path.exists(self.ruta_journal):
+                return False
+            self._reiniciar()
+            for p in pedidos:
+                self._indexar(p)
+            self._escribir_snapshot(self.ruta)
+            self._firmas = None
+            return True
+
+    # ===== Compactación =====
+    def compactar(self, destino: Optional[str] = None) -> None:
+        """
+        Pliega el journal en un snapshot nuevo (escritura atómica) y lo vacía.
+        Con `destino` se cambia además el formato (p.ej. .jsonl -> .jsonl.gz al sellar).
+        """
+        with self._escritura():
+            destino = destino or self.ruta
+            if not os.path.exists(self.ruta_journal) and destino == self.ruta:
+                return
+            self._refrescar()
+            self._escribir_snapshot(destino)
+            if destino != self.ruta:
+                if os.path.exists(self.ruta):
+                    os.remove(self.ruta)
+                self.ruta = destino
+            # Si se corta aquí, el journal se re-aplica de forma idempotente
+            if os.path.exists(self.ruta_journal):
+                os.remove(self.ruta_journal)
+            self._ops_journal = 0
+            self._offset_journal = 0
+            self._firmas = (_firma(self.ruta), None)
+
+    def _quizas_compactar(self) -> None:
+        if self._ops_journal < COMPACTAR_CADA:
+            return
+        with self._lock:
+            if self._compactando:
+                return
+            self._compactando = True
+
+        def _tarea():
+            try:
+                self.compactar()
+            finally:
+                self._compactando = False
+
+        threading.Thread(target=_tarea, name="compactar-pedidos", daemon=True).start()
+
+
+class AlmacenParticionado:
+    """
+    Pedidos repartidos en una partición por día de negocio (ver docstring del módulo).
+    Expone la misma interfaz que AlmacenJournal / AlmacenSqlite.
+    """
+
+    def __init__(self, ruta_legado: str):
+        self.ruta_legado = ruta_legado
+        self.dir = os.path.splitext(ruta_legado)[0]
+        self._lock = threading.RLock()
+        self._particiones: Dict[str, AlmacenJournal] = {}
+        self._dias_cache: Optional[Tuple[Firma, List[str]]] = None
+        self._legado_revisado = False
+        self._dia_sellado: Optional[str] = None
+        # órdenes de cada día sellado fuera de caché: día -> (firma del snapshot, órdenes)
+        self._ordenes_selladas: Dict[str, Tuple[Firma, frozenset]] = {}
+
+    # ===== Particiones =====
+    def _rutas(self, dia: str) -> Tuple[str, str]:
+        base = os.path.join(self.dir, dia)
+        snap = base + ".jsonl.gz" if os.path.exists(base + ".jsonl.gz") else base + ".jsonl"
+        return snap, base + ".journal"
+
+    def _particion(self, dia: str) -> AlmacenJournal:
+        snap, journal = self._rutas(dia)
+        part = self._particiones.get(dia)
+        if part is None:
+            part = self._particiones[dia] = AlmacenJournal(snap, journal, lock=self._lock, ruta_bloqueo=self.dir)
+        elif part.ruta != snap:
+            # otro proceso la selló (.jsonl -> .jsonl.gz)
+            part.ruta = snap
+            part.invalidar()
+        return part
+
+    def _dias(self) -> List[str]:
+        """Días con partición en disco, ordenados (sin_fecha primero). Cachea por mtime del directorio."""
+        firma_dir = _firma(self.dir)
+        if self._dias_cache is not None and self._dias_cache[0] == firma_dir:
+            return self._dias_cache[1]
+        dias = set()
+        if firma_dir is not None:
+            for nombre in os.listdir(self.dir):
+                m = _RE_PARTICION.match(nombre)
+                if m:
+                    dias.add(m.group(1))
+        orden = sorted(dias - {SIN_FECHA})
+        if SIN_FECHA in dias:
+            orden.insert(0, SIN_FECHA)
+        self._dias_cache = (firma_dir, orden)
+        return orden
+
+    def _preparar(self) -> None:
+        """Primera vez: migrar el JSON legado. En cada cambio de día: sellar los anteriores."""
+        if not self._legado_revisado:
+            self._migrar_legado()  # si el legado está dañado lanza y se reintenta
+            self._legado_revisado = True
+        hoy = dia_de(datetime.now().timestamp())
+        if self._dia_sellado != hoy:
+            self._dia_sellado = hoy
+            threading.Thread(target=self.sellar, args=(hoy,), name="sellar-pedidos", daemon=True).start()
+
+    def _migrar_legado(self) -> None:
+        legado = AlmacenJournal(self.ruta_legado)
+        if os.path.exists(legado.ruta + ".migrado"):
+            return
+        if not (os.path.exists(legado.ruta) or os.path.exists(legado.ruta_journal)):
+            return
+        por_dia: Dict[str, List[Dict[str, Any]]] = {}
+        for p in legado.cargar():
+            por_dia.setdefault(dia_de(epoch(p.get("hora"))), []).append(p)
+        for dia, grupo in por_dia.items():
+            # tal cual (órdenes repetidas incluidas); un día ya sembrado por un
+            # intento anterior se deja, así se puede re-lanzar
+            self._particion(dia).sembrar(grupo)
+        marcar_migrado(legado.ruta)  # la marca va al final: un corte antes re-lanza la migración
+
+    def _ordenes_de(self, dia: str, part: AlmacenJournal) -> frozenset:
+        """Órdenes de un día sellado, leídas en streaming (sin cargar la partición);
+        se recuerdan mientras su snapshot no cambie."""
+        firma = _firma(part.ruta)
+        previo = self._ordenes_selladas.get(dia)
+        if previo is None or previo[0] != firma:
+            previo = self._ordenes_selladas[dia] = (firma, frozenset(p.get("orden") for p in part._iter_snapshot()))
+        return previo[1]
+
+    def _ordenes(self) -> set:
+        """Todas las órdenes guardadas (los días sellados sin cargar, por su conjunto)."""
+        res: set = set()
+        for dia in self._dias():
+            part = self._particion(dia)
+            res |= part.ordenes() if part.en_memoria() else self._ordenes_de(dia, part)
+        return res
+
+    def _buscar(self, orden) -> Tuple[Optional[AlmacenJournal], Optional[Dict[str, Any]]]:
+        """
+        (partición, pedido) de la orden: primero las más recientes (las más
+        consultadas). Los días sellados que no están en memoria se consultan en
+        su conjunto de órdenes, así una orden inexistente no los carga todos.
+        """
+        for dia in reversed(self._dias()):
+            part = self._particion(dia)
+            if not part.en_memoria() and orden not in self._ordenes_de(dia, part):
+                continue
+            pedido = part.obtener(orden)
+            if pedido is not None:
+                return part, pedido
+        return None, None
+
+    def sellar(self, hoy: Optional[str] = None) -> None:
+        """Compacta (y comprime si COMPRIMIR_SELLADAS) las particiones de días ya cerrados."""
+        hoy = hoy or dia_de(datetime.now().timestamp())
+        with self._lock:
+            dias = [d for d in self._dias() if d < hoy and d != SIN_FECHA]
+        for dia in dias:
+            with self._lock:
+                part = self._particion(dia)
+                destino = os.path.join(self.dir, dia + (".jsonl.gz" if COMPRIMIR_SELLADAS else ".jsonl"))
+                if part.ruta != destino or os.path.exists(part.ruta_journal):
+                    part.compactar(destino)
+
+    # ===== Lectura =====
+    def cargar(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._preparar()
+            res: List[Dict[str, Any]] = []
+            for dia in self._dias():
+                res.extend(self._particion(dia).cargar())
+            return res
+
+    def obtener(self, orden) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._preparar()
+            return self._buscar(orden)[1]
+
+    def listar(self, estado: Optional[str] = None, dias: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Pedidos en cocina; con `dias` sólo se abren las particiones de los últimos `dias` días."""
+        with self._lock:
+            self._preparar()
+            res: List[Dict[str, Any]] = []
+            for dia in self._dias_recientes(dias):
+                res.extend(self._particion(dia).listar(estado))
+            return res
+
+    def _dias_recientes(self, dias: Optional[int]) -> List[str]:
+        todos = self._dias()
+        if dias is None:
+            return todos
+        desde = dia_de(datetime.now().timestamp() - (dias - 1) * 86400)
+        return [d for d in todos if d != SIN_FECHA and d >= desde]
+
+    def firma(self, dias: Optional[int] = None) -> Tuple:
+        """
+        Firma en disco (snapshot + journal) de las particiones de los últimos
+        `dias` días: cambia con cualquier escritura, también de otro proceso.
+        Sólo hace stat, no abre nada.
+        """
+        with self._lock:
+            res = [_firma(self.dir)]
+            for dia in self._dias_recientes(dias):
+                res.extend(_firma(r) for r in self._rutas(dia))
+            return tuple(res)
+
+    def en_rango(self, desde: Optional[float] = None, hasta: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Sólo abre las particiones cuyos días caen en el rango."""
+        with self._lock:
+            self._preparar()
+            d0 = dia_de(desde) if desde is not None else ""
+            d1 = dia_de(hasta) if hasta is not None else "9999"
+            res: List[Dict[str, Any]] = []
+            for dia in self._dias():
+                if dia != SIN_FECHA and d0 <= dia <= d1:
+                    res.extend(self._particion(dia).en_rango(desde, hasta))
+            return res
+
+    def iterar(self, estado: Optional[str] = None, desde: Optional[float] = None,
+               hasta: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Generador por días (y en orden de alta dentro de cada día); sólo abre los días del rango."""
+        filtro = filtro_pedidos(estado, desde, hasta)
+        with self._lock:
+            self._preparar()
+            d0 = dia_de(desde) if desde is not None else ""
+            d1 = dia_de(hasta) if hasta is not None else "9999"
+            rango = desde is not None or hasta is not None
+            dias = [d for d in self._dias() if not rango or (d != SIN_FECHA and d0 <= d <= d1)]
+        for dia in dias:
+            with self._lock:
+                part = self._particion(dia)
+            yield from part.iterar(filtro)
+
+    def hora_epoch(self, orden) -> Optional[float]:
+        with self._lock:
+            self._preparar()
+            part, _ = self._buscar(orden)
+            return part.hora_epoch(orden) if part else None
+
+    @property
+    def estadisticas(self) -> Dict[str, int]:
+        total = {"aciertos": 0, "fallos": 0, "parciales": 0, "corruptas": 0, "particiones_abiertas": len(self._particiones)}
+        for part in list(self._particiones.values()):
+            for k, v in part.estadisticas.items():
+                total[k] += v
+        return total
+
+    # ===== Escritura =====
+    def agregar(self, pedido: Dict[str, Any]) -> None:
+        """ValueError si la orden ya existe (en cualquier día; la partición lo
+        vuelve a comprobar bajo su bloqueo)."""
+        with self._lock:
+            self._preparar()
+            if pedido.get("orden") is not None and self._buscar(pedido.get("orden"))[0] is not None:
+                _no_repetida({pedido.get("orden")}, pedido)
+            part = self._particion(dia_de(epoch(pedido.get("hora"))))
+        part.agregar(pedido)
+
+    def agregar_varios(self, pedidos) -> int:
+        """Altas en bloque (un iterable, una pasada): una escritura por día tocado.
+        Las órdenes ya guardadas en otro día (hora editada) también se omiten."""
+        por_dia: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            self._preparar()
+            guardadas = self._ordenes()
+            for p in pedidos:
+                if p.get("orden") is None or p.get("orden") not in guardadas:
+                    por_dia.setdefault(dia_de(epoch(p.get("hora"))), []).append(p)
+            partes = [(self._particion(dia), grupo) for dia, grupo in sorted(por_dia.items())]
+        return sum(part.agregar_varios(grupo) for part, grupo in partes)
+
+    def actualizar(self, pedido: Dict[str, Any]) -> bool:
+        """La edición va a la partición donde está el pedido (aunque cambie su hora)."""
+        with self._lock:
+            self._preparar()
+            part, _ = self._buscar(pedido.get("orden"))
+            return part.actualizar(pedido) if part else False
+
+    def cambiar_estado(self, orden, estado: str, ts: Optional[float] = None) -> bool:
+        with self._lock:
+            self._preparar()
+            part, _ = self._buscar(orden)
+            return part.cambiar_estado(orden, estado, ts) if part else False
+
+    def cambiar_estados(self, cambios: Dict[Any, str],
+                        transiciones: Optional[Dict[Any, List[Tuple[str, float]]]] = None) -> List[Any]:
+        """Agrupa los cambios por partición: una escritura por partición tocada."""
+        with self._lock:
+            self._preparar()
+            grupos: Dict[int, Tuple[AlmacenJournal, Dict[Any, str]]] = {}
+            for orden, estado in cambios.items():
+                part, _ = self._buscar(orden)
+                if part is not None:
+                    grupos.setdefault(id(part), (part, {}))[1][orden] = estado
+        aplicados: List[Any] = []
+        for part, grupo in grupos.values():
+            aplicados.extend(part.cambiar_estados(grupo, transiciones))
+        return aplicados
+
+    def compactar(self) -> None:
+        with self._lock:
+            self._preparar()
+            for dia in self._dias():
+                self._particion(dia).compactar()
+        self.sellar()
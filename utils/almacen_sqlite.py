@@ -0,0 +1,319 @@
+# utils/almacen_sqlite.py
+"""
+Motor opcional SQLite (stdlib sqlite3, modo WAL) para pedidos y KDS.
+
+Una sola tabla `pedidos`; el estado de cocina es una columna indexada
+y el KDS es una consulta sobre ella.
+
+Se activa con la variable de entorno BARKA_MOTOR=sqlite. Las funciones de
+utils.pedidos y utils.kds no cambian; por debajo las búsquedas por orden/id,
+los filtros por estado y los rangos por hora pasan a ser consultas por índice.
+
+Migración única desde los JSON actuales:
+
+    python -m utils.almacen_sqlite
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils.almacen import CONSERVAR, dia_de, epoch, pedido_desde_kds
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    rowid  INTEGER PRIMARY KEY AUTOINCREMENT,
+    orden  INTEGER,
+    estado TEXT,
+    hora   TEXT,
+    datos  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_pedidos_orden ON pedidos(orden);
+CREATE INDEX IF NOT EXISTS ix_pedidos_hora  ON pedidos(hora);
+"""
+
+# Migración: tal cual, órdenes repetidas incluidas (como el legado en JSON)
+_INSERTAR = "INSERT INTO pedidos (orden, estado, hora, datos) VALUES (?, ?, ?, ?)"
+# Altas: una orden ya guardada no se vuelve a insertar (misma clave que el motor JSON)
+_INSERTAR_NUEVO = (
+    "INSERT INTO pedidos (orden, estado, hora, datos) SELECT ?1, ?2, ?3, ?4 "
+    "WHERE NOT EXISTS (SELECT 1 FROM pedidos WHERE orden = ?1)"
+)
+# Fila de una orden (la primera si se repite)
+_POR_ORDEN = "rowid = (SELECT rowid FROM pedidos WHERE orden = ? ORDER BY rowid LIMIT 1)"
+
+
+def _dump(d: Dict[str, Any]) -> str:
+    return json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+
+
+class AlmacenSqlite:
+    def __init__(self, ruta_db: str):
+        self.ruta = ruta_db
+        os.makedirs(os.path.dirname(ruta_db) or ".", exist_ok=True)
+        # Una conexión por proceso; las pantallas de Flet llaman desde varios hilos
+        self._con = sqlite3.connect(ruta_db, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        with self._lock:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+            self._con.executescript(_ESQUEMA)
+            self._actualizar_esquema()
+
+    def _actualizar_esquema(self) -> None:
+        """Bases creadas antes de unificar: añade la columna estado y pliega la tabla kds."""
+        columnas = {c[1] for c in self._con.execute("PRAGMA table_info(pedidos)")}
+        if "estado" not in columnas:
+            self._con.execute("ALTER TABLE pedidos ADD COLUMN estado TEXT")
+        self._con.execute("CREATE INDEX IF NOT EXISTS ix_pedidos_estado ON pedidos(estado)")
+        # la unicidad por (orden, hora) dejaba pasar una reimportación con la hora
+        # editada; ahora las altas comprueban la orden (_INSERTAR_NUEVO)
+        self._con.execute("DROP INDEX IF EXISTS ux_pedidos_orden_hora")
+        existe_kds = self._con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kds'"
+        ).fetchone()
+        if existe_kds:
+            filas = self._con.execute("SELECT datos, estado FROM kds ORDER BY rowid").fetchall()
+            self.importar([], [self._fila(d, e) for d, e in filas])
+            self._con.execute("DROP TABLE kds")
+
+    @staticmethod
+    def _fila(datos: str, estado: Optional[str]) -> Dict[str, Any]:
+        d = json.loads(datos)
+        if estado is not None:
+            d["estado"] = estado  # la columna manda: cambiar_estado no reescribe 'datos'
+        return d
+
+    # ===== Pedidos =====
+    def cargar(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            filas = self._con.execute("SELECT datos, estado FROM pedidos ORDER BY rowid").fetchall()
+        return [self._fila(d, e) for d, e in filas]
+
+    def obtener(self, orden) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT datos, estado FROM pedidos WHERE orden = ? ORDER BY rowid LIMIT 1", (orden,)
+            ).fetchone()
+        return self._fila(*fila) if fila else None
+
+    def listar(self, estado: Optional[str] = None, dias: Optional[int] = None) -> List[Dict[str, Any]]:
+        cond, args = ("estado = ?", [estado]) if estado else ("estado IS NOT NULL", [])
+        if dias is not None:
+            cond += " AND hora >= ?"
+            args.append(dia_de(datetime.now().timestamp() - (dias - 1) * 86400))
+        with self._lock:
+            filas = self._con.execute(
+                f"SELECT datos, estado FROM pedidos WHERE {cond} ORDER BY rowid", args
+            ).fetchall()
+        return [self._fila(d, e) for d, e in filas]
+
+    def en_rango(self, desde: Optional[float] = None, hasta: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Pedidos con desde <= hora < hasta (epoch); usa el índice sobre 'hora' (ISO ordena bien)."""
+        desde_iso = datetime.fromtimestamp(desde).isoformat() if desde is not None else ""
+        cond, args = "hora >= ?", [desde_iso]
+        if hasta is not None:
+            cond += " AND hora < ?"
+            args.append(datetime.fromtimestamp(hasta).isoformat())
+        with self._lock:
+            filas = self._con.execute(
+                f"SELECT datos, estado FROM pedidos WHERE {cond} ORDER BY hora", args
+            ).fetchall()
+        return [self._fila(d, e) for d, e in filas]
+
+    def iterar(self, estado: Optional[str] = None, desde: Optional[float] = None,
+               hasta: Optional[float] = None, lote: int = 500) -> Iterator[Dict[str, Any]]:
+        """Generador con los filtros en el WHERE; lee por lotes de `lote` filas."""
+        cond, args = ["rowid > ?"], [0]
+        if estado is not None:
+            cond.append("estado = ?")
+            args.append(estado)
+        if desde is not None:
+            cond.append("hora >= ?")
+            args.append(datetime.fromtimestamp(desde).isoformat())
+        if hasta is not None:
+            cond.append("hora < ?")
+            args.append(datetime.fromtimestamp(hasta).isoformat())
+        sql = f"SELECT rowid, datos, estado FROM pedidos WHERE {' AND '.join(cond)} ORDER BY rowid LIMIT {int(lote)}"
+        while True:
+            # el lock no se retiene entre lotes (paginación por rowid)
+            with self._lock:
+                filas = self._con.execute(sql, args).fetchall()
+            for _, d, e in filas:
+                yield self._fila(d, e)
+            if len(filas) < lote:
+                return
+            args[0] = filas[-1][0]
+
+    def hora_epoch(self, orden) -> Optional[float]:
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT hora FROM pedidos WHERE orden = ? ORDER BY rowid LIMIT 1", (orden,)
+            ).fetchone()
+        return epoch(fila[0]) if fila else None
+
+    def agregar(self, pedido: Dict[str, Any]) -> None:
+        """ValueError si la orden ya existe."""
+        with self._lock:
+            cur = self._con.execute(
+                _INSERTAR_NUEVO, (pedido.get("orden"), pedido.get("estado"), pedido.get("hora"), _dump(pedido))
+            )
+        if cur.rowcount == 0:
+            raise ValueError(f"Ya existe un pedido con orden {pedido.get('orden')}")
+
+    def agregar_varios(self, pedidos) -> int:
+        """Altas en bloque en una sola transacción. Las ya existentes se omiten; devuelve cuántas entraron."""
+        filas = [(p.get("orden"), p.get("estado"), p.get("hora"), _dump(p)) for p in pedidos]
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                antes = self._con.total_changes
+                self._con.executemany(_INSERTAR_NUEVO, filas)
+                nuevas = self._con.total_changes - antes
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return nuevas
+
+    def actualizar(self, pedido: Dict[str, Any]) -> bool:
+        with self._lock:
+            fila = self._con.execute(
+                "SELECT rowid, datos, estado FROM pedidos WHERE orden = ? ORDER BY rowid LIMIT 1",
+                (pedido.get("orden"),),
+            ).fetchone()
+            if fila is None:
+                return False
+            rowid, previo = fila[0], self._fila(fila[1], fila[2])
+            # conservar hora original y estado de cocina si no vienen en el nuevo pedido
+            for k in CONSERVAR:
+                if k not in pedido and k in previo:
+                    pedido[k] = previo[k]
+            self._con.execute(
+                "UPDATE pedidos SET estado = ?, hora = ?, datos = ? WHERE rowid = ?",
+                (pedido.get("estado"), pedido.get("hora"), _dump(pedido), rowid),
+            )
+            return True
+
+    def cambiar_estado(self, orden, estado: str, ts: Optional[float] = None) -> bool:
+        with self._lock:
+            if ts is None:
+                cur = self._con.execute(f"UPDATE pedidos SET estado = ? WHERE {_POR_ORDEN}", (estado, orden))
+            else:
+                # la transición queda en el pedido, como en el journal
+                cur = self._con.execute(
+                    "UPDATE pedidos SET estado = ?, datos = json_set(datos, '$.transiciones', json_insert("
+                    "coalesce(json_extract(datos, '$.transiciones'), json('[]')), '$[#]', json_array(?, ?)))"
+                    f" WHERE {_POR_ORDEN}",
+                    (estado, estado, ts, orden),
+                )
+            return cur.rowcount > 0
+
+    def cambiar_estados(self, cambios: Dict[Any, str],
+                        transiciones: Optional[Dict[Any, List[Tuple[str, float]]]] = None) -> List[Any]:
+        """Varios cambios de estado en una sola transacción; devuelve las órdenes aplicadas."""
+        transiciones = transiciones or {}
+        aplicados: List[Any] = []
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                for orden, estado in cambios.items():
+                    pasos = transiciones.get(orden) or [(estado, None)]
+                    if all([self.cambiar_estado(orden, e, t) for e, t in pasos]):
+                        aplicados.append(orden)
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+        return aplicados
+
+    def firma(self, dias: Optional[int] = None) -> Tuple[int, int]:
+        """Cambia con cada escritura: data_version (otras conexiones) + total_changes (ésta)."""
+        with self._lock:
+            return self._con.execute("PRAGMA data_version").fetchone()[0], self._con.total_changes
+
+    def compactar(self) -> None:
+        """Equivalente a la compactación del journal: checkpoint del WAL."""
+        with self._lock:
+            self._con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ===== Migración =====
+    def vacio(self) -> bool:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0] == 0
+
+    def importar(self, pedidos: List[Dict[str, Any]], kds: List[Dict[str, Any]]) -> None:
+        """
+        Inserta los pedidos y pliega las entradas KDS sobre ellos (estado/fecha),
+        todo en una sola transacción. Entradas KDS sin pedido se dan de alta.
+        """
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                self._con.executemany(
+                    _INSERTAR, [(p.get("orden"), p.get("estado"), p.get("hora"), _dump(p)) for p in pedidos]
+                )
+                for k in kds:
+                    orden = k.get("orden", k.get("id"))
+                    fila = self._con.execute(
+                        "SELECT rowid, datos FROM pedidos WHERE orden = ? ORDER BY rowid LIMIT 1", (orden,)
+                    ).fetchone()
+                    if fila is None:
+                        nuevo = pedido_desde_kds(k)
+                        self._con.execute(_INSERTAR, (orden, nuevo.get("estado"), nuevo.get("hora"), _dump(nuevo)))
+                    else:
+                        d = json.loads(fila[1])
+                        d["fecha"] = k.get("fecha")
+                        self._con.execute(
+                            "UPDATE pedidos SET estado = ?, datos = ? WHERE rowid = ?",
+                            (k.get("estado"), _dump(d), fila[0]),
+                        )
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+
+_almacenes: Dict[str, AlmacenSqlite] = {}
+_almacenes_lock = threading.Lock()
+
+
+def abrir(ruta_db: str) -> AlmacenSqlite:
+    """Devuelve el almacén (una conexión compartida) para la ruta dada."""
+    with _almacenes_lock:
+        alm = _almacenes.get(ruta_db)
+        if alm is None:
+            alm = _almacenes[ruta_db] = AlmacenSqlite(ruta_db)
+        return alm
+
+
+def migrar_desde_json(ruta_db: str, archivo_pedidos: str, archivo_kds: str) -> Dict[str, int]:
+    """
+    Migración única: copia los pedidos en JSON (particiones diarias o el
+    data/pedidos.json legado) a SQLite y pliega
+    el JSON legado del KDS (estado de cocina) sobre esos pedidos.
+    Si la base ya tiene datos no hace nada (para no duplicar).
+    """
+    from utils.almacen import AlmacenParticionado
+
+    alm = abrir(ruta_db)
+    if not alm.vacio():
+        return {"pedidos": 0, "kds": 0}
+
+    pedidos = AlmacenParticionado(archivo_pedidos).cargar()
+    kds: List[Dict[str, Any]] = []
+    if os.path.exists(archivo_kds):
+        with open(archivo_kds, "r", encoding="utf-8") as f:
+            kds = json.load(f)
+    alm.importar(pedidos, kds)
+    return {"pedidos": len(pedidos), "kds": len(kds)}
+
+
+if __name__ == "__main__":
+    import utils.kds as _kds
+    import utils.pedidos as _pedidos
+
+    res = migrar_desde_json(_pedidos.DB_PATH, _pedidos.ARCHIVO, _kds.DATA_PATH)
+    print(f"Migrados {res['pedidos']} pedidos y {res['kds']} entradas KDS a {_pedidos.DB_PATH}")
@@ -0,0 +1,212 @@
+# utils/bitacora.py
+"""
+Escritor de log en segundo plano (para utils/logs/coccion.log).
+
+escribir() sólo encola la línea (cola acotada, nunca bloquea al event loop
+que mueve CoccionController.run). Un hilo toma lo que haya en la cola y lo
+escribe de una vez con el archivo ya abierto; hace flush al vaciarse la cola
+o cada INTERVALO_S con carga sostenida.
+
+  - Rotación por tamaño: coccion.log -> coccion.log.1 -> ... (RESPALDOS).
+  - Si la cola se llena las líneas se descartan y se cuentan; la próxima
+    escritura deja constancia ("LOG_DESCARTADAS | N mensajes").
+  - vaciar() espera a que lo encolado esté en disco (también al salir).
+  - al_escribir(pares) recibe [(offset, línea)] de cada trozo ya escrito y
+    con flush (lo usa el índice de utils.diario_coccion); al_rotar() avisa
+    de que el archivo vuelve a empezar; al_arrancar() corre en el hilo antes
+    de la primera escritura (p.ej. cargar ese índice sin tocar al que encola).
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAX_COLA = 10_000
+MAX_LOTE = 500
+INTERVALO_S = 0.5
+MAX_BYTES = 5 * 1024 * 1024
+RESPALDOS = 3
+
+
+class Bitacora:
+    def __init__(self, ruta: str, max_bytes: int = MAX_BYTES, respaldos: int = RESPALDOS,
+                 max_cola: int = MAX_COLA, intervalo_s: float = INTERVALO_S,
+                 al_escribir: Optional[Callable[[List[Tuple[int, str]]], None]] = None,
+                 al_rotar: Optional[Callable[[], None]] = None,
+                 al_arrancar: Optional[Callable[[], None]] = None,
+                 aviso_descartes: Optional[Callable[[int], str]] = None):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self.respaldos = respaldos
+        self.intervalo_s = intervalo_s
+        self.al_escribir = al_escribir
+        self.al_rotar = al_rotar
+        self.al_arrancar = al_arrancar
+        self.aviso_descartes = aviso_descartes or _aviso_descartes
+        self._cola: "queue.Queue[object]" = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self._f = None
+        self.escritas = 0
+        self.descartadas = 0
+        self.rotaciones = 0
+        self._descartes_sin_avisar = 0
+
+    def _arrancar(self) -> None:
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="bitacora", daemon=True)
+                self._hilo.start()
+
+    def escribir(self, linea: str) -> bool:
+        """Encola `linea` (con su salto de línea). False si se descartó por cola llena."""
+        if self._hilo is None:
+            self._arrancar()
+        try:
+            self._cola.put_nowait(linea)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.descartadas += 1
+                self._descartes_sin_avisar += 1
+            return False
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté escrito."""
+        if self._hilo is None or not self._hilo.is_alive():
+            return True
+        hecho = threading.Event()
+        try:
+            self._cola.put(hecho, timeout=timeout)
+        except queue.Full:
+            return False
+        return hecho.wait(timeout)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"escritas": self.escritas, "descartadas": self.descartadas,
+                "en_cola": self._cola.qsize(), "rotaciones": self.rotaciones}
+
+    # ---- hilo escritor ----
+    def _bucle(self) -> None:
+        if self.al_arrancar is not None:
+            try:
+                self.al_arrancar()
+            except Exception:
+                pass  # sin el preparativo se sigue escribiendo (el log importa más)
+        ultimo_flush = time.monotonic()
+        while True:
+            try:
+                primero = self._cola.get(timeout=self.intervalo_s)
+            except queue.Empty:
+                continue
+            lote, avisos = [], []
+            item = primero
+            while True:
+                (avisos if isinstance(item, threading.Event) else lote).append(item)
+                if len(lote) >= MAX_LOTE:
+                    break
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if lote:
+                    self._escribir_lote(lote)
+                if self._f is not None and (self._cola.empty() or avisos
+                                            or time.monotonic() - ultimo_flush >= self.intervalo_s):
+                    self._f.flush()
+                    ultimo_flush = time.monotonic()
+            except OSError:
+                # disco lleno, archivo bloqueado...: el lote se pierde (y se cuenta), se reabre en el siguiente
+                with self._lock:
+                    self.descartadas += len(lote)
+                self._cerrar_archivo()
+            for ev in avisos:
+                ev.set()
+
+    def _escribir_lote(self, lote) -> None:
+        with self._lock:
+            perdidas, self._descartes_sin_avisar = self._descartes_sin_avisar, 0
+        if perdidas:
+            lote.insert(0, self.aviso_descartes(perdidas))
+        f = self._archivo()
+        if not self.max_bytes and self.al_escribir is None:
+            f.write("".join(lote))
+        else:
+            # el lote se parte donde toque rotar (un write por trozo)
+            tam, trozo = f.tell(), []
+            for linea in lote:
+                n = len(linea.encode("utf-8"))
+                if self.max_bytes and tam and tam + n > self.max_bytes:
+                    self._volcar(f, trozo)
+                    self._rotar()
+                    f, tam, trozo = self._archivo(), 0, []
+                trozo.append((tam, linea))
+                tam += n
+            self._volcar(f, trozo)
+        self.escritas += len(lote)
+
+    def _volcar(self, f, trozo) -> None:
+        f.write("".join(linea for _, linea in trozo))
+        if self.al_escribir is not None and trozo:
+            f.flush()  # quien lea por offset tiene que encontrar la línea
+            self.al_escribir(trozo)
+
+    def _archivo(self):
+        if self._f is None:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            # con índice por offset no se traducen los saltos de línea (Windows: \r\n)
+            nl = "" if self.al_escribir is not None else None
+            self._f = open(self.ruta, "a", encoding="utf-8", newline=nl)
+        return self._f
+
+    def _cerrar_archivo(self) -> None:
+        if self._f is not None:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            self._f = None
+
+    def _rotar(self) -> None:
+        self._cerrar_archivo()
+        for i in range(self.respaldos - 1, 0, -1):
+            origen = f"{self.ruta}.{i}"
+            if os.path.exists(origen):
+                os.replace(origen, f"{self.ruta}.{i + 1}")
+        if self.respaldos:
+            os.replace(self.ruta, f"{self.ruta}.1")
+        else:
+            os.remove(self.ruta)
+        self.rotaciones += 1
+        if self.al_rotar is not None:
+            self.al_rotar()
+
+
+def _aviso_descartes(perdidas: int) -> str:
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{ts}] LOG_DESCARTADAS | {perdidas} mensajes (cola llena)\n"
+
+
+_bitacoras: Dict[str, Bitacora] = {}
+_bitacoras_lock = threading.Lock()
+
+
+def bitacora(ruta: str, **opciones) -> Bitacora:
+    """Una por archivo (y por proceso); `opciones` sólo cuentan al crearla."""
+    with _bitacoras_lock:
+        b = _bitacoras.get(ruta)
+        if b is None:
+            b = _bitacoras[ruta] = Bitacora(ruta, **opciones)
+        return b
+
+
+def vaciar_todas() -> None:
+    for b in list(_bitacoras.values()):
+        b.vaciar()
+
+
+atexit.register(vaciar_todas)
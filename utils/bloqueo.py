@@ -0,0 +1,43 @@
+# utils/bloqueo.py
+"""
+Bloqueo de archivo entre procesos (advisory, fcntl.flock).
+
+En Windows no hay fcntl: el bloqueo queda sólo dentro del proceso
+(threading.Lock por ruta), que es el caso de un único servidor Flet.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_local(ruta: str) -> threading.Lock:
+    with _locks_lock:
+        lk = _locks.get(ruta)
+        if lk is None:
+            lk = _locks[ruta] = threading.Lock()
+        return lk
+
+
+@contextmanager
+def bloqueo_archivo(ruta: str):
+    """Exclusión mutua sobre `ruta`.lock entre hilos y, si hay fcntl, entre procesos."""
+    ruta_lock = ruta + ".lock"
+    with _lock_local(ruta_lock):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(ruta_lock) or ".", exist_ok=True)
+        with open(ruta_lock, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
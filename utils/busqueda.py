@@ -0,0 +1,112 @@
+# utils/busqueda.py
+"""
+Índice en memoria para la búsqueda del KDS (#orden o cliente).
+
+  - Número de orden: búsqueda por prefijo sobre los ids ordenados (bisect).
+  - Cliente: n-gramas (1 a 3 letras) del nombre normalizado (sin acentos,
+    en minúsculas). Una consulta corta es una sola búsqueda en el dict; una
+    larga intersecta sus trigramas y confirma con una búsqueda de subcadena.
+
+Se mantiene de forma incremental: sincronizar() sólo re-indexa los pedidos
+nuevos o con el nombre cambiado y quita los que ya no están.
+"""
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Set
+
+N_MAX = 3
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos ("José" -> "jose")."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+
+def _ngramas(texto: str) -> Set[str]:
+    return {texto[i:i + n] for n in range(1, N_MAX + 1) for i in range(len(texto) - n + 1)}
+
+
+class IndiceBusqueda:
+    def __init__(self):
+        self._nombres: Dict[Any, str] = {}      # pid -> nombre normalizado
+        self._ngramas: Dict[str, Set[Any]] = {}  # n-grama -> pids
+        self._ids: List[str] = []                # str(pid) ordenados
+        self._pid_de: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._nombres)
+
+    def agregar(self, pid, cliente: str) -> None:
+        nombre = normalizar(cliente)
+        previo = self._nombres.get(pid)
+        if previo == nombre:
+            return
+        if previo is not None:
+            self._quitar_nombre(pid, previo)
+        else:
+            clave = str(pid)
+            insort(self._ids, clave)
+            self._pid_de[clave] = pid
+        self._nombres[pid] = nombre
+        for g in _ngramas(nombre):
+            self._ngramas.setdefault(g, set()).add(pid)
+
+    def _quitar_nombre(self, pid, nombre: str) -> None:
+        for g in _ngramas(nombre):
+            pids = self._ngramas.get(g)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self._ngramas[g]
+
+    def quitar(self, pid) -> None:
+        nombre = self._nombres.pop(pid, None)
+        if nombre is None:
+            return
+        self._quitar_nombre(pid, nombre)
+        clave = str(pid)
+        i = bisect_left(self._ids, clave)
+        if i < len(self._ids) and self._ids[i] == clave:
+            del self._ids[i]
+        self._pid_de.pop(clave, None)
+
+    def sincronizar(self, pedidos: Iterable[Dict[str, Any]]) -> None:
+        """Deja el índice igual a `pedidos`; sólo toca lo que cambió."""
+        vivos = set()
+        for p in pedidos:
+            pid = p.get("id") or p.get("orden")
+            vivos.add(pid)
+            self.agregar(pid, p.get("cliente") or "")
+        for pid in [k for k in self._nombres if k not in vivos]:
+            self.quitar(pid)
+
+    def _por_prefijo(self, prefijo: str) -> Set[Any]:
+        i = bisect_left(self._ids, prefijo)
+        res = set()
+        while i < len(self._ids) and self._ids[i].startswith(prefijo):
+            res.add(self._pid_de[self._ids[i]])
+            i += 1
+        return res
+
+    def _por_nombre(self, q: str) -> Set[Any]:
+        if len(q) <= N_MAX:
+            return set(self._ngramas.get(q, ()))
+        grams = sorted((q[i:i + N_MAX] for i in range(len(q) - N_MAX + 1)),
+                       key=lambda g: len(self._ngramas.get(g, ())))
+        candidatos = set(self._ngramas.get(grams[0], ()))
+        for g in grams[1:]:
+            if not candidatos:
+                break
+            candidatos &= self._ngramas.get(g, set())
+        return {pid for pid in candidatos if q in self._nombres[pid]}
+
+    def buscar(self, consulta: str) -> Set[Any]:
+        """Pids cuyo número empieza por la consulta o cuyo cliente la contiene."""
+        q = normalizar(consulta).lstrip("#").strip()
+        if not q:
+            return set(self._nombres)
+        res = self._por_nombre(q)
+        if q.isdigit():
+            res |= self._por_prefijo(q)
+        return res
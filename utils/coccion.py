@@ -6,6 +6,9 @@ from datetime import datetime
 from typing import Callable, Optional, Dict, Any, List
 import random
 
+from utils.bitacora import bitacora
+from utils.diario_coccion import diario
+
 # Intentamos leer receta vigente si existe el módulo
 try:
     import utils.recetas as rx
@@ -19,9 +22,9 @@ LOG_PATH = os.path.join(LOG_DIR, "coccion.log")
 
 
 def _log(msg: str):
+    """Encola la línea; la escribe el hilo de utils.bitacora (sin I/O en el event loop)."""
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {msg}\n")
+    bitacora(LOG_PATH).escribir(f"[{ts}] {msg}\n")
 
 
 @dataclass
@@ -47,7 +50,7 @@ class CoccionController:
       - Simula sensores de horno (temperatura/tiempo).
       - Ajusta automáticamente la temperatura hacia el objetivo.
       - Dispara alertas de sobrecocción y de fallo de sensor.
-      - Registra eventos en logs (utils/logs/coccion.log).
+      - Registra eventos en logs (utils/logs/coccion.log y coccion.jsonl).
     """
 
     def __init__(
@@ -120,6 +123,8 @@ class CoccionController:
         - on_alerta_sonora: callback para reproducir beep.
         """
         _log(f"COCCION INICIO | Pedido #{self.id_pedido} | Tipo: {self.tipo_pizza} | Objetivo: {self.target.temp_c}°C, {self.target.tiempo_min} min")
+        diario().anotar("COCCION_INICIO", self.id_pedido, tipo_pizza=self.tipo_pizza,
+                        objetivo=self.target.temp_c, tiempo_min=self.target.tiempo_min)
 
         dt = 0.5  # segundos por tick
         ticks = int(self.duracion_seg / dt)
@@ -133,8 +138,7 @@ class CoccionController:
             if random.random() < 0.003:
                 self.sensor.ok = False
                 self.sensor.fallas.append("sensor_temp_sin_lectura")
-                msg = f"ALERTA_SENSOR | Pedido #{self.id_pedido} | Falla sensor temperatura (sin lectura)"
-                _log(msg)
+                self._alertar("ALERTA_SENSOR", "Falla sensor temperatura (sin lectura)")
                 if on_alerta_visual: on_alerta_visual("⚠ Falla de sensor: temperatura sin lectura")
                 if on_alerta_sonora: on_alerta_sonora()
                 # Recuperación rápida al siguiente tick
@@ -156,8 +160,11 @@ class CoccionController:
 
                 # Sobretemperatura (sobre-cocción por temp)
                 if self.sensor.temp_actual > (self.target.temp_c + self.target.tol_temp):
-                    msg = f"ALERTA_SOBRECOCCION | Pedido #{self.id_pedido} | Temp {self.sensor.temp_actual:.1f}°C (> {self.target.temp_c + self.target.tol_temp:.1f}°C)"
-                    _log(msg)
+                    self._alertar(
+                        "ALERTA_SOBRECOCCION",
+                        f"Temp {self.sensor.temp_actual:.1f}°C (> {self.target.temp_c + self.target.tol_temp:.1f}°C)",
+                        temp=round(self.sensor.temp_actual, 1), objetivo=self.target.temp_c,
+                    )
                     if on_alerta_visual: on_alerta_visual(f"⚠ Sobretemperatura: {self.sensor.temp_actual:.1f}°C")
                     if on_alerta_sonora: on_alerta_sonora()
 
@@ -171,8 +178,11 @@ class CoccionController:
         tiempo_min = self.target.tiempo_min
         t_min_rebasado = (self.sensor.tiempo_transcurrido / 60.0) > (tiempo_min + self.target.tol_tiempo)
         if t_min_rebasado:
-            msg = f"ALERTA_SOBRECOCCION | Pedido #{self.id_pedido} | Tiempo {self.sensor.tiempo_transcurrido/60.0:.2f} min (> {tiempo_min + self.target.tol_tiempo:.2f} min)"
-            _log(msg)
+            self._alertar(
+                "ALERTA_SOBRECOCCION",
+                f"Tiempo {self.sensor.tiempo_transcurrido/60.0:.2f} min (> {tiempo_min + self.target.tol_tiempo:.2f} min)",
+                tiempo_min=round(self.sensor.tiempo_transcurrido / 60.0, 2), objetivo_min=tiempo_min,
+            )
             if on_alerta_visual: on_alerta_visual(f"⚠ Sobretiempo de cocción: {self.sensor.tiempo_transcurrido/60.0:.1f} min")
             if on_alerta_sonora: on_alerta_sonora()
 
@@ -186,8 +196,17 @@ class CoccionController:
             "fallas": self.sensor.fallas,
         }
         _log(f"COCCION FIN | {resumen}")
+        diario().anotar("COCCION_FIN", self.id_pedido, **{k: v for k, v in resumen.items() if k != "pedido"})
         return resumen
 
+    def _alertar(self, tipo: str, detalle: str, **datos):
+        """
+        Deja la alerta en el log de texto y en el diario estructurado; el
+        evento ALERTA lo publica el diario al escribirla (el KDS ya la lee).
+        """
+        _log(f"{tipo} | Pedido #{self.id_pedido} | {detalle}")
+        diario().anotar(tipo, self.id_pedido, mensaje=detalle, **datos)
+
     def stop(self):
         self._stop = True
 
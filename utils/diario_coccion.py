@@ -0,0 +1,285 @@
+# utils/diario_coccion.py
+"""
+Diario estructurado de cocción (utils/logs/coccion.jsonl), junto al log
+de texto coccion.log.
+
+Cada evento de CoccionController es una línea JSON:
+
+    {"ts": 1760000000.123, "tipo": "ALERTA_SOBRECOCCION", "orden": 123,
+     "temp": 226.4, "objetivo": 220.0, "mensaje": "Temp 226.4°C (> 225.0°C)"}
+
+Se escribe con utils.bitacora (hilo de fondo, rotación por tamaño) y el
+mismo hilo mantiene un índice al lado (coccion.jsonl.idx), una línea por
+evento: "<offset> <minuto epoch> <orden>". En memoria queda:
+  - orden -> offsets: "todo lo del pedido 123" son unos seek + readline.
+  - primer offset de cada minuto: "alertas de los últimos 3 min" empieza a
+    leer justo ahí (bisect) en vez de recorrer el archivo.
+
+Si el índice quedó atrás (corte de luz) se completa al abrir leyendo sólo la
+cola del diario; si no cuadra con el diario, se rehace. Esa carga la hace el
+hilo de la bitácora antes de su primera escritura (o la primera consulta),
+nunca anotar(), que corre en el event loop. Tras una rotación el
+índice vuelve a empezar (cubre el archivo actual).
+
+Las alertas (tipo ALERTA_*) se publican en utils.eventos cuando ya están
+escritas e indexadas, así quien repinta al recibirlas ya las encuentra.
+Además quedan en un búfer por pedido (las últimas MAX_ALERTAS_POR_ORDEN,
+caducan a los RETENER_ALERTAS_MIN): alertas_recientes() — lo que pinta el
+KDS en cada repintado y sirve el feed — sale de ahí sin leer el archivo.
+Al abrir, el búfer se llena una vez con la cola reciente del diario.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from utils import eventos
+from utils.bitacora import bitacora
+
+RUTA = os.path.join(os.path.dirname(__file__), "logs", "coccion.jsonl")
+MAX_BYTES = 20 * 1024 * 1024
+RESPALDOS = 3
+RETENER_ALERTAS_MIN = 10
+MAX_ALERTAS_POR_ORDEN = 20
+
+
+def _json_linea(registro: Dict[str, Any]) -> str:
+    return json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class DiarioCoccion:
+    def __init__(self, ruta: str = RUTA, max_bytes: int = MAX_BYTES, respaldos: int = RESPALDOS):
+        self.ruta = ruta
+        self.ruta_indice = ruta + ".idx"
+        self._lock = threading.Lock()
+        self._cargado = False
+        self._por_orden: Dict[Any, List[int]] = {}
+        self._minutos: List[int] = []      # minutos con eventos (crecientes)
+        self._inicio_min: List[int] = []   # offset del primer evento de cada minuto
+        # orden -> [(ts, mensaje)] de sus últimas alertas (sobrevive a la rotación)
+        self._alertas: Dict[Any, Deque[Tuple[float, str]]] = {}
+        self._idx = None
+        self._bitacora = bitacora(
+            ruta, max_bytes=max_bytes, respaldos=respaldos,
+            al_escribir=self._indexar, al_rotar=self._reiniciar, al_arrancar=self._cargar,
+            aviso_descartes=lambda n: _json_linea({"ts": round(time.time(), 3), "tipo": "LOG_DESCARTADAS", "orden": None, "n": n}),
+        )
+
+    # ---- escritura ----
+    def anotar(self, tipo: str, orden, **datos: Any) -> bool:
+        """Encola el evento (no bloquea). False si la cola estaba llena.
+        El índice en disco se pone al día en el hilo de la bitácora antes de escribir."""
+        return self._bitacora.escribir(_json_linea({"ts": round(time.time(), 3), "tipo": tipo, "orden": orden, **datos}))
+
+    def vaciar(self) -> bool:
+        return self._bitacora.vaciar()
+
+    # ---- índice (hilo de la bitácora) ----
+    def _anotar_indice(self, offset: int, linea: str, alertas: Optional[list] = None) -> Optional[str]:
+        try:
+            reg = json.loads(linea)
+            minuto, orden = int(reg["ts"] // 60), reg.get("orden")
+        except (ValueError, KeyError, TypeError):
+            return None
+        if str(reg.get("tipo", "")).startswith("ALERTA_"):
+            self._guardar_alerta(reg)
+            if alertas is not None:
+                alertas.append(reg)
+        self._por_orden.setdefault(orden, []).append(offset)
+        if not self._minutos or minuto > self._minutos[-1]:
+            self._minutos.append(minuto)
+            self._inicio_min.append(offset)
+        return f"{offset} {minuto} {json.dumps(orden)}\n"
+
+    def _guardar_alerta(self, reg: Dict[str, Any]) -> None:
+        if reg["ts"] < time.time() - RETENER_ALERTAS_MIN * 60:
+            return
+        msg = f"{reg['tipo'].replace('_', ' ')} — {reg.get('mensaje', '')}"
+        cola = self._alertas.get(reg.get("orden"))
+        if cola is None:
+            cola = self._alertas[reg.get("orden")] = deque(maxlen=MAX_ALERTAS_POR_ORDEN)
+        cola.append((reg["ts"], msg))
+
+    def _indexar(self, pares: List[Tuple[int, str]]) -> None:
+        alertas: list = []
+        with self._lock:
+            nuevas = [e for off, linea in pares if (e := self._anotar_indice(off, linea, alertas))]
+            if nuevas:
+                if self._idx is None:
+                    self._idx = open(self.ruta_indice, "a", encoding="utf-8")
+                self._idx.write("".join(nuevas))
+                self._idx.flush()
+        for reg in alertas:
+            eventos.publicar(eventos.ALERTA, orden=reg.get("orden"),
+                             mensaje=f"{reg['tipo']} | Pedido #{reg.get('orden')} | {reg.get('mensaje', '')}")
+
+    def _limpiar(self) -> None:
+        self._por_orden, self._minutos, self._inicio_min = {}, [], []
+
+    def _reiniciar(self) -> None:
+        with self._lock:
+            self._limpiar()
+            if self._idx is not None:
+                self._idx.close()
+            self._idx = open(self.ruta_indice, "w", encoding="utf-8")
+
+    def _cargar(self) -> None:
+        if self._cargado:
+            return
+        with self._lock:
+            if self._cargado:
+                return
+            try:
+                tam = os.path.getsize(self.ruta)
+            except FileNotFoundError:
+                tam = 0
+            fin = self._leer_indice(tam)
+            if fin is None:  # índice que no cuadra: se rehace
+                self._limpiar()
+                fin, modo = 0, "w"
+            else:
+                modo = "a"
+                self._alertas_ya_indexadas(fin)
+            self._idx = open(self.ruta_indice, modo, encoding="utf-8")
+            if fin < tam:
+                nuevas = []
+                with open(self.ruta, "rb") as f:
+                    f.seek(fin)
+                    offset = fin
+                    for linea in f:
+                        if not linea.endswith(b"\n"):
+                            break  # línea a medio escribir
+                        e = self._anotar_indice(offset, linea.decode("utf-8", "replace"))
+                        if e:
+                            nuevas.append(e)
+                        offset += len(linea)
+                self._idx.write("".join(nuevas))
+                self._idx.flush()
+            self._cargado = True
+
+    def _alertas_ya_indexadas(self, fin: int) -> None:
+        """Llena el búfer de alertas con lo reciente que ya cubría el índice (una vez, al abrir)."""
+        i = bisect_left(self._minutos, int((time.time() - RETENER_ALERTAS_MIN * 60) // 60))
+        if i == len(self._minutos):
+            return
+        with open(self.ruta, "rb") as f:
+            f.seek(self._inicio_min[i])
+            while f.tell() < fin:
+                linea = f.readline()
+                if b"ALERTA_" not in linea:
+                    continue
+                try:
+                    reg = json.loads(linea)
+                except ValueError:
+                    continue
+                if str(reg.get("tipo", "")).startswith("ALERTA_") and isinstance(reg.get("ts"), (int, float)):
+                    self._guardar_alerta(reg)
+
+    def _leer_indice(self, tam: int) -> Optional[int]:
+        """Carga el índice de disco; devuelve hasta qué byte del diario cubre (None = rehacer)."""
+        ultimo = None
+        try:
+            with open(self.ruta_indice, "r", encoding="utf-8") as f:
+                for linea in f:
+                    partes = linea.split(" ", 2)
+                    if len(partes) != 3 or not linea.endswith("\n"):
+                        return None
+                    offset, minuto, orden = int(partes[0]), int(partes[1]), json.loads(partes[2])
+                    if offset >= tam or (ultimo is not None and offset <= ultimo):
+                        return None
+                    self._por_orden.setdefault(orden, []).append(offset)
+                    if not self._minutos or minuto > self._minutos[-1]:
+                        self._minutos.append(minuto)
+                        self._inicio_min.append(offset)
+                    ultimo = offset
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            return None
+        if ultimo is None:
+            return 0
+        with open(self.ruta, "rb") as f:
+            f.seek(ultimo)
+            linea = f.readline()
+        return ultimo + len(linea) if linea.endswith(b"\n") else None
+
+    # ---- consultas ----
+    def _leer(self, offsets: List[int]) -> List[Dict[str, Any]]:
+        res = []
+        with open(self.ruta, "rb") as f:
+            for off in offsets:
+                f.seek(off)
+                try:
+                    res.append(json.loads(f.readline()))
+                except ValueError:
+                    continue
+        return res
+
+    def eventos_de(self, orden) -> List[Dict[str, Any]]:
+        """Todos los eventos del pedido en el diario actual (seek directo por el índice)."""
+        self._cargar()
+        with self._lock:
+            offsets = list(self._por_orden.get(orden, ()))
+        return self._leer(offsets) if offsets else []
+
+    def desde(self, ts: float, tipo_prefijo: str = "") -> Iterator[Dict[str, Any]]:
+        """Eventos con ts >= `ts` (empieza a leer en el minuto de `ts`)."""
+        self._cargar()
+        with self._lock:
+            i = bisect_left(self._minutos, int(ts // 60))
+            if i == len(self._minutos):
+                return
+            inicio = self._inicio_min[i]
+        try:
+            f = open(self.ruta, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(inicio)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    reg = json.loads(linea)
+                except ValueError:
+                    continue
+                if reg.get("ts", 0) >= ts and str(reg.get("tipo", "")).startswith(tipo_prefijo):
+                    yield reg
+
+    def alertas_recientes(self, minutos: float = 2) -> Dict[int, Dict[str, Any]]:
+        """{orden: {"mensajes": [str], "tss": [datetime], "last_ts": datetime}} (formato que pinta el KDS).
+        Sale del búfer en memoria: no lee el diario."""
+        self._cargar()
+        ahora = time.time()
+        limite, caducan = ahora - minutos * 60, ahora - RETENER_ALERTAS_MIN * 60
+        res: Dict[int, Dict[str, Any]] = {}
+        with self._lock:
+            for orden in [o for o, cola in self._alertas.items() if cola[-1][0] < caducan]:
+                del self._alertas[orden]
+            for orden, cola in self._alertas.items():
+                for ts, msg in cola:
+                    if ts < limite:
+                        continue
+                    dt = datetime.fromtimestamp(ts)
+                    a = res.setdefault(orden, {"mensajes": [], "tss": [], "last_ts": dt})
+                    a["mensajes"].append(msg)
+                    a["tss"].append(dt)
+                    a["last_ts"] = max(a["last_ts"], dt)
+        return res
+
+
+_diarios: Dict[str, DiarioCoccion] = {}
+_diarios_lock = threading.Lock()
+
+
+def diario(ruta: str = RUTA) -> DiarioCoccion:
+    """Uno por ruta (comparte bitácora e índice en memoria)."""
+    with _diarios_lock:
+        d = _diarios.get(ruta)
+        if d is None:
+            d = _diarios[ruta] = DiarioCoccion(ruta)
+        return d
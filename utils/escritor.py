@@ -0,0 +1,129 @@
+# utils/escritor.py
+"""
+Hilo escritor único para la persistencia de pedidos.
+
+Las escrituras se encolan (cola acotada) y se ejecutan en orden en un hilo
+dedicado, fuera del event loop de Flet. Desde código async se espera con
+`await esperar(fn, ...)`; las funciones síncronas usan `ejecutar(fn, ...)`,
+que encola y espera el resultado (mismo orden que las async).
+
+Group commit: el hilo toma de golpe las escrituras que llegan dentro de
+VENTANA_GRUPO_S, las ejecuta dentro de utils.almacen.commit_en_grupo (un
+solo fsync por journal) y sólo entonces confirma a todas. Con varios
+cajeros a la vez se comparte el fsync en lugar de pagar uno cada uno.
+"""
+import asyncio
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from utils.almacen import commit_en_grupo
+
+# Escrituras pendientes como máximo antes de frenar a quien encola
+MAX_PENDIENTES = 256
+
+# Espera para juntar escrituras en un mismo fsync (0 = sólo las ya encoladas)
+VENTANA_GRUPO_S = 0.002
+MAX_LOTE = 64
+
+
+class EscritorSerial:
+    def __init__(self, max_pendientes: int = MAX_PENDIENTES, grupo: Callable = contextlib.nullcontext):
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max_pendientes)
+        self._hilo = None
+        self._hilo_lock = threading.Lock()
+        self._grupo = grupo
+
+    def _arrancar(self) -> None:
+        with self._hilo_lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="escritor-pedidos", daemon=True)
+                self._hilo.start()
+
+    def _juntar(self) -> list:
+        """Primera escritura (bloqueante) más las que lleguen dentro de la ventana."""
+        lote = [self._cola.get()]
+        fin = time.monotonic() + VENTANA_GRUPO_S
+        while len(lote) < MAX_LOTE:
+            resto = fin - time.monotonic()
+            try:
+                lote.append(self._cola.get(timeout=resto) if resto > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _bucle(self) -> None:
+        while True:
+            lote = self._juntar()
+            resultados = []  # (ok, valor) por escritura; None si se canceló
+            try:
+                with self._grupo():
+                    for fut, fn, args, kwargs in lote:
+                        if not fut.set_running_or_notify_cancel():
+                            resultados.append(None)
+                            continue
+                        try:
+                            resultados.append((True, fn(*args, **kwargs)))
+                        except BaseException as ex:
+                            resultados.append((False, ex))
+            except BaseException as ex:
+                # falló el fsync común: ninguna del lote es durable
+                resultados = [r if r is None or not r[0] else (False, ex) for r in resultados]
+                for fut, *_ in lote[len(resultados):]:
+                    resultados.append((False, ex) if fut.set_running_or_notify_cancel() else None)
+            for (fut, *_), r in zip(lote, resultados):
+                if r is not None:
+                    ok, valor = r
+                    if ok:
+                        fut.set_result(valor)
+                    else:
+                        fut.set_exception(valor)
+                self._cola.task_done()
+
+    def _item(self, fn: Callable, args, kwargs):
+        return (Future(), fn, args, kwargs)
+
+    def enviar(self, fn: Callable, *args, **kwargs) -> Future:
+        """Encola la escritura (bloquea si la cola está llena) y devuelve un Future."""
+        item = self._item(fn, args, kwargs)
+        if threading.current_thread() is self._hilo:
+            # llamada anidada desde el propio escritor: se ejecuta en línea
+            fut = item[0]
+            fut.set_running_or_notify_cancel()
+            try:
+                fut.set_result(fn(*args, **kwargs))
+            except BaseException as ex:
+                fut.set_exception(ex)
+            return fut
+        self._arrancar()
+        self._cola.put(item)
+        return item[0]
+
+    def ejecutar(self, fn: Callable, *args, **kwargs) -> Any:
+        """Versión síncrona: encola y espera el resultado."""
+        return self.enviar(fn, *args, **kwargs).result()
+
+    async def esperar(self, fn: Callable, *args, **kwargs) -> Any:
+        """Versión async: no bloquea el event loop ni al encolar ni al escribir."""
+        item = self._item(fn, args, kwargs)
+        self._arrancar()
+        try:
+            self._cola.put_nowait(item)
+        except queue.Full:
+            # cola llena: esperar hueco fuera del loop
+            await asyncio.get_running_loop().run_in_executor(None, self._cola.put, item)
+        return await asyncio.wrap_future(item[0])
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+
+_escritor = EscritorSerial(grupo=commit_en_grupo)
+
+enviar = _escritor.enviar
+ejecutar = _escritor.ejecutar
+esperar = _escritor.esperar
+pendientes = _escritor.pendientes
@@ -0,0 +1,50 @@
+# utils/eventos.py
+"""
+Bus de eventos en proceso (publicar/suscribir) entre la persistencia, la
+cocción y las pantallas.
+
+    cancelar = suscribir(ESTADO_CAMBIADO, lambda tema, datos: ...)
+    publicar(ESTADO_CAMBIADO, orden=123, estado="Horno")
+    cancelar()
+
+Las callbacks se llaman en el hilo de quien publica (el escritor, el hilo
+de cocción...), así que deben ser cortas: lo normal es despertar al event
+loop de la pantalla (loop.call_soon_threadsafe) y repintar allí. Un
+suscriptor que lanza una excepción no afecta al resto.
+"""
+import threading
+from typing import Any, Callable, Dict, List
+
+PEDIDO_CREADO = "pedido_creado"
+PEDIDO_EDITADO = "pedido_editado"
+ESTADO_CAMBIADO = "estado_cambiado"
+ALERTA = "alerta"
+TODOS = "*"
+
+Callback = Callable[[str, Dict[str, Any]], None]
+
+_suscriptores: Dict[str, List[Callback]] = {}
+_lock = threading.Lock()
+
+
+def suscribir(tema: str, fn: Callback) -> Callable[[], None]:
+    """Registra `fn(tema, datos)` para `tema` (o TODOS). Devuelve la función para darse de baja."""
+    with _lock:
+        # copia al escribir: publicar recorre la lista sin lock
+        _suscriptores[tema] = _suscriptores.get(tema, []) + [fn]
+
+    def cancelar() -> None:
+        with _lock:
+            actuales = _suscriptores.get(tema, [])
+            if fn in actuales:
+                _suscriptores[tema] = [f for f in actuales if f is not fn]
+
+    return cancelar
+
+
+def publicar(tema: str, **datos: Any) -> None:
+    for fn in _suscriptores.get(tema, []) + _suscriptores.get(TODOS, []):
+        try:
+            fn(tema, datos)
+        except Exception:
+            pass
@@ -0,0 +1,194 @@
+# utils/feed.py
+"""
+Feed HTTP de sólo lectura del KDS para monitores extra y la pantalla de
+recogida (sin abrir una sesión de Flet por pantalla).
+
+    GET /kds                 -> {"version", "pedidos", "alertas"}
+    GET /kds?since=<v>       -> long-poll: espera (hasta ESPERA_S) a que la
+                                versión deje de ser <v>; si no cambia, 304
+
+La versión junta todo lo que cambia la respuesta:
+  - un contador que sube con cada evento de utils.eventos de este proceso
+    (pedido creado/editado, cambio de estado, alerta);
+  - la firma en disco del almacén (journal/snapshot de los días del KDS) y
+    del diario de cocción: cuenta también lo que escriben otros procesos
+    (la CLI, otra caja);
+  - el último vencimiento de alerta ya pasado: una alerta sale de la
+    respuesta a los ALERTAS_MIN minutos aunque nadie escriba nada.
+El ETag (fuerte) sale de esa versión, así que un cliente con If-None-Match
+al día recibe 304 sin que se vuelva a serializar nada; el JSON se arma una
+vez por versión y se comparte entre todos los clientes. Calcular la versión
+son unos stat, sin leer archivos.
+
+Arranca dentro del proceso de la app (ahí se publican los eventos):
+
+    $env:BARKA_FEED_PUERTO = "8765"; python main.py
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from utils import eventos
+from utils import pedidos as pedidos_mod
+from utils.diario_coccion import RUTA as RUTA_DIARIO, diario
+from utils.kds import DIAS_KDS, listar_pedidos
+
+PUERTO = int(os.environ.get("BARKA_FEED_PUERTO") or 0) or None
+HOST = "127.0.0.1"
+ESPERA_S = 25.0  # tope del long-poll
+ALERTAS_MIN = 2
+SONDEO_S = 1.0  # el long-poll revisa el disco con esta cadencia (escrituras de otros procesos)
+
+_cambio = threading.Condition()
+_contador = 0
+_arranque = int(time.time())  # el ETag no se repite entre reinicios
+_cache: Tuple[str, Optional[bytes]] = ("", None)
+_cache_lock = threading.Lock()
+# vencimientos de las alertas servidas (crecientes) y el último ya pasado
+_vencimientos: List[float] = []
+_vencida = 0.0
+_vencimientos_lock = threading.Lock()
+_baja = None
+_servidor: Optional[ThreadingHTTPServer] = None
+
+
+def _aviso(tema, datos) -> None:
+    global _contador
+    with _cambio:
+        _contador += 1
+        _cambio.notify_all()
+
+
+def _firma_diario() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(RUTA_DIARIO)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def version() -> str:
+    """Token opaco: cambia si cambia cualquier cosa que entra en la respuesta."""
+    global _vencida
+    ahora = time.time()
+    with _vencimientos_lock:
+        while _vencimientos and _vencimientos[0] <= ahora:
+            _vencida = _vencimientos.pop(0)
+        vencida = _vencida
+    partes = (_contador, pedidos_mod.firma_almacen(DIAS_KDS), _firma_diario(), vencida)
+    return f"{_contador}-{zlib.crc32(repr(partes).encode()):08x}"
+
+
+def etag(v: str) -> str:
+    return f'"{_arranque}-{v}"'
+
+
+def esperar_cambio(desde: str, timeout: float = ESPERA_S) -> str:
+    """Bloquea hasta que la versión sea distinta de `desde` (o pase `timeout`).
+    Los eventos de este proceso despiertan al momento; lo demás se ve al sondear."""
+    limite = time.monotonic() + timeout
+    v = version()
+    while v == desde:
+        resta = limite - time.monotonic()
+        if resta <= 0:
+            break
+        with _cambio:
+            _cambio.wait(min(SONDEO_S, resta))
+        v = version()
+    return v
+
+
+def _serializar() -> dict:
+    alertas = diario(RUTA_DIARIO).alertas_recientes(ALERTAS_MIN)
+    # cada mensaje deja de salir a los ALERTAS_MIN minutos de su alerta
+    vencen = sorted(ts.timestamp() + ALERTAS_MIN * 60 for a in alertas.values() for ts in a["tss"])
+    with _vencimientos_lock:
+        _vencimientos[:] = [t for t in vencen if t > _vencida]
+    return {
+        "pedidos": listar_pedidos(),
+        "alertas": {
+            str(pid): {"mensajes": a["mensajes"], "last_ts": a["last_ts"].isoformat(timespec="seconds")}
+            for pid, a in alertas.items()
+        },
+    }
+
+
+def cuerpo() -> Tuple[str, bytes]:
+    """(versión, JSON) de la versión actual; se arma una sola vez por versión."""
+    global _cache
+    with _cache_lock:
+        v = version()  # leída antes de armar: si cambia mientras tanto, el próximo recalcula
+        if _cache[0] != v:
+            datos = {"version": v, **_serializar()}
+            _cache = (v, json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8"))
+        return _cache
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "BarkaFeed/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/kds":
+            self.send_error(404)
+            return
+        qs = parse_qs(url.query)
+        if "since" in qs:
+            desde = qs["since"][0]
+            try:
+                espera = min(float(qs.get("espera", [ESPERA_S])[0]), ESPERA_S)
+            except ValueError:
+                self.send_error(400, "since/espera inválidos")
+                return
+            if esperar_cambio(desde, espera) == desde:
+                self._no_modificado(desde)
+                return
+        else:
+            v = version()
+            if self.headers.get("If-None-Match") == etag(v):
+                self._no_modificado(v)
+                return
+        v, datos = cuerpo()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.send_header("ETag", etag(v))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _no_modificado(self, v: str):
+        self.send_response(304)
+        self.send_header("ETag", etag(v))
+        self.end_headers()
+
+    def log_message(self, formato, *args):
+        pass  # un log por sondeo sería puro ruido
+
+
+def iniciar(puerto: Optional[int] = PUERTO, host: str = HOST) -> Optional[ThreadingHTTPServer]:
+    """Levanta el feed en un hilo de fondo (una vez). Sin puerto no hace nada."""
+    global _servidor, _baja
+    if _servidor is not None or puerto is None:
+        return _servidor
+    _baja = eventos.suscribir(eventos.TODOS, _aviso)
+    _servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+    _servidor.daemon_threads = True
+    threading.Thread(target=_servidor.serve_forever, name="feed-kds", daemon=True).start()
+    return _servidor
+
+
+def detener() -> None:
+    global _servidor, _baja
+    if _baja is not None:
+        _baja()
+        _baja = None
+    if _servidor is not None:
+        _servidor.shutdown()
+        _servidor.server_close()
+        _servidor = None
@@ -1,48 +1,200 @@
 # utils/kds.py
+"""
+Vista de cocina (KDS) sobre el repositorio único de pedidos (utils.pedidos).
+
+El KDS ya no guarda una copia propia: cada pedido confirmado lleva su
+'estado' de cocina y aquí sólo se proyectan los campos que la pantalla usa.
+
+Los cambios de estado (Preparación, Horno, Empaque, Listo...) no se escriben
+uno a uno: se acumulan en memoria y se vuelcan juntos en una sola escritura
+al pasar VENTANA_S segundos o al juntarse MAX_PENDIENTES. Las lecturas de
+este módulo ya ven los cambios pendientes, y al salir se vuelca lo que quede.
+
+Cada cambio pendiente guarda la hora en que ocurrió; al volcarlo, esa hora
+queda en el pedido y utils.pedidos la pasa a utils.metricas (tiempos por etapa).
+"""
+import asyncio
+import atexit
 import json
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+
+import utils.pedidos as pedidos_mod
+from utils import eventos
+from utils.almacen import marcar_migrado, pedido_desde_kds
+from utils.modelos import KdsPedido
 
 BASE_DIR = os.path.dirname(__file__)
+# Archivo del KDS anterior a la unificación; se pliega una vez en utils.pedidos
 DATA_PATH = os.path.join(BASE_DIR, "pedidos_data.json")
 
+# Días de negocio que abre el KDS (particiones); None = todo el historial
+DIAS_KDS = 7
+
+# Estado con el que entra un pedido a cocina (screens/registro.py)
+ESTADO_INICIAL = "confirmado"
+
+# Write-behind de estados: segundos hasta volcar y tamaño que fuerza el volcado
+VENTANA_S = 0.25
+MAX_PENDIENTES = 32
+# Si un volcado falla, los cambios vuelven a la cola y se reintenta pasado este tiempo
+REINTENTO_S = 2.0
+
+_legado_lock = threading.Lock()
+_legado_migrado = False
+
+_pend_lock = threading.Lock()
+_vaciado_lock = threading.Lock()
+# orden -> [(estado, hora del cambio), ...] en orden; el último es el estado vigente
+_pendientes: Dict[Any, List[Tuple[str, float]]] = {}
+_en_vuelo: Dict[Any, List[Tuple[str, float]]] = {}  # ya sacados de _pendientes, aún no escritos
+_temporizador: Optional[threading.Timer] = None
+
+
+def _migrar_legado() -> None:
+    """Pasa las entradas del JSON legado del KDS al repositorio de pedidos (una vez)."""
+    global _legado_migrado
+    with _legado_lock:
+        if _legado_migrado:
+            return
+        _legado_migrado = True
+        if not os.path.exists(DATA_PATH) or os.path.exists(DATA_PATH + ".migrado"):
+            return
+        try:
+            with open(DATA_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            data = []
+        for entrada in data:
+            orden = entrada.get("orden", entrada.get("id"))
+            if not pedidos_mod.cambiar_estado(orden, entrada.get("estado") or ESTADO_INICIAL):
+                pedidos_mod.guardar_pedido(pedido_desde_kds(entrada))
+        marcar_migrado(DATA_PATH)
+
+
+def vaciar() -> None:
+    """Escribe los cambios de estado pendientes (una sola escritura)."""
+    global _temporizador, _en_vuelo
+    with _vaciado_lock:
+        with _pend_lock:
+            if _temporizador is not None:
+                _temporizador.cancel()
+                _temporizador = None
+            if not _pendientes:
+                return
+            _en_vuelo = dict(_pendientes)
+            _pendientes.clear()
+        try:
+            pedidos_mod.cambiar_estados({o: pasos[-1][0] for o, pasos in _en_vuelo.items()},
+                                        avisar=False,  # ya se avisó al encolar
+                                        transiciones=_en_vuelo)
+        except Exception:
+            # los lectores ya vieron estos estados: no se pierden, vuelven a la cola
+            # (delante de los cambios más nuevos) y se reintenta más tarde
+            with _pend_lock:
+                for orden, pasos in _en_vuelo.items():
+                    _pendientes[orden] = pasos + _pendientes.get(orden, [])
+                _en_vuelo = {}
+                if _temporizador is None:
+                    _temporizador = threading.Timer(REINTENTO_S, vaciar)
+                    _temporizador.daemon = True
+                    _temporizador.start()
+            raise
+        with _pend_lock:
+            _en_vuelo = {}
 
-def _load_data() -> List[Dict[str, Any]]:
-    if not os.path.exists(DATA_PATH):
-        return []
-    try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
 
+atexit.register(vaciar)
 
-def _save_data(data: List[Dict[str, Any]]):
-    os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def _encolar(id_pedido, estado: str) -> None:
+    global _temporizador
+    with _pend_lock:
+        # se guardan todas las transiciones, no sólo la última (tiempos por etapa)
+        _pendientes.setdefault(id_pedido, []).append((estado, time.time()))
+        lleno = len(_pendientes) >= MAX_PENDIENTES
+        if not lleno and _temporizador is None:
+            _temporizador = threading.Timer(VENTANA_S, vaciar)
+            _temporizador.daemon = True
+            _temporizador.start()
+    if lleno:
+        vaciar()
+
+
+def _estados_pendientes() -> Dict[Any, str]:
+    with _pend_lock:
+        return {o: pasos[-1][0] for o, pasos in {**_en_vuelo, **_pendientes}.items()}
+
+
+def _proyectar(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos que muestra la cocina; si no están arriba se toman del primer producto."""
+    return KdsPedido.from_dict(p).to_dict()
 
 
 def registrar_pedido(pedido: Dict[str, Any]) -> None:
-    data = _load_data()
-    pedido["fecha"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    data.append(pedido)
-    _save_data(data)
+    """
+    Compatibilidad: pone en cocina un pedido. Lo normal es guardar el pedido ya
+    con 'estado' (screens/registro.py), que cuesta una sola escritura.
+    """
+    _migrar_legado()
+    vaciar()
+    orden = pedido.get("orden", pedido.get("id"))
+    estado = pedido.get("estado") or ESTADO_INICIAL
+    if not pedidos_mod.cambiar_estado(orden, estado):
+        pedido["fecha"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        pedidos_mod.guardar_pedido(pedido_desde_kds({**pedido, "estado": estado}))
+
 
+def _antes_de_registrar() -> None:
+    _migrar_legado()
+    vaciar()
 
-def listar_pedidos(estado: str = None) -> List[Dict[str, Any]]:
-    data = _load_data()
-    if estado:
-        return [p for p in data if p.get("estado") == estado]
-    return data
+
+async def aregistrar_pedido(pedido: Dict[str, Any]) -> None:
+    # migración y volcado hacen I/O (y fsync): fuera del event loop
+    await asyncio.get_running_loop().run_in_executor(None, _antes_de_registrar)
+    orden = pedido.get("orden", pedido.get("id"))
+    estado = pedido.get("estado") or ESTADO_INICIAL
+    if not await pedidos_mod.acambiar_estado(orden, estado):
+        pedido["fecha"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        await pedidos_mod.aguardar_pedido(pedido_desde_kds({**pedido, "estado": estado}))
+
+
+def listar_pedidos(estado: Optional[str] = None) -> List[Dict[str, Any]]:
+    _migrar_legado()
+    pendientes = _estados_pendientes()
+    if not pendientes:
+        return [_proyectar(p) for p in pedidos_mod.pedidos_en_cocina(estado, dias=DIAS_KDS)]
+    # con cambios sin volcar se filtra después de aplicarlos
+    vista = [_proyectar(p) for p in pedidos_mod.pedidos_en_cocina(None, dias=DIAS_KDS)]
+    vistos = {v["orden"] for v in vista}
+    # pedidos que entran en_cocina con un cambio aún pendiente
+    for orden in pendientes.keys() - vistos:
+        p = pedidos_mod.obtener_pedido(orden)
+        if p is not None:
+            vista.append(_proyectar(p))
+    for v in vista:
+        v["estado"] = pendientes.get(v["orden"], v["estado"])
+    return [v for v in vista if not estado or v["estado"] == estado]
 
 
 def actualizar_estado(id_pedido: int, nuevo_estado: str) -> bool:
-    data = _load_data()
-    for p in data:
-        if p.get("id") == id_pedido:
-            p["estado"] = nuevo_estado
-            _save_data(data)
-            return True
-    return False
+    """Cambia el estado de cocina (se escribe en diferido, ver vaciar). False si no existe."""
+    _migrar_legado()
+    if id_pedido not in _estados_pendientes() and pedidos_mod.obtener_pedido(id_pedido) is None:
+        return False
+    _encolar(id_pedido, nuevo_estado)
+    eventos.publicar(eventos.ESTADO_CAMBIADO, orden=id_pedido, estado=nuevo_estado)
+    return True
+
+
+async def aactualizar_estado(id_pedido: int, nuevo_estado: str) -> bool:
+    """
+    Como actualizar_estado, fuera del event loop: la búsqueda del pedido lee
+    disco y, con MAX_PENDIENTES en cola, el volcado espera al fsync.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, actualizar_estado, id_pedido, nuevo_estado)
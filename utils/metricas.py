@@ -0,0 +1,195 @@
+# utils/metricas.py
+"""
+Tiempos de cocina por etapa, calculados de forma incremental.
+
+utils.pedidos avisa cada transición (orden, estado, ts) al escribirla (alta
+con estado, cambios de estado del KDS, cierres en bloque de la CLI). Al
+salir un pedido de una etapa (Preparación, Horno, Empaque...) su duración
+se suma a un histograma fijo de esa etapa: O(1) por evento, sin releer el
+historial. Los percentiles (p50/p90/p99) salen de sumar los histogramas de
+la ventana móvil (VENTANA_MIN, en ranuras de RANURA_MIN), con un error
+relativo acotado por el ancho de cubeta (~10%).
+
+El rendimiento es el número de pedidos que llegan a "Listo" en los últimos
+RENDIMIENTO_MIN minutos (contadores por minuto).
+
+Las transiciones quedan guardadas en cada pedido ('transiciones'), así que
+al arrancar se rehacen los agregados de la ventana a partir del almacén
+(ver origen()) en vez de empezar de cero.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+VENTANA_MIN = 60
+RANURA_MIN = 5
+RENDIMIENTO_MIN = 15
+
+# Bordes de cubeta (segundos): geométricos de 5 s a ~3 h, factor 1.2
+BORDES: Tuple[float, ...] = tuple(5 * 1.2 ** i for i in range(40))
+MAX_ETAPA_S = BORDES[-1]
+
+
+def es_final(estado: Optional[str]) -> bool:
+    e = (estado or "").lower()
+    return "list" in e or "final" in e
+
+
+def _cubeta(segundos: float) -> int:
+    return bisect_right(BORDES, segundos)
+
+
+def _valor(i: int) -> float:
+    """Representante de la cubeta i (media geométrica de sus bordes)."""
+    if i == 0:
+        return BORDES[0] / 2
+    if i >= len(BORDES):
+        return BORDES[-1]
+    return (BORDES[i - 1] * BORDES[i]) ** 0.5
+
+
+class MetricasCocina:
+    def __init__(self, ventana_min: float = VENTANA_MIN, ranura_min: float = RANURA_MIN,
+                 rendimiento_min: int = RENDIMIENTO_MIN, reloj: Callable[[], float] = time.time):
+        self.ranura_s = ranura_min * 60
+        self.n_ranuras = max(1, int(ventana_min // ranura_min))
+        self.rendimiento_min = rendimiento_min
+        self.reloj = reloj
+        self._lock = threading.Lock()
+        self._entradas: Dict[Any, Tuple[str, float]] = {}  # orden -> (etapa actual, desde)
+        # (n.º de ranura, {etapa: conteos}) de la más vieja a la actual
+        self._ranuras: Deque[Tuple[int, Dict[str, List[int]]]] = deque()
+        self._listos: Deque[List[int]] = deque()  # [minuto, pedidos listos]
+        self.reconstruida = False
+
+    def conoce(self, orden) -> bool:
+        with self._lock:
+            return orden in self._entradas
+
+    def registrar(self, orden, estado: str, ts: Optional[float] = None) -> None:
+        """Transición de `orden` a `estado` en `ts` (epoch; por defecto ahora)."""
+        ts = self.reloj() if ts is None else ts
+        with self._lock:
+            previo = self._entradas.get(orden)
+            if previo is not None and previo[0] != estado:
+                duracion = ts - previo[1]
+                if 0 <= duracion <= MAX_ETAPA_S:
+                    self._histograma(ts, previo[0])[_cubeta(duracion)] += 1
+            elif previo is not None:
+                return  # mismo estado: no es transición
+            if es_final(estado):
+                self._entradas.pop(orden, None)
+                if previo is not None:
+                    self._contar_listo(ts)
+            else:
+                self._entradas[orden] = (estado, ts)
+
+    def reconstruir(self, pedidos: Iterable[Dict[str, Any]]) -> None:
+        """Re-aplica las 'transiciones' guardadas en los pedidos (en orden de hora)."""
+        desde = self.reloj() - max(self.n_ranuras * self.ranura_s, MAX_ETAPA_S)
+        eventos = []
+        for p in pedidos:
+            for estado, ts in p.get("transiciones") or ():
+                if isinstance(ts, (int, float)) and ts >= desde:
+                    eventos.append((ts, p.get("orden"), estado))
+        for ts, orden, estado in sorted(eventos, key=lambda e: e[0]):
+            self.registrar(orden, estado, ts)
+        self.reconstruida = True
+
+    def _histograma(self, ts: float, etapa: str) -> List[int]:
+        n = int(ts // self.ranura_s)
+        if not self._ranuras or self._ranuras[-1][0] < n:
+            self._ranuras.append((n, {}))
+            self._rotar(n)
+            return self._ranuras[-1][1].setdefault(etapa, [0] * (len(BORDES) + 1))
+        # evento atrasado: a su ranura si sigue en la ventana (si no, a la más vieja)
+        for num, hist in reversed(self._ranuras):
+            if num <= n:
+                break
+        return hist.setdefault(etapa, [0] * (len(BORDES) + 1))
+
+    def _rotar(self, n: int) -> None:
+        while self._ranuras and self._ranuras[0][0] <= n - self.n_ranuras:
+            self._ranuras.popleft()
+        # pedidos que nunca salieron de su etapa (cancelados, reinicios...)
+        limite = n * self.ranura_s - MAX_ETAPA_S
+        for orden in [o for o, (_, desde) in self._entradas.items() if desde < limite]:
+            del self._entradas[orden]
+
+    def _contar_listo(self, ts: float) -> None:
+        minuto = int(ts // 60)
+        if self._listos and self._listos[-1][0] == minuto:
+            self._listos[-1][1] += 1
+        else:
+            self._listos.append([minuto, 1])
+        while self._listos and self._listos[0][0] <= minuto - self.rendimiento_min:
+            self._listos.popleft()
+
+    def percentiles(self, etapa: str, qs: Tuple[float, ...] = (0.5, 0.9, 0.99)) -> Optional[Dict[str, Any]]:
+        """{"n", "p50", "p90", "p99"} en segundos para `etapa` en la ventana; None sin datos."""
+        ahora = int(self.reloj() // self.ranura_s)
+        with self._lock:
+            total = [0] * (len(BORDES) + 1)
+            for num, hist in self._ranuras:
+                if num > ahora - self.n_ranuras and etapa in hist:
+                    for i, c in enumerate(hist[etapa]):
+                        total[i] += c
+        n = sum(total)
+        if not n:
+            return None
+        res: Dict[str, Any] = {"n": n}
+        for q in qs:
+            objetivo, acum = q * n, 0
+            for i, c in enumerate(total):
+                acum += c
+                if acum >= objetivo:
+                    res[f"p{round(q * 100)}"] = _valor(i)
+                    break
+        return res
+
+    def etapas(self) -> List[str]:
+        with self._lock:
+            vistas = {e for _, hist in self._ranuras for e in hist}
+        return sorted(vistas)
+
+    def rendimiento(self) -> int:
+        """Pedidos listos en los últimos `rendimiento_min` minutos."""
+        minuto = int(self.reloj() // 60)
+        with self._lock:
+            return sum(c for m, c in self._listos if m > minuto - self.rendimiento_min)
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "etapas": {e: p for e in self.etapas() if (p := self.percentiles(e))},
+            "rendimiento": self.rendimiento(),
+        }
+
+
+_metricas = MetricasCocina()
+_origen: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None
+_origen_lock = threading.Lock()
+
+
+def origen(fn: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+    """Pedidos recientes de donde rehacer los agregados la primera vez (utils.pedidos)."""
+    global _origen
+    _origen = fn
+
+
+def metricas() -> MetricasCocina:
+    m = _metricas
+    if not m.reconstruida and _origen is not None:
+        with _origen_lock:
+            if not m.reconstruida:
+                m.reconstruir(_origen())
+    return m
+
+
+def registrar(orden, estado: str, ts: Optional[float] = None) -> None:
+    metricas().registrar(orden, estado, ts)
+
+
+def resumen() -> Dict[str, Any]:
+    return metricas().resumen()
@@ -0,0 +1,183 @@
+# utils/modelos.py
+"""
+Tipos compactos para los pedidos que viven en memoria (caché de utils.almacen).
+
+Los pedidos siguen guardándose y entregándose como dicts (formato legado);
+estos tipos sólo cambian cómo se guardan en memoria:
+  - __slots__: sin un dict por objeto.
+  - masa/salsa/tamano/estado/receta/ingredientes se internan, así que los
+    valores repetidos (hay pocos distintos) se comparten.
+  - 'masa', 'salsa'... arriba del pedido suelen ser copia del primer producto
+    (ver screens/registro.py); si coinciden no se guardan dos veces.
+  - Las claves que no se conocen van a `extra`, así que to_dict devuelve
+    lo mismo que se cargó.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# Marca de "clave ausente" (distinta de un valor None guardado)
+FALTA: Any = type("_Falta", (), {"__repr__": lambda self: "FALTA", "__slots__": ()})()
+
+# Campos de un producto; también aparecen arriba del pedido como copia del primero
+CAMPOS_ITEM = ("masa", "salsa", "tamano", "ingredientes", "cantidad", "receta_tipo")
+CAMPOS_PEDIDO = ("orden", "cliente", "hora", "estado", "fecha")
+_INTERNADOS = frozenset(("masa", "salsa", "tamano", "estado", "receta_tipo"))
+
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+def _ingredientes(v):
+    if isinstance(v, list):
+        return tuple(_intern(x) for x in v)
+    return v
+
+
+def _salida(k: str, v):
+    return list(v) if k == "ingredientes" and type(v) is tuple else v
+
+
+@dataclass(slots=True)
+class ItemPedido:
+    masa: Any = FALTA
+    salsa: Any = FALTA
+    tamano: Any = FALTA
+    ingredientes: Any = FALTA
+    cantidad: Any = FALTA
+    receta_tipo: Any = FALTA
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ItemPedido":
+        it = cls()
+        extra = None
+        for k, v in d.items():
+            if k == "ingredientes":
+                it.ingredientes = _ingredientes(v)
+            elif k in _INTERNADOS:
+                setattr(it, k, _intern(v))
+            elif k == "cantidad":
+                it.cantidad = v
+            else:
+                if extra is None:
+                    extra = {}
+                extra[k] = v
+        it.extra = extra
+        return it
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {k: _salida(k, v) for k in CAMPOS_ITEM if (v := getattr(self, k)) is not FALTA}
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+@dataclass(slots=True)
+class Pedido:
+    orden: Any = FALTA
+    cliente: Any = FALTA
+    hora: Any = FALTA
+    estado: Any = FALTA
+    fecha: Any = FALTA
+    items: Optional[Tuple[ItemPedido, ...]] = None
+    espejo: bool = False  # los CAMPOS_ITEM de arriba son copia de items[0]
+    extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Pedido":
+        p = cls()
+        extra = None
+        items = d.get("items")
+        if isinstance(items, list) and all(isinstance(x, dict) for x in items):
+            p.items = tuple(ItemPedido.from_dict(x) for x in items)
+        elif items is not None:
+            extra = {"items": items}
+        arriba = {k: d[k] for k in CAMPOS_ITEM if k in d}
+        primero = items[0] if p.items else None
+        p.espejo = bool(arriba) and primero is not None and all(
+            k in primero and primero[k] == v for k, v in arriba.items()
+        ) and len(arriba) == sum(1 for k in CAMPOS_ITEM if k in primero)
+        for k, v in d.items():
+            if k in CAMPOS_PEDIDO:
+                setattr(p, k, _intern(v) if k == "estado" else v)
+            elif k == "items" or (p.espejo and k in arriba):
+                continue
+            else:
+                if extra is None:
+                    extra = {}
+                extra[k] = _ingredientes(v) if k == "ingredientes" else (_intern(v) if k in _INTERNADOS else v)
+        p.extra = extra
+        return p
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {k: v for k in CAMPOS_PEDIDO if (v := getattr(self, k)) is not FALTA}
+        if self.items is not None:
+            d["items"] = [it.to_dict() for it in self.items]
+        if self.espejo:
+            primero = self.items[0]
+            for k in CAMPOS_ITEM:
+                v = getattr(primero, k)
+                if v is not FALTA:
+                    d[k] = _salida(k, v)
+        if self.extra:
+            for k, v in self.extra.items():
+                d[k] = _salida(k, v)
+        return d
+
+    def get(self, clave: str, defecto=None):
+        """Lectura de un campo como en el dict (sin construirlo)."""
+        if clave in CAMPOS_PEDIDO:
+            v = getattr(self, clave)
+            return defecto if v is FALTA else v
+        if self.espejo and clave in CAMPOS_ITEM:
+            v = getattr(self.items[0], clave)
+            return defecto if v is FALTA else _salida(clave, v)
+        if self.extra and clave in self.extra:
+            return _salida(clave, self.extra[clave])
+        if clave == "items" and self.items is not None:
+            return [it.to_dict() for it in self.items]
+        return defecto
+
+
+@dataclass(slots=True)
+class KdsPedido:
+    """Lo que muestra la cocina de un pedido (ver utils.kds)."""
+    id: Any
+    orden: Any
+    cliente: Any
+    receta_tipo: Any
+    tamano: Any
+    masa: Any
+    salsa: Any
+    ingredientes: Tuple[str, ...]
+    estado: Any
+    fecha: Any
+    hora: Any
+
+    @classmethod
+    def from_dict(cls, p: Dict[str, Any]) -> "KdsPedido":
+        """Desde un pedido; lo que no esté arriba se toma del primer producto."""
+        first = (p.get("items") or [{}])[0]
+        return cls(
+            id=p.get("orden"),
+            orden=p.get("orden"),
+            cliente=p.get("cliente"),
+            receta_tipo=_intern(p.get("receta_tipo") or first.get("receta_tipo")),
+            tamano=_intern(p.get("tamano") or first.get("tamano")),
+            masa=_intern(p.get("masa") or first.get("masa")),
+            salsa=_intern(p.get("salsa") or first.get("salsa")),
+            ingredientes=_ingredientes(list(p.get("ingredientes") or first.get("ingredientes", []))),
+            estado=_intern(p.get("estado")),
+            fecha=p.get("fecha"),
+            hora=p.get("hora"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "orden": self.orden, "cliente": self.cliente,
+            "receta_tipo": self.receta_tipo, "tamano": self.tamano, "masa": self.masa,
+            "salsa": self.salsa, "ingredientes": list(self.ingredientes), "estado": self.estado,
+            "fecha": self.fecha, "hora": self.hora,
+        }
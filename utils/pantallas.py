@@ -0,0 +1,96 @@
+# utils/pantallas.py
+"""
+Ciclo de vida de las pantallas para el router de main.py.
+
+page.clean() quita los controles pero no para las tareas que la pantalla
+dejó corriendo (el auto-refresco del KDS, las fases de preparar...). Cada
+pantalla registra aquí lo que lanza y el router lo cancela al cambiar:
+
+    ciclo = ciclo_de(page)
+    ciclo.entrar("kds")               # sale de la anterior (on_leave)
+    ciclo.lanzar(_auto_refresher())   # tarea ligada a la pantalla actual
+    ciclo.al_salir(lambda: ...)       # limpieza extra (timers, handlers)
+
+Al salir se cancelan las tareas asyncio pendientes y se llaman las
+limpiezas en orden inverso; un error en una no impide las demás.
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Coroutine, List, Optional
+
+
+class CicloPantallas:
+    def __init__(self):
+        self.actual: Optional[str] = None
+        self._tareas: List[asyncio.Task] = []
+        self._limpiezas: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+
+    def entrar(self, nombre: str) -> None:
+        """on_enter: deja la pantalla anterior y pasa a `nombre`."""
+        self.salir()
+        self.actual = nombre
+
+    def salir(self) -> None:
+        """on_leave: cancela las tareas y corre las limpiezas de la pantalla actual."""
+        with self._lock:
+            tareas, self._tareas = self._tareas, []
+            limpiezas, self._limpiezas = self._limpiezas, []
+        for tarea in tareas:
+            if not tarea.done():
+                _cancelar(tarea)
+        for fn in reversed(limpiezas):
+            try:
+                fn()
+            except Exception:
+                pass
+        self.actual = None
+
+    def lanzar(self, coro: Coroutine) -> Optional[asyncio.Task]:
+        """create_task ligada a la pantalla actual. Sin event loop devuelve None (y cierra la coroutine)."""
+        try:
+            tarea = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            return None
+        self.registrar(tarea)
+        return tarea
+
+    def registrar(self, tarea: asyncio.Task) -> asyncio.Task:
+        with self._lock:
+            self._tareas = [t for t in self._tareas if not t.done()] + [tarea]
+        return tarea
+
+    def al_salir(self, fn: Callable[[], Any]) -> None:
+        with self._lock:
+            self._limpiezas.append(fn)
+
+    def tareas_vivas(self) -> int:
+        with self._lock:
+            return sum(1 for t in self._tareas if not t.done())
+
+
+def _cancelar(tarea: asyncio.Task) -> None:
+    # el router puede correr en un hilo del pool de Flet (handlers síncronos)
+    loop = tarea.get_loop()
+    try:
+        en_loop = asyncio.get_running_loop() is loop
+    except RuntimeError:
+        en_loop = False
+    if en_loop or loop.is_closed():
+        tarea.cancel()
+    else:
+        loop.call_soon_threadsafe(tarea.cancel)
+
+
+_ciclos_lock = threading.Lock()
+
+
+def ciclo_de(page) -> CicloPantallas:
+    """El ciclo de la sesión (uno por page)."""
+    with _ciclos_lock:
+        ciclo = getattr(page, "_ciclo_pantallas", None)
+        if ciclo is None:
+            ciclo = CicloPantallas()
+            setattr(page, "_ciclo_pantallas", ciclo)
+        return ciclo
@@ -1,58 +1,278 @@
-import json, os
+import gzip
+import json
+import os
+import time
 from datetime import datetime
 
+from utils import escritor, eventos, metricas
+from utils.almacen import AlmacenParticionado, epoch
+from utils.secuencia import primer_libre, secuencia
+
+# Ruta histórica: los pedidos viven en particiones diarias en data/pedidos/
+# (ver utils.almacen); si existe este archivo se migra a ellas una vez.
 ARCHIVO = "data/pedidos.json"
 
+# Motor de almacenamiento: "json" (snapshot + journal) o "sqlite" (opcional)
+MOTOR = os.environ.get("BARKA_MOTOR", "json").lower()
+DB_PATH = "data/barkalove.db"
+
+# Un almacén por ruta; ARCHIVO puede cambiarse en pruebas
+_almacenes = {}
+
+
+def _almacen():
+    if MOTOR == "sqlite":
+        from utils import almacen_sqlite
+        return almacen_sqlite.abrir(DB_PATH)
+    alm = _almacenes.get(ARCHIVO)
+    if alm is None:
+        alm = _almacenes[ARCHIVO] = AlmacenParticionado(ARCHIVO)
+    return alm
+
+
+def _ruta_secuencia():
+    return os.path.splitext(ARCHIVO)[0] + ".seq"
+
+
+def _secuencia():
+    return secuencia(_ruta_secuencia(), lambda: primer_libre([p.get("orden") for p in iter_pedidos()]))
+
+
+def nuevo_numero_orden():
+    """Número de orden nuevo: monótono y sin colisiones entre procesos (O(1) salvo al reservar bloque)."""
+    return _secuencia().siguiente()
+
+
+def _avanzar_secuencia(pedidos):
+    """Órdenes que entraron con número propio: la secuencia no las vuelve a dar."""
+    mayor = max((o for p in pedidos if isinstance(o := p.get("orden"), int)), default=None)
+    if mayor is not None:
+        _secuencia().avanzar(mayor + 1)
+
+
+def _con_transicion(pedido):
+    """Un pedido que entra ya con estado de cocina lleva su primera transición
+    (a la hora del pedido: la espera en cola cuenta desde ahí)."""
+    estado = pedido.get("estado")
+    if not estado or "transiciones" in pedido:
+        return pedido
+    return {**pedido, "transiciones": [[estado, epoch(pedido.get("hora")) or time.time()]]}
+
+
+def _medir(pedidos):
+    """Las transiciones recién escritas alimentan utils.metricas (un único camino)."""
+    for p in pedidos:
+        for estado, ts in p.get("transiciones") or ():
+            metricas.registrar(p.get("orden"), estado, ts)
+
+
+def _medido(fn, *args):
+    """Escritura con transiciones: la primera vez, utils.metricas se rehace del
+    almacén ANTES de escribir (si no, lo recién escrito contaría dos veces)."""
+    metricas.metricas()
+    return fn(*args)
+
+
+def _alta(alm, pedido):
+    metricas.metricas()
+    alm.agregar(pedido)
+    _avanzar_secuencia([pedido])
+
+
+def _altas(alm, lote):
+    metricas.metricas()
+    n = alm.agregar_varios(lote)
+    _avanzar_secuencia(lote)
+    return n
+
+
 def guardar_pedido(pedido):
-    os.makedirs("data", exist_ok=True)
-    pedidos = cargar_pedidos()
-    pedidos.append(pedido)
-    # Escritura robusta y UTF-8
-    with open(ARCHIVO, "w", encoding="utf-8") as f:
-        json.dump(pedidos, f, indent=4, ensure_ascii=False)
+    """Alta de un pedido nuevo. Si ya hay uno con esa 'orden', lanza ValueError."""
+    # Sólo anexa una línea al journal; no reescribe el historial
+    pedido = _con_transicion(pedido)
+    escritor.ejecutar(_alta, _almacen(), pedido)
+    _medir([pedido])
+    eventos.publicar(eventos.PEDIDO_CREADO, orden=pedido.get("orden"), estado=pedido.get("estado"))
+
+
+async def aguardar_pedido(pedido):
+    """Como guardar_pedido, sin bloquear el event loop (hilo escritor)."""
+    pedido = _con_transicion(pedido)
+    await escritor.esperar(_alta, _almacen(), pedido)
+    _medir([pedido])
+    eventos.publicar(eventos.PEDIDO_CREADO, orden=pedido.get("orden"), estado=pedido.get("estado"))
+
+
+def _actualizar(alm, pedido):
+    if not alm.actualizar(pedido):
+        raise ValueError(f"Pedido con orden {pedido.get('orden')} no encontrado")
 
 
 def actualizar_pedido(pedido):
     """Actualiza un pedido existente que coincida por 'orden'.
     Si no existe, lanza ValueError.
     """
-    os.makedirs("data", exist_ok=True)
-    pedidos = cargar_pedidos()
-    for i, p in enumerate(pedidos):
-        if p.get('orden') == pedido.get('orden'):
-            # conservar la hora original si no viene en el nuevo pedido
-            if 'hora' not in pedido:
-                pedido['hora'] = p.get('hora')
-            pedidos[i] = pedido
-            with open(ARCHIVO, "w") as f:
-                json.dump(pedidos, f, indent=4)
-            return
-    raise ValueError(f"Pedido con orden {pedido.get('orden')} no encontrado")
+    escritor.ejecutar(_actualizar, _almacen(), pedido)
+    eventos.publicar(eventos.PEDIDO_EDITADO, orden=pedido.get("orden"))
+
+
+async def aactualizar_pedido(pedido):
+    await escritor.esperar(_actualizar, _almacen(), pedido)
+    eventos.publicar(eventos.PEDIDO_EDITADO, orden=pedido.get("orden"))
 
 
 def obtener_pedido(orden):
     """Devuelve el pedido con la orden dada o None si no existe."""
-    pedidos = cargar_pedidos()
-    for p in pedidos:
-        if p.get('orden') == orden:
-            return p
-    return None
+    return _almacen().obtener(orden)
+
+
+def cambiar_estado(orden, estado, ts=None):
+    """Estado de cocina (KDS) del pedido; una sola escritura. False si no existe.
+    La transición se guarda con su hora `ts` (por defecto ahora)."""
+    ts = time.time() if ts is None else ts
+    ok = escritor.ejecutar(_medido, _almacen().cambiar_estado, orden, estado, ts)
+    if ok:
+        metricas.registrar(orden, estado, ts)
+        eventos.publicar(eventos.ESTADO_CAMBIADO, orden=orden, estado=estado)
+    return ok
+
+
+async def acambiar_estado(orden, estado, ts=None):
+    ts = time.time() if ts is None else ts
+    ok = await escritor.esperar(_medido, _almacen().cambiar_estado, orden, estado, ts)
+    if ok:
+        metricas.registrar(orden, estado, ts)
+        eventos.publicar(eventos.ESTADO_CAMBIADO, orden=orden, estado=estado)
+    return ok
+
+
+def cambiar_estados(cambios, avisar=True, transiciones=None):
+    """Varios cambios {orden: estado} en una sola escritura. Devuelve las órdenes aplicadas.
+    transiciones = {orden: [(estado, ts), ...]} si pasó por varios (las que falten: ahora).
+    avisar=False si quien llama ya publicó los cambios (p.ej. el volcado del KDS)."""
+    ahora = time.time()
+    transiciones = {o: (transiciones or {}).get(o) or [(e, ahora)] for o, e in cambios.items()}
+    aplicados = escritor.ejecutar(_medido, _almacen().cambiar_estados, dict(cambios), transiciones)
+    for ts, orden, estado in sorted((t, o, e) for o in aplicados for e, t in transiciones[o]):
+        metricas.registrar(orden, estado, ts)
+    if avisar and aplicados:
+        eventos.publicar(eventos.ESTADO_CAMBIADO, ordenes=aplicados)
+    return aplicados
+
+
+def guardar_pedidos_bulk(pedidos):
+    """Alta de muchos pedidos (p.ej. carga de un día del TPV) en una pasada y una
+    escritura por día. Los ya guardados se omiten (re-importar no duplica). Devuelve cuántos entraron."""
+    lote = [_con_transicion(p) for p in pedidos]
+    n = escritor.ejecutar(_altas, _almacen(), lote)
+    if n:
+        _medir(lote)  # las ya guardadas repiten estado: no cuentan dos veces
+        eventos.publicar(eventos.PEDIDO_CREADO, ordenes=[p.get("orden") for p in lote])
+    return n
+
+
+def actualizar_estados_bulk(cambios):
+    """Cierre en bloque {orden: estado} (p.ej. 200 pedidos a "Listo"); ver cambiar_estados."""
+    return cambiar_estados(cambios)
+
+
+def exportar_pedidos(ruta, desde=None, hasta=None, estado=None):
+    """Escribe en `ruta` (JSON Lines; .gz comprimido) los pedidos del rango sin
+    cargarlos todos en memoria. El archivo aparece completo o no aparece. Devuelve cuántos."""
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    tmp = ruta + ".tmp"
+    abrir = gzip.open if ruta.endswith(".gz") else open
+    n = 0
+    with abrir(tmp, "wt", encoding="utf-8") as f:
+        for p in iter_pedidos(estado, desde, hasta):
+            f.write(json.dumps(p, ensure_ascii=False, separators=(",", ":")) + "\n")
+            n += 1
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+    return n
+
+
+def pedidos_en_cocina(estado=None, dias=None):
+    """Pedidos enviados a cocina (con 'estado'), opcionalmente filtrados por estado
+    y limitados a los últimos `dias` días de negocio."""
+    return _almacen().listar(estado, dias=dias)
+
 
 def cargar_pedidos():
-    if os.path.exists(ARCHIVO):
-        with open(ARCHIVO, "r", encoding="utf-8") as f:
-            txt = f.read().strip()
-            if not txt:
-                # archivo existente pero vacío
-                return []
-            try:
-                return json.loads(txt)
-            except json.JSONDecodeError:
-                # tolera JSON corrupto devolviendo lista vacía
-                return []
-    return []
+    """Todo el historial en una lista (todas las particiones, o todas las filas con SQLite).
+    Para recorridos largos mejor iter_pedidos()."""
+    return _almacen().cargar()
+
+
+def iter_pedidos(estado=None, desde=None, hasta=None):
+    """Generador de pedidos con filtros opcionales: estado de cocina y
+    desde <= hora < hasta (datetime o epoch). Memoria constante en días sellados."""
+    return _almacen().iterar(estado, _epoch(desde), _epoch(hasta))
+
+
+def firma_almacen(dias=None):
+    """Valor que cambia con cualquier escritura en el almacén (de este u otro
+    proceso), limitado a los últimos `dias` días de negocio. Barato: sólo stat/PRAGMA."""
+    return _almacen().firma(dias)
+
+
+def estadisticas_cache():
+    """Aciertos/fallos de la caché en memoria (motor json). El KDS lee por la misma caché."""
+    return dict(getattr(_almacen(), "estadisticas", {}))
+
+
+def compactar():
+    """Pliega los journals en sus particiones y sella los días cerrados
+    (normalmente lo hacen hilos en segundo plano). Con SQLite hace checkpoint del WAL.
+    """
+    _almacen().compactar()
+
+
+def _epoch(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    return valor.timestamp()
+
+
+def pedidos_en_rango(desde=None, hasta=None):
+    """Pedidos con desde <= hora < hasta (datetime o epoch; None = sin límite), por índice temporal."""
+    return _almacen().en_rango(_epoch(desde), _epoch(hasta))
+
+
+def pedidos_recientes(minutos):
+    """Pedidos de los últimos `minutos`."""
+    return _almacen().en_rango(time.time() - minutos * 60, None)
+
+
+def hora_epoch(orden):
+    """Epoch de la 'hora' del pedido ya indexada (None si no existe)."""
+    return _almacen().hora_epoch(orden)
+
+
+def epoch_de(pedido):
+    """Epoch de la 'hora' de un pedido que ya se tiene en mano (sin ir al almacén:
+    parsear la hora cuesta menos que el lock + stat de una consulta)."""
+    return epoch(pedido.get("hora"))
+
+
+def _en_ventana(t, minutos):
+    return t is not None and time.time() - t < minutos * 60
+
+
+def es_modificable(orden, minutos=5):
+    """True si el pedido entró hace menos de `minutos` (ventana de modificación)."""
+    return _en_ventana(hora_epoch(orden), minutos)
+
+
+def pedido_modificable(pedido, minutos=5):
+    """Como es_modificable, con el pedido ya leído."""
+    return _en_ventana(epoch_de(pedido), minutos)
+
 
 def pedidos_modificables(minutos=5):
-    from datetime import datetime, timedelta
-    pedidos = cargar_pedidos()
-    return [p for p in pedidos if datetime.now() - datetime.fromisoformat(p["hora"]) < timedelta(minutes=minutos)]
+    return pedidos_recientes(minutos)
+
+
+# Al arrancar, los tiempos por etapa se rehacen desde las transiciones guardadas
+metricas.origen(lambda: pedidos_en_cocina(dias=2))
@@ -1,13 +1,22 @@
 # utils/recetas.py
 import json
 import os
+import threading
 from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, asdict, replace
+from typing import List, Dict, Any, Optional, Tuple
 
 BASE_DIR = os.path.dirname(__file__)
 DATA_PATH = os.path.join(BASE_DIR, "recetas_data.json")
 
+# Caché de lecturas: el JSON se parsea una vez y se revalida con (mtime_ns, size).
+# nueva_version/activar_version la invalidan; 'version' sube en cada recarga.
+_cache: Dict[str, Any] = {"firma": None, "ruta": None, "version": 0, "data": {}, "vigentes": {}, "guias": {}}
+_cache_lock = threading.Lock()
+
+Guia = Tuple[str, Optional[Any], Optional[Any]]
+GUIA_VACIA: Guia = ("Receta: —", None, None)
+
 
 @dataclass
 class RecetaVersion:
@@ -37,24 +46,80 @@ def _save_data(data: Dict[str, Any]):
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
     with open(DATA_PATH, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    invalidar_cache()
+
+
+def _firma():
+    try:
+        st = os.stat(DATA_PATH)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def invalidar_cache():
+    with _cache_lock:
+        _cache["firma"] = None
+
+
+def _datos() -> Dict[str, Any]:
+    """Recetas ya parseadas (sólo lectura); se recargan si el archivo cambió."""
+    firma = _firma()
+    with _cache_lock:
+        if _cache["firma"] is None or _cache["firma"] != firma or _cache["ruta"] != DATA_PATH:
+            _cache.update(firma=firma, ruta=DATA_PATH, data=_load_data(), vigentes={}, guias={})
+            _cache["version"] += 1
+        return _cache["data"]
+
+
+def version_cache() -> int:
+    """Número que cambia cada vez que se recargan las recetas."""
+    _datos()
+    return _cache["version"]
 
 
 def listar_tipos() -> List[str]:
-    data = _load_data()
-    return list(data.keys())
+    return list(_datos().keys())
 
 
 def historial(tipo_pizza: str) -> List[RecetaVersion]:
-    data = _load_data()
-    versiones = data.get(tipo_pizza, [])
+    versiones = _datos().get(tipo_pizza, [])
     return [RecetaVersion(**v) for v in versiones]
 
 
 def vigente(tipo_pizza: str) -> Optional[RecetaVersion]:
-    for v in historial(tipo_pizza):
-        if v.activo:
-            return v
-    return None
+    data = _datos()
+    with _cache_lock:
+        vigentes = _cache["vigentes"]
+        if tipo_pizza not in vigentes:
+            vigentes[tipo_pizza] = next(
+                (RecetaVersion(**v) for v in data.get(tipo_pizza, []) if v.get("activo")), None
+            )
+        ver = vigentes[tipo_pizza]
+    # copia: quien la reciba puede modificarla sin tocar la caché
+    return replace(ver) if ver else None
+
+
+def guia(tipo_pizza: Optional[str]) -> Guia:
+    """(texto, temp_c, tiempo_min) de la receta vigente para las tarjetas del KDS; precalculado por tipo."""
+    if not tipo_pizza:
+        return GUIA_VACIA
+    _datos()
+    with _cache_lock:
+        g = _cache["guias"].get(tipo_pizza)
+        version = _cache["version"]
+    if g is not None:
+        return g
+    ver = vigente(tipo_pizza)
+    if not ver or not ver.horno:
+        g = GUIA_VACIA
+    else:
+        temp, tmin = ver.horno.get("temp_c"), ver.horno.get("tiempo_min")
+        g = (f"Receta: {tipo_pizza} • Objetivo {temp}°C • {tmin} min", temp, tmin)
+    with _cache_lock:
+        if _cache["version"] == version:  # no guardar una guía de recetas ya recargadas
+            _cache["guias"][tipo_pizza] = g
+    return g
 
 
 def nueva_version(tipo_pizza: str, version_id: str, autor: str, notas: str,
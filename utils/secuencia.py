@@ -0,0 +1,92 @@
+# utils/secuencia.py
+"""
+Asignador de números de orden: monótono, persistido y sin colisiones.
+
+Cada proceso reserva un bloque de números con una sola escritura bajo
+bloqueo (utils.bloqueo) y después los reparte desde memoria en O(1).
+Los números de un bloque que no se lleguen a usar se pierden (huecos),
+pero nunca se repiten. Los pedidos que entran con número propio (importar
+en bloque) empujan la secuencia por encima de su orden (avanzar()).
+"""
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+
+from utils.bloqueo import bloqueo_archivo
+
+# Números que reserva cada proceso por escritura
+BLOQUE = 20
+# Primer número si no hay historial
+INICIO = 1000
+
+
+class Secuencia:
+    def __init__(self, ruta: str, semilla: Callable[[], int]):
+        """`semilla()` da el primer número libre cuando aún no existe el archivo."""
+        self.ruta = ruta
+        self._semilla = semilla
+        self._lock = threading.Lock()
+        self._siguiente = 0
+        self._fin = 0  # exclusivo
+
+    def _reservar(self, n: int) -> None:
+        with bloqueo_archivo(self.ruta):
+            if os.path.exists(self.ruta):
+                with open(self.ruta, "r", encoding="utf-8") as f:
+                    inicio = int(json.load(f)["siguiente"])
+            else:
+                inicio = self._semilla()
+            self._escribir(inicio + n)
+        self._siguiente, self._fin = inicio, inicio + n
+
+    def avanzar(self, minimo: int) -> None:
+        """Garantiza que no se vuelva a dar ningún número < `minimo` (ya usado fuera de la secuencia)."""
+        with self._lock:
+            if self._siguiente < minimo:
+                # el resto del bloque en memoria que ya está ocupado se descarta
+                self._siguiente = min(minimo, self._fin)
+            if minimo <= self._fin:
+                return  # el archivo ya va por delante de este bloque
+            with bloqueo_archivo(self.ruta):
+                if not os.path.exists(self.ruta):
+                    return  # la primera reserva parte de la semilla (que ya lo ve)
+                with open(self.ruta, "r", encoding="utf-8") as f:
+                    actual = int(json.load(f)["siguiente"])
+                if actual < minimo:
+                    self._escribir(minimo)
+
+    def _escribir(self, siguiente: int) -> None:
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        tmp = self.ruta + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"siguiente": siguiente}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+
+    def siguiente(self) -> int:
+        with self._lock:
+            if self._siguiente >= self._fin:
+                self._reservar(BLOQUE)
+            n = self._siguiente
+            self._siguiente += 1
+            return n
+
+
+_secuencias: Dict[str, Secuencia] = {}
+_secuencias_lock = threading.Lock()
+
+
+def secuencia(ruta: str, semilla: Callable[[], int]) -> Secuencia:
+    with _secuencias_lock:
+        seq = _secuencias.get(ruta)
+        if seq is None:
+            seq = _secuencias[ruta] = Secuencia(ruta, semilla)
+        return seq
+
+
+def primer_libre(ordenes: List) -> int:
+    """Siguiente al mayor número de orden existente (los antiguos eran aleatorios)."""
+    enteros = [o for o in ordenes if isinstance(o, int)]
+    return max(enteros + [INICIO - 1]) + 1